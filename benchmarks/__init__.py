@@ -0,0 +1,9 @@
+"""性能基准测试
+
+在没有显示器的环境中用合成数据测量加载、保存、刷新列表、添加和移动任务的耗时与内存峰值：
+
+    python -m benchmarks                          # 1k/10k/100k/1M 个任务，结果写入 benchmark_results.json
+    python -m benchmarks --sizes 1000,10000       # 指定任务数量
+    python -m benchmarks --save-baseline          # 把本次结果保存为基线
+    python -m benchmarks --baseline               # 与基线比较，变慢超过阈值时返回非零退出码
+"""
@@ -0,0 +1,52 @@
+"""命令行入口：python -m benchmarks"""
+import argparse
+import os
+import sys
+import tempfile
+
+from benchmarks.suite import BACKENDS, SIZES, TOLERANCE, compare, format_result, load_results, run, save_results
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# 结果默认写入临时目录，不留在工作目录中
+RESULTS = os.path.join(tempfile.gettempdir(), "todo_benchmark_results.json")
+
+
+def parse_sizes(text):
+    return tuple(int(size) for size in text.split(",") if size.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Todo List 性能基准测试")
+    parser.add_argument("--sizes", type=parse_sizes, default=SIZES, help="任务数量，用逗号分隔")
+    parser.add_argument("--backend", action="append", choices=BACKENDS, help="存储后端，可以指定多次，默认 journal")
+    parser.add_argument("--output", default=RESULTS, help="结果文件，默认写入临时目录")
+    parser.add_argument("--no-memory", action="store_true", help="不测量内存峰值")
+    parser.add_argument("--save-baseline", nargs="?", const=BASELINE, help="把结果保存为基线")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE, help="与基线比较")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="允许变慢的比例")
+    args = parser.parse_args(argv)
+    # 基线与机器有关，不随代码提交，需要先在本机保存
+    if args.baseline and args.baseline != args.save_baseline and not os.path.exists(args.baseline):
+        parser.error(f"没有记录基线 {args.baseline}，请先运行 python -m benchmarks --save-baseline")
+    
+    results = run(args.sizes, args.backend or ["journal"], memory=not args.no_memory)
+    save_results(args.output, results)
+    print(f"结果已写入 {args.output}")
+    if args.save_baseline:
+        save_results(args.save_baseline, results)
+        print(f"基线已写入 {args.save_baseline}")
+    
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        if regressions:
+            print(f"\n与基线相比变慢的用例（阈值 {args.tolerance:.0%}）：")
+            for item, old in regressions:
+                print(f"  {format_result(item)}    基线 {format_result(old)}")
+            return 1
+        print("\n没有超过阈值的性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
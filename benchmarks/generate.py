@@ -0,0 +1,37 @@
+"""合成任务数据"""
+import random
+from datetime import date, timedelta
+
+from task_store import key_between
+from task_storage import write_snapshot
+
+
+WORDS = ["report", "review", "meeting", "email", "invoice", "deploy", "backup", "design", "plan", "call",
+         "整理", "报告", "会议", "邮件", "发票", "部署", "备份", "设计", "计划", "电话", "周报", "客户"]
+
+
+def generate_tasks(count, seed=0):
+    """生成 count 个任务，描述由中英文词语组成，约一半有截止日期，约三成已完成"""
+    rng = random.Random(seed)
+    today = date.today()
+    tasks = []
+    key = None
+    for task_id in range(1, count + 1):
+        key = key_between(key, None)
+        if rng.random() < 0.5:
+            due_date = (today + timedelta(days=rng.randint(-30, 60))).isoformat()
+        else:
+            due_date = ""
+        tasks.append({
+            "id": task_id,
+            "task": " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))) + f" {task_id}",
+            "due_date": due_date,
+            "completed": rng.random() < 0.3,
+            "pos": key
+        })
+    return tasks
+
+
+def write_tasks(path, count, seed=0):
+    """生成任务并写入 todos.json 格式的文件"""
+    write_snapshot(path, generate_tasks(count, seed))
@@ -0,0 +1,211 @@
+"""无显示环境下运行 TodoApp
+
+用内存中的假控件代替 Tk 窗口和 Treeview，messagebox 的对话框直接返回，
+TodoApp 的方法因此可以在没有显示器的 Linux 上按原样执行。
+"""
+import time
+from tkinter import messagebox
+
+from task_view import TaskTreeRenderer
+import todo_app
+
+
+class HeadlessRoot:
+    """主窗口：after 注册的回调在 update 时执行，延迟大于0的定时器到期后才执行"""
+    
+    def __init__(self):
+        self._pending = []
+        # 定时器编号 -> (到期时间, 回调, 参数)
+        self._timers = {}
+        self._next_timer = 0
+    
+    def after(self, delay, callback, *args):
+        self._next_timer += 1
+        if delay:
+            self._timers[self._next_timer] = (time.monotonic() + delay / 1000, callback, args)
+        else:
+            self._pending.append((callback, args))
+        return self._next_timer
+    
+    def after_cancel(self, timer):
+        self._timers.pop(timer, None)
+    
+    def destroy(self):
+        self._pending.clear()
+        self._timers.clear()
+    
+    def update(self):
+        """执行已经到期的定时器和所有等待中的回调，包括执行期间新注册的"""
+        now = time.monotonic()
+        for timer, (deadline, callback, args) in list(self._timers.items()):
+            if deadline <= now and self._timers.pop(timer, None):
+                callback(*args)
+        while self._pending:
+            callback, args = self._pending.pop(0)
+            callback(*args)
+
+
+class HeadlessTree:
+    """Treeview：只保存行的顺序和内容，统计 Tk 调用次数"""
+    
+    def __init__(self, height=700):
+        self.rows = {}
+        self.order = []
+        self.selected = ()
+        self.height = height
+        self.calls = 0
+        self._next_row = 0
+        self.headings = {}
+    
+    def get_children(self, item=""):
+        return tuple(self.order)
+    
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.calls += 1
+        if iid is None:
+            self._next_row += 1
+            iid = f"I{self._next_row}"
+        self.rows[iid] = {"values": values, "tags": tags}
+        if index == "end":
+            self.order.append(iid)
+        else:
+            self.order.insert(index, iid)
+        return iid
+    
+    def delete(self, *items):
+        self.calls += 1
+        removed = set(items)
+        self.order = [iid for iid in self.order if iid not in removed]
+        for iid in items:
+            del self.rows[iid]
+    
+    def move(self, item, parent, index):
+        self.calls += 1
+        self.order.remove(item)
+        self.order.insert(index, item)
+    
+    def item(self, item, option=None, **options):
+        if options:
+            self.calls += 1
+            self.rows[item].update(options)
+            return None
+        if option:
+            return self.rows[item][option]
+        return self.rows[item]
+    
+    def selection(self):
+        return self.selected
+    
+    def selection_set(self, *items):
+        self.calls += 1
+        self.selected = items
+    
+    def configure(self, **options):
+        pass
+    
+    def heading(self, column, **options):
+        self.headings.setdefault(column, {}).update(options)
+    
+    def winfo_ismapped(self):
+        return True
+    
+    def winfo_height(self):
+        return self.height
+    
+    def yview(self, *args):
+        pass
+
+
+class HeadlessWidget(dict):
+    """进度条、标签等只需要接受配置的控件"""
+    
+    def configure(self, **options):
+        self.update(options)
+    
+    def state(self, states):
+        pass
+    
+    def pack(self, **options):
+        pass
+    
+    def pack_forget(self):
+        pass
+    
+    def set(self, *args):
+        pass
+
+
+class HeadlessEntry:
+    """输入框"""
+    
+    def __init__(self, text=""):
+        self.text = text
+    
+    def get(self):
+        return self.text
+    
+    def delete(self, first, last=None):
+        self.text = ""
+    
+    def insert(self, index, text):
+        self.text += text
+    
+    def focus(self):
+        pass
+
+
+class HeadlessVar:
+    """StringVar"""
+    
+    def __init__(self, value=""):
+        self.value = value
+    
+    def get(self):
+        return self.value
+    
+    def set(self, value):
+        self.value = value
+
+
+class HeadlessStyle:
+    def lookup(self, style, option):
+        return 35
+
+
+def install_messagebox_stubs():
+    """让 messagebox 的对话框不再弹出：确认对话框总是返回"是"，提示对话框直接返回"""
+    messagebox.askyesno = lambda *args, **kwargs: True
+    messagebox.showinfo = lambda *args, **kwargs: "ok"
+    messagebox.showwarning = lambda *args, **kwargs: "ok"
+    messagebox.showerror = lambda *args, **kwargs: "ok"
+
+
+def make_app(backend):
+    """创建使用假控件和指定存储后端的 TodoApp，尚未加载任务"""
+    install_messagebox_stubs()
+    
+    app = todo_app.TodoApp.__new__(todo_app.TodoApp)
+    app.root = HeadlessRoot()
+    app.profiler = todo_app.StartupProfiler()
+    app.backend = backend
+    # 到期提醒不弹出窗口
+    app.show_reminder = lambda tasks: None
+    app.init_state()
+    
+    app.style = HeadlessStyle()
+    app.task_tree = HeadlessTree()
+    app.column_titles = {"task": "任务", "due_date": "截止日期", "status": "状态"}
+    app.scrollbar = HeadlessWidget()
+    app.renderer = TaskTreeRenderer(app.task_tree)
+    app.virtual_list = False
+    
+    app.load_frame = HeadlessWidget()
+    app.load_label = HeadlessWidget()
+    app.load_progress = HeadlessWidget()
+    app.filter_count = HeadlessWidget()
+    app.edit_buttons = []
+    app.filter_var = HeadlessVar()
+    app.view_var = HeadlessVar("all")
+    app.task_entry = HeadlessEntry()
+    app.date_entry = HeadlessEntry()
+    return app
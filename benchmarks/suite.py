@@ -0,0 +1,242 @@
+"""基准测试用例、结果文件和基线比较"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from task_store import Task
+from task_storage import BinaryBackend, JsonBackend, SqliteBackend
+
+from benchmarks.generate import write_tasks
+from benchmarks.headless import make_app
+
+
+SIZES = (1000, 10000, 100000, 1000000)
+BACKENDS = ("journal", "snapshot", "sqlite", "binary")
+
+# 每个用例最多重复执行的次数，取最短耗时；任务越多重复次数越少，加载只执行一次
+REPEAT = 5
+
+# 比较基线时允许的变慢比例，以及低于该值的耗时差异视为噪声（秒）
+TOLERANCE = 0.25
+MIN_DIFFERENCE = 0.002
+
+
+def make_backend(kind, json_path):
+    """创建指定类型的存储后端，sqlite 和 binary 第一次打开时从 json_path 导入数据"""
+    if kind == "sqlite":
+        return SqliteBackend(os.path.splitext(json_path)[0] + ".db", migrate_from=json_path)
+    if kind == "binary":
+        return BinaryBackend(os.path.splitext(json_path)[0] + ".bin", delay=0, migrate_from=json_path)
+    return JsonBackend(json_path, journal=kind == "journal", delay=0)
+
+
+def measure(func, setup=None, repeat=1, memory=True):
+    """返回 (最短耗时秒数, 内存峰值KB)
+    
+    计时和内存分开测量，tracemalloc 不影响耗时；setup 在每次执行前调用，不计入结果。
+    """
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    peak = None
+    if memory:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def measure_resident(build):
+    """返回 (耗时秒数, build 返回的对象常驻的内存KB)，临时对象不计入"""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        resident = tracemalloc.get_traced_memory()[0] // 1024
+    finally:
+        tracemalloc.stop()
+    del result
+    return elapsed, resident
+
+
+def load_app(kind, json_path):
+    """按 TodoApp 的流程加载任务：后台读取、逐批显示、加载完成后建立索引"""
+    app = make_app(make_backend(kind, json_path))
+    app.load_tasks()
+    app.process_events()
+    app.root.update()
+    return app
+
+
+def first_rows(kind, json_path):
+    """按启动流程在后台加载，返回从开始加载到列表中出现第一屏任务的秒数"""
+    app = make_app(make_backend(kind, json_path))
+    start = time.perf_counter()
+    app.start_loading()
+    while not app.task_tree.order:
+        app.root.update()
+        time.sleep(0.0001)
+    elapsed = time.perf_counter() - start
+    
+    # 等待后台加载结束再关闭
+    while app.loading:
+        app.root.update()
+        time.sleep(0.001)
+    app.backend.close()
+    return elapsed
+
+
+def run_size(size, kind, directory, memory=True, report=print):
+    """测量一种任务数量下的所有用例，返回结果列表"""
+    json_path = os.path.join(directory, f"todos-{kind}-{size}.json")
+    write_tasks(json_path, size)
+    if kind in ("sqlite", "binary"):
+        # 导入数据不计入加载时间
+        make_backend(kind, json_path).close()
+    
+    results = []
+    repeat = max(1, min(REPEAT, 100000 // size))
+    
+    def record(case, seconds, peak, resident=None):
+        result = {"case": case, "backend": kind, "size": size, "seconds": seconds, "peak_kb": peak}
+        if resident is not None:
+            result["resident_kb"] = resident
+        results.append(result)
+        report(format_result(result))
+    
+    # 常驻内存：同样的任务数据解析为字典列表和紧凑的 Task 列表
+    if memory:
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = f.read()
+        seconds, resident = measure_resident(lambda: json.loads(data))
+        record("tasks_dict", seconds, None, resident)
+        seconds, resident = measure_resident(lambda: [Task.from_dict(task) for task in json.loads(data)])
+        record("tasks_compact", seconds, None, resident)
+        del data
+    
+    # 加载：读取数据文件、逐批刷新列表、建立搜索和截止日期索引
+    apps = []
+    
+    def load():
+        apps.append(load_app(kind, json_path))
+    
+    def close_loaded():
+        while apps:
+            apps.pop().backend.close()
+    
+    record("load", *measure(load, close_loaded, memory=memory))
+    close_loaded()
+    
+    # 启动后多久能看到任务：逐批加载的第一批，或二进制快照的预览
+    record("first_rows", min(first_rows(kind, json_path) for _ in range(repeat)), None)
+    app = load_app(kind, json_path)
+    ids = [task["id"] for task in app.store]
+    middle = ids[len(ids) // 2]
+    
+    # 保存：修改 1% 的任务后写入
+    changed = ids[::100]
+    
+    def change_one_percent():
+        app.store.update_many(changed, completed=not app.store.get(changed[0])["completed"])
+    
+    def save():
+        app.save_tasks()
+        if getattr(app.backend, "writer", None):
+            app.backend.writer.flush()
+    
+    record("save", *measure(save, change_one_percent, repeat, memory))
+    
+    # 刷新列表：重新创建渲染器后完整显示，以及修改一个任务后的增量刷新
+    record("render_full", *measure(app.update_task_list, lambda: app.set_virtual_list(app.virtual_list), repeat, memory))
+    record("render_edit", *measure(app.update_task_list, lambda: app.store.toggle(middle), repeat, memory))
+    
+    # 添加任务：写入存储、保存并刷新
+    record("add", *measure(app.add_task, lambda: app.task_entry.insert(0, "benchmark 新任务"), repeat, memory))
+    
+    # 调整顺序：下移一个任务，并把 1% 的任务移到顶部
+    record("move", *measure(lambda: app.move_task_down(middle), None, repeat, memory))
+    record("move_many", *measure(lambda: app.run_batch(app.store.move_to_edge, changed, True), None, repeat, memory))
+    
+    app.backend.close()
+    return results
+
+
+def run(sizes=SIZES, backends=("journal",), directory=None, memory=True, report=print):
+    """运行全部基准测试，返回结果字典"""
+    import tempfile
+    
+    results = []
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        for kind in backends:
+            for size in sizes:
+                results.extend(run_size(size, kind, temp_dir, memory, report))
+    
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "machine": platform.machine()
+        },
+        "results": results
+    }
+
+
+def format_result(result):
+    """格式化一条结果"""
+    if result.get("resident_kb") is not None:
+        peak = f"{result['resident_kb']:>10} KB 常驻"
+    elif result["peak_kb"] is not None:
+        peak = f"{result['peak_kb']:>10} KB"
+    else:
+        peak = ""
+    return f"{result['backend']:<8} {result['size']:>8} {result['case']:<12} {result['seconds'] * 1000:>10.2f} ms {peak}"
+
+
+def save_results(path, results):
+    """把结果写入 JSON 文件"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(path):
+    """读取结果文件"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(current, baseline, tolerance=TOLERANCE, min_difference=MIN_DIFFERENCE):
+    """与基线比较，返回变慢或内存峰值、常驻内存增加超过 tolerance 的 (结果, 基线结果) 列表
+    
+    只比较两边都有的用例；耗时差异小于 min_difference 秒时视为噪声。
+    """
+    previous = {(item["case"], item["backend"], item["size"]): item for item in baseline["results"]}
+    regressions = []
+    for item in current["results"]:
+        old = previous.get((item["case"], item["backend"], item["size"]))
+        if old is None:
+            continue
+        slower = (item["seconds"] > old["seconds"] * (1 + tolerance)
+                  and item["seconds"] - old["seconds"] > min_difference)
+        larger = any(item.get(key) is not None and old.get(key) is not None
+                     and item[key] > old[key] * (1 + tolerance) and item[key] - old[key] > 64
+                     for key in ("peak_kb", "resident_kb"))
+        if slower or larger:
+            regressions.append((item, old))
+    return regressions
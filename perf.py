@@ -0,0 +1,111 @@
+"""性能统计
+
+记录热点函数的调用次数和耗时，以及写入磁盘的字节数，不依赖 tkinter。
+默认关闭，关闭时被 timed 包装的函数只多一次属性判断。
+"""
+import functools
+import json
+import math
+import threading
+import time
+from collections import deque
+
+
+class PerfMonitor:
+    """性能统计
+    
+    每个指标记录总调用次数，并在环形缓冲区中保留最近 window 次调用的耗时，
+    用于计算 p50/p95/最大值；写入的字节数按类别累计。可以在后台线程中记录。
+    """
+    
+    def __init__(self, window=1000):
+        self.enabled = False
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """清空已经记录的数据"""
+        with self._lock:
+            # 指标名称 -> 调用次数 / 最近的耗时（秒）
+            self._counts = {}
+            self._samples = {}
+            # 类别 -> (写入次数, 字节数)
+            self._bytes = {}
+            self._since = time.time()
+    
+    def record(self, name, seconds):
+        """记录一次调用的耗时"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append(seconds)
+            self._counts[name] += 1
+    
+    def add_bytes(self, kind, size):
+        """记录一次写入的字节数"""
+        with self._lock:
+            count, total = self._bytes.get(kind, (0, 0))
+            self._bytes[kind] = (count + 1, total + size)
+    
+    def stats(self):
+        """返回 {"metrics": {名称: 统计}, "bytes": {类别: 统计}}，耗时单位为毫秒"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+            written = dict(self._bytes)
+        
+        metrics = {}
+        for name, values in samples.items():
+            metrics[name] = {
+                "count": counts[name],
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "max_ms": values[-1] * 1000
+            }
+        return {
+            "metrics": metrics,
+            "bytes": {kind: {"writes": count, "bytes": total} for kind, (count, total) in written.items()}
+        }
+    
+    def export(self, path):
+        """把当前统计追加为 JSON Lines 文件中的一行"""
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._since))
+        }
+        entry.update(self.stats())
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+
+def percentile(values, percent):
+    """返回已排序列表的百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(len(values) * percent / 100))
+    return values[rank - 1]
+
+
+# 全局统计对象，由界面打开或关闭
+MONITOR = PerfMonitor()
+
+
+def timed(name):
+    """装饰器：统计开启时记录函数的耗时"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not MONITOR.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                MONITOR.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
@@ -0,0 +1,145 @@
+"""截止日期提醒
+
+用最小堆保存即将到来的提醒时间，只保留一个定时器等待堆顶的提醒。
+不直接导入 tkinter，定时器由调用方提供的 after / cancel 函数实现。
+"""
+import heapq
+import time
+from datetime import datetime, time as day_time
+
+from task_store import parse_due_date
+
+
+class ReminderScheduler:
+    """截止日期提醒调度器
+    
+    attach 时根据全部任务一次性建堆，之后通过任务存储的变更记录增量维护：
+    新的截止日期直接入堆，被删除、完成或改期的任务不从堆中删除，而是在到达堆顶时丢弃。
+    只有堆顶变早时才重新设置定时器。
+    
+    after(delay_ms, callback) 设置定时器并返回标识，cancel(标识) 取消定时器，
+    notify(任务列表) 在提醒时间到达时调用，同一时间到期的任务合并为一次提醒。
+    """
+    
+    # 截止当天的提醒时间
+    REMIND_AT = day_time(9, 0)
+    
+    # 定时器的最长等待时间（秒），系统时间变化或休眠后也能及时校正
+    MAX_DELAY = 3600
+    
+    def __init__(self, after, cancel, notify, clock=time.time):
+        self.after = after
+        self.cancel = cancel
+        self.notify = notify
+        self.clock = clock
+        
+        self.store = None
+        # (提醒时间戳, 任务ID, 截止日期)
+        self._heap = []
+        # 当前定时器的标识和对应的提醒时间
+        self._timer = None
+        self._armed_at = None
+    
+    def remind_time(self, task):
+        """返回任务的提醒时间戳，没有截止日期或已完成时返回None"""
+        if task["completed"]:
+            return None
+        day = parse_due_date(task["due_date"])
+        if day is None:
+            return None
+        return datetime.combine(day, self.REMIND_AT).timestamp()
+    
+    def attach(self, store):
+        """为任务存储中尚未到提醒时间的任务建堆，并开始跟踪它的修改"""
+        self.store = store
+        now = self.clock()
+        self._heap = []
+        for task in store:
+            when = self.remind_time(task)
+            if when is not None and when > now:
+                self._heap.append((when, task["id"], task["due_date"]))
+        heapq.heapify(self._heap)
+        
+        store.subscribe(self.record)
+        self._arm()
+    
+    def record(self, change):
+        """任务新增或截止日期、完成状态变化时把新的提醒时间入堆"""
+        op = change["op"]
+        if op == "batch":
+            for item in change["changes"]:
+                self.record(item)
+            return
+        if op == "add":
+            task = change["task"]
+        elif op == "update" and ("due_date" in change["fields"] or "completed" in change["fields"]):
+            task = self.store.get(change["id"])
+        else:
+            # 删除的任务在到达堆顶时丢弃
+            return
+        
+        # 同一事务中之后被删除的任务
+        if task is None:
+            return
+        
+        when = self.remind_time(task)
+        if when is None or when <= self.clock():
+            return
+        heapq.heappush(self._heap, (when, task["id"], task["due_date"]))
+        
+        # 失效条目过多时重新建堆
+        if len(self._heap) > 2 * len(self.store) + 64:
+            self._heap = [entry for entry in set(self._heap) if self._is_current(entry)]
+            heapq.heapify(self._heap)
+        
+        # 只有堆顶变早时才需要重新设置定时器
+        if self._armed_at is None or when < self._armed_at:
+            self._arm()
+    
+    def _is_current(self, entry):
+        """堆中的条目是否仍然有效"""
+        when, task_id, due_date = entry
+        task = self.store.get(task_id)
+        return task is not None and not task["completed"] and task["due_date"] == due_date
+    
+    def _arm(self):
+        """丢弃堆顶的失效条目，为新的堆顶设置定时器"""
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        
+        if self._timer is not None:
+            self.cancel(self._timer)
+            self._timer = None
+            self._armed_at = None
+        if not self._heap:
+            return
+        
+        when = self._heap[0][0]
+        delay = min(max(when - self.clock(), 0), self.MAX_DELAY)
+        self._timer = self.after(int(delay * 1000), self._fire)
+        self._armed_at = when
+    
+    def _fire(self):
+        """定时器到期：提醒所有已经到时间的任务，再等待下一个提醒"""
+        self._timer = None
+        self._armed_at = None
+        
+        now = self.clock()
+        due = []
+        seen = set()
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if entry[1] not in seen and self._is_current(entry):
+                due.append(self.store.get(entry[1]))
+                seen.add(entry[1])
+        
+        if due:
+            self.notify(due)
+        self._arm()
+    
+    def close(self):
+        """取消定时器"""
+        if self._timer is not None:
+            self.cancel(self._timer)
+            self._timer = None
+            self._armed_at = None
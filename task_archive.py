@@ -0,0 +1,202 @@
+"""已完成任务的归档
+
+归档的任务按归档顺序追加到 archive 目录中压缩的分段文件（JSON Lines），启动时不读取。
+每个分段最多 SEGMENT_TASKS 个任务，每次归档在当前分段末尾追加一个新的 gzip（或 xz）成员，
+已经写入的内容不再改写。index.json 记录各分段的任务数和文件大小，分页读取时只解压需要的分段。
+不依赖 tkinter。
+"""
+import gzip
+import json
+import lzma
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+from task_store import Task
+from task_storage import FileLock, file_stat
+
+
+# 压缩方式 -> 分段文件扩展名
+COMPRESSIONS = {
+    "gzip": ".jsonl.gz",
+    "lzma": ".jsonl.xz"
+}
+
+# gzip 的默认级别 9 比级别 6 慢得多，文件只小约 8%
+GZIP_LEVEL = 6
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _compress(name, data):
+    """按分段文件的扩展名压缩数据，返回一个完整的 gzip 成员或 xz 流"""
+    if name.endswith(COMPRESSIONS["gzip"]):
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    return lzma.compress(data)
+
+
+def _open_segment(path):
+    """以文本方式打开分段文件，依次读取其中所有的压缩成员"""
+    if path.endswith(COMPRESSIONS["gzip"]):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return lzma.open(path, "rt", encoding="utf-8")
+
+
+class TaskArchive:
+    """归档的任务
+    
+    append 追加任务，page 按归档时间从新到旧分页读取。多个进程共用归档目录时，
+    追加过程持有 archive.lock；index.json 的修改时间变化后重新读取。
+    上次追加中途退出时，分段的实际大小与 index.json 不一致，这个分段会被重新计数并不再追加。
+    """
+    
+    SEGMENT_TASKS = 1000
+    
+    # 缓存最近解压的分段数
+    CACHE_SEGMENTS = 4
+    
+    def __init__(self, directory, compression="gzip"):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"不支持的压缩方式: {compression}")
+        self.directory = directory
+        self.compression = compression
+        self.index_file = os.path.join(directory, "index.json")
+        self.lock = FileLock(os.path.join(directory, "archive.lock"))
+        
+        # [{"file": 文件名, "count": 任务数, "size": 字节数, "closed": 是否不再追加}]
+        self.segments = []
+        self._index_stat = None
+        # 文件名 -> 解压后的任务列表
+        self._cache = OrderedDict()
+    
+    def __len__(self):
+        self.refresh()
+        return sum(segment["count"] for segment in self.segments)
+    
+    def refresh(self):
+        """index.json 变化时重新读取"""
+        stat = file_stat(self.index_file)
+        if stat == self._index_stat:
+            return
+        
+        segments = []
+        if stat is not None:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                segments = json.load(f)["segments"]
+        
+        # 任务数变化的分段需要重新解压
+        counts = {segment["file"]: segment["count"] for segment in segments}
+        for name in list(self._cache):
+            if counts.get(name) != len(self._cache[name]):
+                del self._cache[name]
+        
+        self.segments = segments
+        self._index_stat = stat
+        self._check_last_segment()
+    
+    def _check_last_segment(self):
+        """最后一个分段的实际大小与记录不一致时重新计数，并不再向它追加"""
+        if not self.segments:
+            return
+        segment = self.segments[-1]
+        path = os.path.join(self.directory, segment["file"])
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == segment["size"]:
+            return
+        
+        self._cache.pop(segment["file"], None)
+        segment["count"] = len(self._read_segment(segment["file"]))
+        segment["size"] = size
+        segment["closed"] = True
+    
+    def _write_index(self):
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segments}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.index_file)
+        self._index_stat = file_stat(self.index_file)
+    
+    def append(self, tasks):
+        """把任务追加到归档，记录归档时间，返回追加的任务数"""
+        archived_at = datetime.now().isoformat(timespec="seconds")
+        lines = []
+        for task in tasks:
+            record = task.to_dict() if isinstance(task, Task) else dict(task)
+            record["archived_at"] = archived_at
+            lines.append(_encoder.encode(record) + "\n")
+        if not lines:
+            return 0
+        
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            self.refresh()
+            extension = COMPRESSIONS[self.compression]
+            start = 0
+            while start < len(lines):
+                segment = self.segments[-1] if self.segments else None
+                if segment is None or segment.get("closed") or segment["count"] >= self.SEGMENT_TASKS:
+                    segment = {"file": f"{len(self.segments) + 1:06d}{extension}", "count": 0, "size": 0}
+                    self.segments.append(segment)
+                
+                chunk = lines[start:start + self.SEGMENT_TASKS - segment["count"]]
+                path = os.path.join(self.directory, segment["file"])
+                # 每次追加一个完整的压缩成员，解压时各成员依次连接
+                data = _compress(segment["file"], "".join(chunk).encode("utf-8"))
+                with open(path, "ab") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                
+                segment["count"] += len(chunk)
+                segment["size"] = os.path.getsize(path)
+                self._cache.pop(segment["file"], None)
+                start += len(chunk)
+            
+            self._write_index()
+        return len(lines)
+    
+    def _read_segment(self, name):
+        """解压一个分段，返回其中的任务（字典）；结尾不完整时只返回完整的部分"""
+        cached = self._cache.get(name)
+        if cached is not None:
+            self._cache.move_to_end(name)
+            return cached
+        
+        tasks = []
+        try:
+            with _open_segment(os.path.join(self.directory, name)) as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    tasks.append(json.loads(line))
+        except (OSError, EOFError, ValueError, lzma.LZMAError):
+            pass
+        
+        self._cache[name] = tasks
+        while len(self._cache) > self.CACHE_SEGMENTS:
+            self._cache.popitem(last=False)
+        return tasks
+    
+    def page(self, number, size=50):
+        """返回第 number 页（从0开始）的任务，按归档时间从新到旧排列，只解压这一页所在的分段"""
+        self.refresh()
+        total = sum(segment["count"] for segment in self.segments)
+        end = total - number * size
+        start = max(0, end - size)
+        if end <= 0:
+            return []
+        
+        tasks = []
+        offset = 0
+        for segment in self.segments:
+            count = segment["count"]
+            if offset + count > start and offset < end:
+                records = self._read_segment(segment["file"])[:count]
+                tasks.extend(records[max(0, start - offset):end - offset])
+            offset += count
+            if offset >= end:
+                break
+        tasks.reverse()
+        return tasks
@@ -0,0 +1,168 @@
+"""二进制任务快照
+
+文件由固定长度的文件头、定长记录表和字符串堆组成：
+
+    文件头   魔数、版本、任务数、字符串堆的起始位置
+    记录表   每个任务一条定长记录：ID、截止日期序数、标志位，以及排序键、描述、其他字段在字符串堆中的位置和长度
+    字符串堆 UTF-8 编码的排序键和描述；无法解析的截止日期和其他字段以 JSON 保存
+
+通过 mmap 打开后只需读取文件头，第 n 个任务的位置可以直接算出，只在访问时才解码。
+不依赖 tkinter。
+"""
+import json
+import mmap
+import os
+import struct
+from datetime import date
+
+from perf import MONITOR
+from task_store import Task, parse_due_date
+
+
+MAGIC = b"TODOBIN\x00"
+VERSION = 1
+
+# 魔数、版本、保留、任务数、字符串堆的起始位置
+HEADER = struct.Struct("<8sHHIQQ")
+
+# ID、截止日期序数（0 表示没有截止日期）、标志位、排序键/描述/其他字段的 (偏移, 长度)
+RECORD = struct.Struct("<qiB3xIIIIII")
+
+# 标志位
+FLAG_COMPLETED = 1
+
+
+def _encode_task(task, heap, heap_size):
+    """返回任务的记录和字符串堆中新增的字节"""
+    extra = {key: task[key] for key in task if key not in Task.FIELDS}
+    ordinal = 0
+    if task["due_date"]:
+        day = parse_due_date(task["due_date"])
+        if day is None:
+            extra["due_date"] = task["due_date"]
+        else:
+            ordinal = day.toordinal()
+    
+    pos = task["pos"].encode("utf-8")
+    text = task["task"].encode("utf-8")
+    extra = json.dumps(extra, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if extra else b""
+    heap.append(pos + text + extra)
+    return RECORD.pack(task["id"], ordinal, FLAG_COMPLETED if task["completed"] else 0,
+                       heap_size, len(pos), heap_size + len(pos), len(text),
+                       heap_size + len(pos) + len(text), len(extra))
+
+
+def encode_snapshot(tasks):
+    """把按排序键排列的任务编码为二进制快照，返回 bytes"""
+    records = []
+    heap = []
+    heap_size = 0
+    for task in tasks:
+        records.append(_encode_task(task, heap, heap_size))
+        heap_size += len(heap[-1])
+    
+    heap_offset = HEADER.size + RECORD.size * len(records)
+    header = HEADER.pack(MAGIC, VERSION, 0, 0, len(records), heap_offset)
+    return b"".join([header] + records + heap)
+
+
+def write_binary_snapshot(path, tasks, temp_suffix=".saving"):
+    """把任务写入临时文件并落盘，再原子替换为目标文件"""
+    data = encode_snapshot(tasks)
+    temp_file = path + temp_suffix
+    with open(temp_file, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+    if MONITOR.enabled:
+        MONITOR.add_bytes("binary", len(data))
+
+
+class BinarySnapshot:
+    """以 mmap 打开的二进制快照，可以像只读列表一样按下标或切片访问任务
+    
+    打开时只读取文件头，任务在访问时才解码，因此可以在加载完成前直接交给虚拟列表显示。
+    mmap 的读取是线程安全的，后台线程解码全部任务时主线程仍然可以访问。
+    """
+    
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError("任务数据文件不完整")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        
+        magic, version, _, _, self.count, self.heap_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("不是二进制任务数据文件")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"不支持的任务数据版本: {version}")
+        if self.heap_offset != HEADER.size + RECORD.size * self.count or self.heap_offset > size:
+            self.close()
+            raise ValueError("任务数据文件不完整")
+        
+        # 截止日期序数 -> 日期字符串，相同的日期只转换一次
+        self._dates = {0: ""}
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("任务下标超出范围")
+        return self._decode(index)
+    
+    def __iter__(self):
+        for index in range(self.count):
+            yield self._decode(index)
+    
+    def _decode(self, index):
+        """解码第 index 条记录"""
+        (task_id, ordinal, flags, pos_offset, pos_length, text_offset, text_length,
+         extra_offset, extra_length) = RECORD.unpack_from(self._map, HEADER.size + RECORD.size * index)
+        
+        heap = self.heap_offset
+        due_date = self._dates.get(ordinal)
+        if due_date is None:
+            due_date = self._dates[ordinal] = date.fromordinal(ordinal).isoformat()
+        
+        extra = None
+        if extra_length:
+            extra = json.loads(self._map[heap + extra_offset:heap + extra_offset + extra_length].decode("utf-8"))
+            due_date = extra.pop("due_date", due_date)
+        
+        return Task(task_id,
+                    self._map[heap + text_offset:heap + text_offset + text_length].decode("utf-8"),
+                    due_date,
+                    bool(flags & FLAG_COMPLETED),
+                    self._map[heap + pos_offset:heap + pos_offset + pos_length].decode("utf-8"),
+                    extra)
+    
+    def close(self):
+        """关闭 mmap 和文件"""
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+def read_binary_snapshot(path):
+    """读取二进制快照中的全部任务，文件不存在时返回空列表"""
+    if not os.path.exists(path):
+        return []
+    snapshot = BinarySnapshot(path)
+    try:
+        return list(snapshot)
+    finally:
+        snapshot.close()
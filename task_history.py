@@ -0,0 +1,114 @@
+"""撤销和重做
+
+记录任务存储每次修改附带的逆向记录，不依赖 tkinter。
+"""
+from collections import deque
+from contextlib import contextmanager
+
+from task_store import apply_change
+
+
+def change_size(change):
+    """返回变更记录包含的单条修改数，批量记录按其中的修改计算"""
+    if change["op"] == "batch":
+        return sum(change_size(item) for item in change["changes"])
+    return 1
+
+
+class UndoHistory:
+    """撤销和重做历史
+    
+    每次修改（包括事务中的批量修改）作为一步，只保存撤销它所需的逆向记录：
+    修改字段的旧值、被删除的任务或新增任务的ID，不复制整个任务列表。
+    撤销时通过 apply_change 重新应用逆向记录，与普通修改一样通知存储后端、搜索索引等监听函数，
+    应用时产生的逆向记录正好用于重做。
+    
+    历史最多保留 max_steps 步，且总共不超过 max_changes 条修改，超出时丢弃最早的步骤，
+    最近一步总是保留。
+    """
+    
+    MAX_STEPS = 100
+    MAX_CHANGES = 50000
+    
+    def __init__(self, store, max_steps=MAX_STEPS, max_changes=MAX_CHANGES):
+        self.store = store
+        self.max_steps = max_steps
+        self.max_changes = max_changes
+        # (逆向记录, 修改数)
+        self._undo = deque()
+        self._redo = deque()
+        self._size = 0
+        # 撤销或重做时，新产生的逆向记录放入的栈
+        self._target = None
+        self._paused = False
+        
+        store.subscribe(self.record, inverse=True)
+    
+    @contextmanager
+    def paused(self):
+        """期间的修改不记录，不能撤销；已有的步骤中涉及这些任务的部分在撤销时不起作用"""
+        self._paused = True
+        try:
+            yield
+        finally:
+            self._paused = False
+    
+    def record(self, change, inverse):
+        """记录一次修改的逆向记录，新的修改会清空重做历史"""
+        if self._paused:
+            return
+        if self._target is not None:
+            self._push(self._target, inverse)
+            return
+        
+        # 先清空重做历史，免得它占着限制挤掉较早的撤销步骤
+        while self._redo:
+            self._size -= self._redo.pop()[1]
+        self._push(self._undo, inverse)
+    
+    def _push(self, stack, inverse):
+        """把逆向记录压入栈，超出限制时丢弃最早的步骤"""
+        size = change_size(inverse)
+        stack.append((inverse, size))
+        self._size += size
+        
+        while len(stack) > self.max_steps:
+            self._size -= stack.popleft()[1]
+        
+        # 修改总数超出时先丢弃本栈最早的步骤，只剩刚压入的一步时再丢弃另一个栈的
+        other = self._redo if stack is self._undo else self._undo
+        while self._size > self.max_changes:
+            if len(stack) > 1:
+                self._size -= stack.popleft()[1]
+            elif other:
+                self._size -= other.popleft()[1]
+            else:
+                break
+    
+    def _replay(self, source, target):
+        """应用 source 栈顶的逆向记录，产生的逆向记录压入 target 栈"""
+        if not source:
+            return False
+        inverse, size = source.pop()
+        self._size -= size
+        
+        self._target = target
+        try:
+            apply_change(self.store, inverse)
+        finally:
+            self._target = None
+        return True
+    
+    def undo(self):
+        """撤销最近一步修改，没有可撤销的修改时返回False"""
+        return self._replay(self._undo, self._redo)
+    
+    def redo(self):
+        """重做最近一次撤销的修改，没有可重做的修改时返回False"""
+        return self._replay(self._redo, self._undo)
+    
+    def clear(self):
+        """清空撤销和重做历史"""
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
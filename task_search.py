@@ -0,0 +1,172 @@
+"""任务全文搜索
+
+在内存中维护任务描述的倒排索引，不依赖 tkinter。
+"""
+import re
+from bisect import bisect_left
+
+
+# 连续的中日韩文字，以及其他文字组成的单词
+CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+TOKEN_PATTERN = re.compile(f"([{CJK_RANGES}]+)|([^\\W_{CJK_RANGES}]+)")
+
+
+def tokenize(text):
+    """把文本切分为 (单词列表, 中文片段列表)，均为小写"""
+    words = []
+    runs = []
+    for run, word in TOKEN_PATTERN.findall(text.lower()):
+        if run:
+            runs.append(run)
+        else:
+            words.append(word)
+    return words, runs
+
+
+def index_terms(text):
+    """返回文本需要建立索引的词项
+    
+    单词以 "w:" 开头；中文片段的每个字以 "c:" 开头，每两个相邻的字以 "b:" 开头。
+    """
+    words, runs = tokenize(text)
+    terms = {"w:" + word for word in words}
+    for run in runs:
+        terms.update("c:" + char for char in run)
+        terms.update("b:" + run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+class SearchIndex:
+    """任务描述的倒排索引
+    
+    创建时为任务存储中的全部任务建立索引，之后通过 subscribe 收到的变更记录增量更新。
+    查询时每个词都必须命中：单词按前缀匹配，以便边输入边搜索；中文片段用二元组的倒排表
+    求交集得到候选任务，再只对候选任务检查是否真正包含该片段。
+    """
+    
+    # 一次修改中出现或消失的单词超过这么多时重新排序整个单词表
+    REBUILD_WORDS = 1000
+    
+    def __init__(self, store):
+        self.store = store
+        # 词项 -> 任务ID集合
+        self._postings = {}
+        # 任务ID -> 该任务的词项，用于修改和删除时撤销
+        self._terms = {}
+        # 排好序的单词，用于前缀查找
+        self._words = []
+        
+        # 先收集全部词项，最后对单词只排序一次
+        for task in store:
+            self._add(task, [])
+        self._rebuild_words()
+        store.subscribe(self.record)
+    
+    def __len__(self):
+        return len(self._terms)
+    
+    def _add(self, task, changed):
+        """为一个任务建立索引，新出现的单词加入 changed"""
+        terms = index_terms(task.task)
+        self._terms[task.id] = terms
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                if term.startswith("w:"):
+                    changed.append(term[2:])
+            postings.add(task.id)
+    
+    def _remove(self, task_id, changed):
+        """删除一个任务的索引，不再出现的单词加入 changed"""
+        for term in self._terms.pop(task_id, ()):
+            postings = self._postings[term]
+            postings.discard(task_id)
+            if not postings:
+                del self._postings[term]
+                if term.startswith("w:"):
+                    changed.append(term[2:])
+    
+    def _rebuild_words(self):
+        """按倒排表重新生成有序单词表"""
+        self._words = sorted(term[2:] for term in self._postings if term.startswith("w:"))
+    
+    def _update_words(self, changed):
+        """把出现或消失的单词同步到有序单词表"""
+        changed = set(changed)
+        if len(changed) > self.REBUILD_WORDS:
+            self._rebuild_words()
+            return
+        words = self._words
+        for word in changed:
+            # 同一批修改中可能先消失又出现，以倒排表为准
+            index = bisect_left(words, word)
+            listed = index < len(words) and words[index] == word
+            if "w:" + word in self._postings:
+                if not listed:
+                    words.insert(index, word)
+            elif listed:
+                del words[index]
+    
+    def record(self, change):
+        """根据任务存储的变更记录更新索引"""
+        changed = []
+        self._record(change, changed)
+        if changed:
+            self._update_words(changed)
+    
+    def _record(self, change, changed):
+        op = change["op"]
+        if op == "add":
+            self._add(change["task"], changed)
+        elif op == "update":
+            # 同一事务中之后被删除的任务不再建立索引
+            task = self.store.get(change["id"])
+            if "task" in change["fields"] and task:
+                self._remove(change["id"], changed)
+                self._add(task, changed)
+        elif op == "remove":
+            for task_id in change["ids"]:
+                self._remove(task_id, changed)
+        elif op == "batch":
+            for item in change["changes"]:
+                self._record(item, changed)
+    
+    def _prefix_postings(self, prefix):
+        """返回以 prefix 开头的所有单词的任务ID集合"""
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + "\U0010ffff", start)
+        if end - start == 1:
+            return self._postings["w:" + self._words[start]]
+        return set().union(*(self._postings["w:" + word] for word in self._words[start:end]))
+    
+    def match_ids(self, query):
+        """返回描述中包含查询的所有词的任务ID集合，查询为空时返回None"""
+        words, runs = tokenize(query)
+        if not words and not runs:
+            return None
+        
+        groups = [self._prefix_postings(word) for word in words]
+        for run in runs:
+            if len(run) == 1:
+                groups.append(self._postings.get("c:" + run, set()))
+            else:
+                groups.extend(self._postings.get("b:" + run[i:i + 2], set()) for i in range(len(run) - 1))
+        
+        # 从最小的集合开始求交集
+        groups.sort(key=len)
+        ids = groups[0].intersection(*groups[1:])
+        
+        # 二元组全部命中不代表片段连续出现，逐个检查候选任务
+        long_runs = [run for run in runs if len(run) > 2]
+        if long_runs:
+            ids = {task_id for task_id in ids
+                   if all(run in self.store.get(task_id)["task"].lower() for run in long_runs)}
+        return ids
+    
+    def search(self, query):
+        """按列表顺序返回匹配查询的任务，查询为空时返回全部任务"""
+        ids = self.match_ids(query)
+        if ids is None:
+            return list(self.store)
+        return self.store.ordered(ids)
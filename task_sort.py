@@ -0,0 +1,213 @@
+"""按列排序的任务视图
+
+排序值在第一次用到时为每个任务计算一次并缓存，之后重新排序只比较缓存的值：
+截止日期为日期序数，状态为完成标志，任务描述为本地化的比较键（locale.strxfrm）。
+不依赖 tkinter。
+"""
+import locale
+import unicodedata
+from task_store import parse_due_date, task_key
+
+
+# 可以排序的列 -> 决定排序键的任务字段
+SORT_COLUMNS = {
+    "task": "task",
+    "due_date": "due_date",
+    "status": "completed"
+}
+
+
+def collation_key(text):
+    """返回按当前区域设置比较文本的键，全角半角和大小写不同的文本视为相同"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    try:
+        return locale.strxfrm(text)
+    except ValueError:
+        # 文本中含有 NUL 字符
+        return text
+
+
+def sort_value(column, task):
+    """返回任务在某一列上的排序值，没有截止日期时返回None"""
+    if column == "due_date":
+        day = parse_due_date(task.due_date)
+        return day.toordinal() if day else None
+    if column == "status":
+        return int(task.completed)
+    return collation_key(task.task)
+
+
+class SortedTasks:
+    """按某一列排序的任务序列，可以像只读列表一样按下标、切片访问和遍历
+    
+    排序是稳定的：值相同的任务保持列表中的手动顺序（排序键 pos），没有截止日期的任务
+    无论升序还是降序都排在最后。column 为 None 时按手动顺序，直接返回任务存储中的任务。
+    
+    通过 subscribe 收到变更记录后，被修改的任务从有序列表中删除，再用二分查找插回新的位置，
+    不重新排序全部任务；一次修改的任务较多时在下次访问时整体重新排序。
+    """
+    
+    # 一次修改超过这么多任务时整体重新排序
+    REBUILD_CHANGES = 500
+    
+    def __init__(self, store, column=None, descending=False):
+        self.store = store
+        self.column = None
+        self.descending = False
+        # 列 -> {任务ID: 排序值}
+        self._values = {column: {} for column in SORT_COLUMNS}
+        # 按当前顺序排列的任务
+        self._tasks = []
+        # 任务ID -> 放入有序列表时的任务，修改后用它找到原来的位置
+        self._placed = {}
+        self._dirty = True
+        
+        store.subscribe(self.record)
+        self.set_order(column, descending)
+    
+    def set_order(self, column, descending=False):
+        """设置排序的列和方向，column 为 None 时恢复手动顺序"""
+        if column is not None and column not in SORT_COLUMNS:
+            raise ValueError(f"不支持排序的列: {column}")
+        if (column, descending) != (self.column, self.descending):
+            self.column = column
+            self.descending = descending
+            self._dirty = True
+    
+    def __len__(self):
+        return len(self.store)
+    
+    def __getitem__(self, index):
+        return self._view()[index]
+    
+    def __iter__(self):
+        return iter(self._view())
+    
+    def _view(self):
+        if self.column is None:
+            return self.store.tasks
+        if self._dirty:
+            self._rebuild()
+        return self._tasks
+    
+    def _cached_values(self, tasks):
+        """返回当前列的排序值缓存，缓存中没有的任务计算一次"""
+        column = self.column
+        values = self._values[column]
+        for task in tasks:
+            if task.id not in values:
+                values[task.id] = sort_value(column, task)
+        return values
+    
+    def _sorted(self, tasks):
+        """按缓存的排序值稳定排序按 pos 排列的任务，返回新的列表"""
+        values = self._cached_values(tasks)
+        result = [task for task in tasks if values[task.id] is not None]
+        result.sort(key=lambda task: values[task.id], reverse=self.descending)
+        if len(result) < len(tasks):
+            result.extend(task for task in tasks if values[task.id] is None)
+        return result
+    
+    def _rebuild(self):
+        """按缓存的排序值整体排序"""
+        tasks = self.store.tasks
+        self._tasks = self._sorted(tasks)
+        self._placed = {task.id: task for task in tasks}
+        self._dirty = False
+    
+    def _before(self, a, b):
+        """任务 a 是否排在 b 前面"""
+        values = self._values[self.column]
+        value_a = values[a.id]
+        value_b = values[b.id]
+        if value_a != value_b:
+            if value_a is None or value_b is None:
+                return value_b is None
+            return value_a > value_b if self.descending else value_a < value_b
+        return (a.pos, a.id) < (b.pos, b.id)
+    
+    def _bisect(self, task):
+        """二分查找任务在有序列表中的位置"""
+        tasks = self._tasks
+        low, high = 0, len(tasks)
+        while low < high:
+            middle = (low + high) // 2
+            if self._before(tasks[middle], task):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def record(self, change):
+        """根据任务存储的变更记录更新排序值缓存和有序列表"""
+        changed = []
+        stale = []
+        self._collect(change, changed, stale)
+        
+        rebuild = self._dirty or self.column is None or len(changed) > self.REBUILD_CHANGES
+        if not rebuild:
+            # 先按修改前的排序值删除，同一事务中修改多次的任务只处理一次
+            changed = list(dict.fromkeys(changed))
+            for task_id in changed:
+                old = self._placed.pop(task_id, None)
+                if old is not None:
+                    del self._tasks[self._bisect(old)]
+        
+        for column, task_id in stale:
+            self._values[column].pop(task_id, None)
+        
+        if rebuild:
+            self._dirty = True
+            return
+        for task_id in changed:
+            task = self.store.get(task_id)
+            if task is not None:
+                self._cached_values([task])
+                self._tasks.insert(self._bisect(task), task)
+                self._placed[task_id] = task
+    
+    def _collect(self, change, changed, stale):
+        """把受影响的任务ID加入 changed，失效的 (列, 任务ID) 加入 stale"""
+        op = change["op"]
+        if op == "add":
+            changed.append(change["task"]["id"])
+        elif op == "update":
+            for column, field in SORT_COLUMNS.items():
+                if field in change["fields"]:
+                    stale.append((column, change["id"]))
+            changed.append(change["id"])
+        elif op == "remove":
+            for task_id in change["ids"]:
+                stale.extend((column, task_id) for column in SORT_COLUMNS)
+            changed.extend(change["ids"])
+        elif op == "batch":
+            for item in change["changes"]:
+                self._collect(item, changed, stale)
+    
+    def sort(self, tasks):
+        """按当前顺序排列任务存储中的部分任务（如筛选结果），返回新的列表"""
+        tasks = sorted(tasks, key=task_key)
+        if self.column is None:
+            return tasks
+        return self._sorted(tasks)
+    
+    def neighbor(self, task_id, offset):
+        """返回在当前顺序中与任务相邻、排序值相同的任务ID，没有时返回None
+        
+        排序时上移和下移只在值相同的任务之间调整手动顺序。
+        """
+        if self.column is None:
+            return None
+        self._view()
+        task = self._placed.get(task_id)
+        if task is None:
+            return None
+        
+        target = self._bisect(task) + offset
+        if not 0 <= target < len(self._tasks):
+            return None
+        other = self._tasks[target]
+        values = self._values[self.column]
+        if values[other.id] != values[task_id]:
+            return None
+        return other.id
@@ -0,0 +1,1285 @@
+"""任务数据持久化
+
+不依赖 tkinter，可以在没有图形界面的环境中使用。
+"""
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+from perf import MONITOR
+from task_binary import BinarySnapshot, read_binary_snapshot, write_binary_snapshot
+from task_store import Task, TaskStore, apply_change, diff_tasks, key_between, task_to_json
+
+
+# 流式加载时第一批和之后每批的任务数
+FIRST_BATCH_SIZE = 100
+BATCH_SIZE = 5000
+
+# 存储后端："json" 使用 todos.json，"sqlite" 使用 todos.db，"binary" 使用二进制快照 todos.bin
+# （sqlite 和 binary 首次使用时自动从 todos.json 迁移）。界面和命令行模式都按这里的设置打开数据
+STORAGE_BACKEND = "json"
+
+# JSON 后端以追加日志的方式保存修改；关闭后由后台线程完整重写 todos.json
+JOURNAL_MODE = True
+
+
+def read_snapshot(path, on_batch=None):
+    """读取 todos.json 格式的任务快照，文件不存在时返回空列表
+    
+    指定 on_batch 时逐个解析任务，每解析出一批就以 (本批任务, 进度) 调用 on_batch，
+    进度为 0 到 1 之间的小数；第一批只包含一屏左右的任务，以便尽早显示。
+    """
+    if not os.path.exists(path):
+        return []
+    if on_batch is None:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    tasks = []
+    batch = []
+    batch_size = FIRST_BATCH_SIZE
+    total = os.path.getsize(path) or 1
+    for task, done in iter_snapshot(path):
+        tasks.append(task)
+        batch.append(task)
+        if len(batch) >= batch_size:
+            on_batch(batch, done / total)
+            batch = []
+            batch_size = BATCH_SIZE
+    on_batch(batch, 1.0)
+    return tasks
+
+
+def iter_snapshot(path, chunk_size=1024 * 1024):
+    """逐块读取文件并逐个解析顶层数组中的任务，产生 (任务, 已读取的字节数)"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    whitespace = " \t\r\n"
+    
+    with open(path, "rb") as f:
+        buffer = ""
+        pos = 0
+        done = 0
+        eof = False
+        
+        def fill():
+            """读取下一块数据，丢弃已经解析过的部分，返回是否还有数据"""
+            nonlocal buffer, pos, done, eof
+            if eof:
+                return False
+            chunk = f.read(chunk_size)
+            done += len(chunk)
+            eof = not chunk
+            buffer = buffer[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+            return True
+        
+        def next_char():
+            """跳过空白，返回下一个字符，文件结束时返回空字符串"""
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in whitespace:
+                    pos += 1
+                if pos < len(buffer) or not fill():
+                    return buffer[pos:pos + 1]
+        
+        if next_char() != "[":
+            raise json.JSONDecodeError("任务数据应为数组", buffer, pos)
+        pos += 1
+        if next_char() == "]":
+            return
+        
+        while True:
+            # 数据不完整时继续读取，直到能解析出一个完整的任务
+            next_char()
+            while True:
+                try:
+                    task, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if not fill():
+                        raise
+                    continue
+                if end < len(buffer) or eof:
+                    break
+                fill()
+            pos = end
+            yield task, done
+            
+            separator = next_char()
+            pos += 1
+            if separator == "]":
+                return
+            if not separator:
+                raise json.JSONDecodeError("任务数据不完整", buffer, pos - 1)
+            if separator != ",":
+                raise json.JSONDecodeError("任务之间缺少逗号", buffer, pos - 1)
+
+
+def write_snapshot(path, tasks, temp_suffix=".saving"):
+    """把任务写入临时文件并落盘，再原子替换为目标文件，避免写到一半时文件损坏"""
+    temp_file = path + temp_suffix
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(tasks, f, ensure_ascii=False, indent=2, default=task_to_json)
+        f.flush()
+        os.fsync(f.fileno())
+        if MONITOR.enabled:
+            MONITOR.add_bytes("snapshot", f.tell())
+    os.replace(temp_file, path)
+
+
+def read_changes(path, repair=False):
+    """读取日志文件中的变更记录
+    
+    进程在追加过程中退出时最后一行可能不完整，这样的记录直接丢弃；
+    repair 为 True 时同时截掉这部分内容，避免之后追加的记录接在残缺的行后面。
+    """
+    if not os.path.exists(path):
+        return []
+    
+    changes = []
+    valid_size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                changes.append(json.loads(line))
+            except ValueError:
+                break
+            valid_size += len(line)
+    
+    if repair and valid_size < os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(valid_size)
+    return changes
+
+
+def parse_changes(data):
+    """解析日志中完整的几行记录（bytes）"""
+    return [json.loads(line) for line in data.splitlines() if line.strip()]
+
+
+class ExternalChangeError(Exception):
+    """写入前发现数据文件已被其他进程修改"""
+
+
+def _lock_file(f, blocking):
+    """锁定已打开的锁文件，不等待且已被锁定时返回False"""
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                # LK_LOCK 重试约 10 秒后失败，需要等待时继续重试
+                if not blocking:
+                    raise
+    except OSError:
+        if blocking:
+            raise
+        return False
+
+
+def _unlock_file(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """跨进程的建议锁
+    
+    锁定数据目录中的锁文件，只对同样使用该锁的程序（本应用的其他窗口和命令行模式）有效。
+    同一进程中的线程之间也互斥，同一线程可以重复获取。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._mutex = threading.RLock()
+        self._depth = 0
+        self._file = None
+    
+    def acquire(self, blocking=True):
+        """获取锁，blocking 为 False 时不等待，返回是否成功"""
+        if not self._mutex.acquire(blocking):
+            return False
+        if self._depth == 0:
+            try:
+                self._file = self._open_locked(blocking)
+            except BaseException:
+                self._mutex.release()
+                raise
+            if self._file is None:
+                self._mutex.release()
+                return False
+        self._depth += 1
+        return True
+    
+    def _open_locked(self, blocking):
+        """打开并锁定锁文件，已被其他进程锁定且不等待时返回None"""
+        f = open(self.path, "a+b")
+        try:
+            if _lock_file(f, blocking):
+                return f
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+        return None
+    
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                _unlock_file(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+        self._mutex.release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+def file_stat(path):
+    """返回文件的 (修改时间, 大小)，文件不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path):
+    """返回文件内容的哈希，文件不存在时返回None"""
+    digest = hashlib.blake2b()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.digest()
+
+
+class FileState:
+    """文件在本进程最后一次读写时的修改时间、大小和内容哈希
+    
+    changed 先比较修改时间和大小，只有它们变化时才计算哈希，内容没有变化时不算修改。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.stat = None
+        self.digest = None
+    
+    def refresh(self):
+        """记录文件的当前状态"""
+        self.stat = file_stat(self.path)
+        self.digest = file_digest(self.path)
+    
+    def changed(self):
+        """文件在 refresh 之后是否被修改"""
+        stat = file_stat(self.path)
+        if stat == self.stat:
+            return False
+        if file_digest(self.path) == self.digest:
+            self.stat = stat
+            return False
+        return True
+
+
+def write_locked(lock, state, write, path, tasks):
+    """持有文件锁写入快照，文件在上次读写之后被其他进程修改时不覆盖，抛出 ExternalChangeError"""
+    with lock:
+        if state.changed():
+            raise ExternalChangeError("数据文件已被其他程序修改，合并后会重新保存")
+        write(path, tasks)
+        state.refresh()
+
+
+def _renumber_change(change, renamed):
+    """返回按 renamed（旧ID -> 新ID）改写任务ID后的变更记录"""
+    op = change["op"]
+    if op == "add" and change["task"]["id"] in renamed:
+        return {"op": "add", "task": Task.from_dict(change["task"]).replace(id=renamed[change["task"]["id"]])}
+    if op == "update" and change["id"] in renamed:
+        return {**change, "id": renamed[change["id"]]}
+    if op == "remove" and any(task_id in renamed for task_id in change["ids"]):
+        return {"op": "remove", "ids": [renamed.get(task_id, task_id) for task_id in change["ids"]]}
+    if op == "batch":
+        return {"op": "batch", "changes": [_renumber_change(item, renamed) for item in change["changes"]]}
+    return change
+
+
+def _rebase_change(store, change, renamed):
+    """把本进程的一条变更应用到 store 上，返回改写后的记录
+    
+    新任务的ID已存在时换用新的ID（记入 renamed，之后的记录一起改写），排序键已被其他任务使用时
+    换用紧跟在后面的新排序键。
+    """
+    op = change["op"]
+    if op == "batch":
+        return {"op": "batch", "changes": [_rebase_change(store, item, renamed) for item in change["changes"]]}
+    
+    change = _renumber_change(change, renamed)
+    if op == "add":
+        task = Task.from_dict(change["task"])
+        if task.id in store:
+            new_id = store.next_id()
+            renamed[task.id] = new_id
+            task = task.replace(id=new_id)
+        if store.ids_at(task.pos):
+            task = task.replace(pos=store.key_after(task.pos))
+        change = {"op": "add", "task": task}
+    elif op == "update" and "pos" in change["fields"]:
+        if any(task_id != change["id"] for task_id in store.ids_at(change["fields"]["pos"])):
+            change = {**change, "fields": {**change["fields"], "pos": store.key_after(change["fields"]["pos"])}}
+    
+    apply_change(store, change)
+    return change
+
+
+class TaskJournal:
+    """预写日志
+    
+    快照沿用 todos.json 的格式，快照之后的每次修改作为一行紧凑的 JSON 记录追加到
+    todos.journal 中。加载时读取快照并回放日志；日志超过 compact_threshold 字节后，
+    在后台线程中把日志合并进新的快照。
+    
+    合并过程：
+    1. 主线程把 todos.journal 改名为 todos.journal.compacting，之后的修改写入新的日志；
+    2. 后台线程读取快照并回放 .compacting，写入 todos.json.tmp 并落盘；
+    3. 删除 .compacting，再用 .tmp 替换快照。
+    任意一步中断后，recover 都能根据剩余的文件恢复出完整的数据。
+    
+    多个进程共用数据文件时，追加日志和改名、替换文件都持有 lock；合并过程另外持有合并锁，
+    同一时间只有一个进程在合并。本进程记录已知日志内容的长度和哈希，poll 只读取其他进程追加的记录。
+    """
+    
+    def __init__(self, snapshot_file, compact_threshold=1024 * 1024, lock=None):
+        self.snapshot_file = snapshot_file
+        base = os.path.splitext(snapshot_file)[0]
+        self.journal_file = base + ".journal"
+        self.compacting_file = self.journal_file + ".compacting"
+        self.temp_file = snapshot_file + ".tmp"
+        self.compact_threshold = compact_threshold
+        self.lock = lock or FileLock(base + ".lock")
+        self.compact_lock = FileLock(base + ".compact.lock")
+        
+        # 尚未写入日志的变更记录
+        self._pending = []
+        self._compactor = None
+        
+        # 已知的快照状态，以及日志内容的长度、哈希和修改时间
+        self.snapshot_state = FileState(snapshot_file)
+        self._size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        self._digest = hashlib.blake2b()
+        self._journal_stat = None
+        # 追加日志时发现的其他进程的记录，由下一次 poll 返回；日志被改写时需要重新读取全部数据
+        self._external = []
+        self._stale = False
+    
+    def recover(self):
+        """处理上次合并中断后留下的文件，其他进程正在合并时不处理"""
+        if self.is_compacting() or not self.compact_lock.acquire(blocking=False):
+            return
+        
+        try:
+            if os.path.exists(self.compacting_file):
+                # 临时快照可能不完整，以旧快照加日志为准
+                if os.path.exists(self.temp_file):
+                    os.remove(self.temp_file)
+            elif os.path.exists(self.temp_file):
+                # .compacting 删除前临时快照已经落盘，完成最后的替换即可
+                os.replace(self.temp_file, self.snapshot_file)
+        finally:
+            self.compact_lock.release()
+    
+    def load(self, on_batch=None):
+        """读取快照并回放日志，返回任务列表；on_batch 与 read_snapshot 相同，只用于显示快照中的任务"""
+        with self.lock:
+            self.recover()
+            
+            tasks = read_snapshot(self.snapshot_file, on_batch)
+            changes = read_changes(self.compacting_file) + read_changes(self.journal_file, repair=True)
+            self.snapshot_state.refresh()
+            self._reset_journal_state()
+            
+            # 上次没有完成的合并，读取完成后在后台继续
+            if os.path.exists(self.compacting_file) and not self.is_compacting():
+                self._start_compactor()
+        
+        if not changes:
+            return tasks
+        
+        store = TaskStore(tasks)
+        for change in changes:
+            apply_change(store, change)
+        return store.tasks
+    
+    def _reset_journal_state(self):
+        """以日志文件的当前内容作为已知内容"""
+        try:
+            with open(self.journal_file, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        self._size = len(data)
+        self._digest = hashlib.blake2b(data)
+        self._journal_stat = file_stat(self.journal_file)
+        self._external = []
+        self._stale = False
+    
+    def _read_tail(self):
+        """返回其他进程在已知内容之后追加的记录；已知部分被改写（例如被合并）时返回None"""
+        try:
+            with open(self.journal_file, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        if len(data) < self._size or hashlib.blake2b(data[:self._size]).digest() != self._digest.digest():
+            return None
+        
+        # 只读取完整的行
+        end = max(data.rfind(b"\n") + 1, self._size)
+        tail = data[self._size:end]
+        self._digest.update(tail)
+        self._size = end
+        self._journal_stat = file_stat(self.journal_file) if end == len(data) else None
+        return parse_changes(tail)
+    
+    def _collect_external(self):
+        """日志文件变化时读取其他进程追加的记录"""
+        if self._stale or file_stat(self.journal_file) == self._journal_stat:
+            return
+        changes = self._read_tail()
+        if changes is None:
+            self._stale = True
+        else:
+            self._external.extend(changes)
+    
+    def poll(self):
+        """返回其他进程写入的、本进程还没有应用的变更记录，需要重新读取全部数据时返回None"""
+        with self.lock:
+            if self._stale or self.snapshot_state.changed():
+                return None
+            self._collect_external()
+            if self._stale:
+                return None
+            changes = self._external
+            self._external = []
+            return changes
+    
+    def record(self, change):
+        """记录一条变更，在 commit 时写入日志"""
+        self._pending.append(change)
+    
+    def pending_ids(self):
+        """返回尚未写入日志的记录涉及的任务ID"""
+        ids = set()
+        for change in self._pending:
+            _collect_ids(change, ids)
+        return ids
+    
+    def pending_fields(self):
+        """返回尚未写入日志的修改记录中每个任务被修改的字段"""
+        fields = {}
+        for change in self._pending:
+            _collect_fields(change, fields)
+        return fields
+    
+    def renumber(self, old_id, new_id):
+        """把尚未写入日志的记录中的任务ID old_id 改为 new_id"""
+        self._pending = [_renumber_change(change, {old_id: new_id}) for change in self._pending]
+    
+    def rebase(self, store):
+        """把尚未写入日志的记录应用到重新读取的任务存储 store 上
+        
+        本进程新任务的ID或排序键已被其他进程使用时，在 store 中为本进程的任务重新分配，
+        并相应改写待写入的记录，写入后回放日志得到的数据与 store 相同。
+        """
+        renamed = {}
+        self._pending = [_rebase_change(store, change, renamed) for change in self._pending]
+    
+    def commit(self):
+        """把待写入的变更一次性追加到日志，必要时启动后台合并"""
+        if not self._pending:
+            return
+        
+        data = "".join(json.dumps(change, ensure_ascii=False, separators=(",", ":"), default=task_to_json) + "\n"
+                       for change in self._pending).encode("utf-8")
+        with self.lock:
+            # 其他进程追加了本进程还没有合并的记录时不写入：本进程新任务的ID和排序键可能与对方的相同，
+            # 由 poll 取出对方的记录合并、重新分配冲突的ID和排序键后再写入
+            self._collect_external()
+            if self._external or self._stale or self.snapshot_state.changed():
+                raise ExternalChangeError("数据文件已被其他程序修改，合并后会重新保存")
+            with open(self.journal_file, "ab") as f:
+                f.write(data)
+            self._digest.update(data)
+            self._size += len(data)
+            self._journal_stat = file_stat(self.journal_file)
+        self._pending = []
+        if MONITOR.enabled:
+            MONITOR.add_bytes("journal", len(data))
+        
+        if self._size >= self.compact_threshold:
+            self.compact()
+    
+    def is_compacting(self):
+        """后台合并是否正在进行"""
+        return self._compactor is not None and self._compactor.is_alive()
+    
+    def compact(self):
+        """启动后台合并，返回是否成功启动"""
+        with self.lock:
+            if self.is_compacting() or os.path.exists(self.compacting_file):
+                return False
+            if not os.path.exists(self.journal_file):
+                return False
+            
+            # 其他进程追加的记录先留给 poll，之后的修改写入新的日志文件
+            self._collect_external()
+            os.replace(self.journal_file, self.compacting_file)
+            self._size = 0
+            self._digest = hashlib.blake2b()
+            self._journal_stat = None
+        
+        self._start_compactor()
+        return True
+    
+    def _start_compactor(self):
+        """启动后台合并线程"""
+        self._compactor = threading.Thread(target=self._compact, daemon=True)
+        self._compactor.start()
+    
+    def wait(self, timeout=None):
+        """等待后台合并结束"""
+        if self._compactor is not None:
+            self._compactor.join(timeout)
+    
+    def close(self, timeout=None):
+        """退出前把日志合并进快照，之后只读取 todos.json 的程序和备份也能得到全部数据
+        
+        等待后台合并最多 timeout 秒；超时后中断的合并在下次加载时由 recover 恢复，数据不会丢失。
+        """
+        self.wait(timeout)
+        size = os.path.getsize(self.journal_file) if os.path.exists(self.journal_file) else 0
+        if (size or not os.path.exists(self.snapshot_file)) and self.compact():
+            self.wait(timeout)
+    
+    def _compact(self):
+        """后台线程：把 .compacting 日志合并进快照，其他进程正在合并时直接返回"""
+        if not self.compact_lock.acquire(blocking=False):
+            return
+        
+        try:
+            if not os.path.exists(self.compacting_file):
+                return
+            store = TaskStore(read_snapshot(self.snapshot_file))
+            for change in read_changes(self.compacting_file):
+                apply_change(store, change)
+            
+            with open(self.temp_file, "w", encoding="utf-8") as f:
+                json.dump(store.tasks, f, ensure_ascii=False, indent=2, default=task_to_json)
+                f.flush()
+                os.fsync(f.fileno())
+                if MONITOR.enabled:
+                    MONITOR.add_bytes("compact", f.tell())
+            
+            with self.lock:
+                os.remove(self.compacting_file)
+                os.replace(self.temp_file, self.snapshot_file)
+                # 新快照的内容与本进程已知的数据相同
+                self.snapshot_state.refresh()
+        finally:
+            self.compact_lock.release()
+
+
+class SnapshotWriter:
+    """后台保存线程
+    
+    submit 只记录最新的快照，第一次提交后等待 delay 秒，窗口内的多次提交合并为一次写入。
+    写入在后台线程中完成，出错时在该线程中调用 on_error。write 为写入快照的函数，默认写入 JSON。
+    开始关闭后不再调用 on_error，最后一次写入的错误由 close 抛出，调用方可以在退出前提示。
+    """
+    
+    def __init__(self, path, delay=0.5, on_error=None, write=write_snapshot):
+        self.path = path
+        self.delay = delay
+        self.on_error = on_error
+        self.write = write
+        
+        self._condition = threading.Condition()
+        # 等待写入的最新快照及其写入时间
+        self._snapshot = None
+        self._deadline = 0
+        self._writing = False
+        self._closing = False
+        self._closed = False
+        # 最后一次写入失败时的错误，之后写入成功时清除
+        self.error = None
+        
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def submit(self, snapshot):
+        """提交一份不可变快照"""
+        with self._condition:
+            if self._snapshot is None:
+                self._deadline = time.monotonic() + self.delay
+            self._snapshot = snapshot
+            self._condition.notify_all()
+    
+    def flush(self, timeout=None):
+        """立即写入尚未保存的快照并等待完成，返回是否全部写完"""
+        with self._condition:
+            self._deadline = 0
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._snapshot is None and not self._writing, timeout)
+    
+    def close(self, timeout=None):
+        """写入剩余数据后停止后台线程
+        
+        最后一次写入失败时抛出该错误，timeout 秒内没有写完时抛出 TimeoutError，数据没有保存。
+        """
+        with self._condition:
+            self._closing = True
+        try:
+            if not self.flush(timeout):
+                raise TimeoutError("保存任务数据超时")
+            if self.error is not None:
+                raise self.error
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+        self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                # 等待新的快照，并在合并窗口结束前继续等待
+                while not self._closed:
+                    if self._snapshot is not None:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                
+                if self._snapshot is None:
+                    return
+                snapshot = self._snapshot
+                self._snapshot = None
+                self._writing = True
+            
+            error = None
+            try:
+                self.write(self.path, snapshot)
+            except Exception as e:
+                error = e
+            with self._condition:
+                self.error = error
+                self._writing = False
+                # 正在关闭时由 close 抛出错误，不再通知界面
+                report = error is not None and not self._closing
+                self._condition.notify_all()
+            if report and self.on_error:
+                self.on_error(error)
+
+
+def _unsaved_since(store, synced):
+    """返回任务存储中与上次读写的任务列表 synced 不同的任务ID"""
+    saved = {task["id"]: task for task in synced}
+    return {task.id for task in store.tasks if saved.get(task.id) != task}
+
+
+def _collect_ids(change, ids):
+    """把变更记录涉及的任务ID加入集合 ids"""
+    op = change["op"]
+    if op == "add":
+        ids.add(change["task"]["id"])
+    elif op == "update":
+        ids.add(change["id"])
+    elif op == "remove":
+        ids.update(change["ids"])
+    elif op == "batch":
+        for item in change["changes"]:
+            _collect_ids(item, ids)
+
+
+def _collect_fields(change, fields):
+    """把修改记录中每个任务被修改的字段加入 fields（任务ID -> 字段集合）"""
+    if change["op"] == "update":
+        fields.setdefault(change["id"], set()).update(change["fields"])
+    elif change["op"] == "batch":
+        for item in change["changes"]:
+            _collect_fields(item, fields)
+
+
+def _overrides(change, overridden):
+    """修改记录是否改动了 overridden 中以本进程为准的字段"""
+    return (change["op"] == "update" and change["id"] in overridden
+            and not overridden[change["id"]].isdisjoint(change["fields"]))
+
+
+class TaskBackend:
+    """存储后端接口
+    
+    使用方式：load 读取任务列表，用它创建 TaskStore 后调用 attach，
+    之后每次修改完成时调用 commit 保存，退出前调用 close。
+    """
+    
+    def __init__(self):
+        self.store = None
+        # 正在合并其他进程的修改，这些修改已经在磁盘上，不再记录
+        self._merging = False
+    
+    def load(self, on_batch=None):
+        """读取并返回全部任务
+        
+        指定 on_batch 时边读取边以 (本批任务, 进度) 调用 on_batch，可以在后台线程中调用。
+        """
+        raise NotImplementedError
+    
+    def preview(self):
+        """返回加载期间用于显示的只读任务序列（支持 len 和下标），不支持时返回None
+        
+        在主线程中调用，返回的序列在 attach 之前一直有效。
+        """
+        return None
+    
+    def attach(self, store):
+        """关联任务存储，开始记录它的修改"""
+        self.store = store
+        store.subscribe(self._on_change)
+    
+    def _on_change(self, change):
+        if not self._merging:
+            self.record(change)
+    
+    def record(self, change):
+        """记录一条变更"""
+    
+    def commit(self):
+        """保存 attach 之后记录的修改"""
+        raise NotImplementedError
+    
+    def poll(self):
+        """检查其他进程对数据的修改，返回需要应用到任务存储的变更记录列表
+        
+        在主线程中定期调用，数据没有变化时只检查文件状态。其他进程正在写入时返回空列表，下次再检查。
+        """
+        return []
+    
+    def merge(self, changes):
+        """把 poll 返回的变更应用到任务存储，监听函数照常收到通知，但不会再次保存
+        
+        两个进程同时新增任务时可能分配到相同的ID或排序键，这时以对方的数据为准，
+        本进程的任务换用新的ID或排序键（见 _make_room），两个任务都会保留。
+        """
+        # 对方已经知道本进程保存过的任务，只有尚未保存的任务可能与对方冲突
+        unsaved = self.unsaved_ids()
+        overridden = self.pending_fields()
+        
+        self._merging = True
+        try:
+            with self.store.transaction():
+                for change in changes:
+                    self._merge_change(change, unsaved, overridden)
+        finally:
+            self._merging = False
+    
+    def _merge_change(self, change, unsaved, overridden):
+        if change["op"] == "batch":
+            if any(self._collides(item, unsaved) or _overrides(item, overridden) for item in change["changes"]):
+                for item in change["changes"]:
+                    self._merge_change(item, unsaved, overridden)
+                return
+        else:
+            if _overrides(change, overridden):
+                # 本进程尚未写入的修改会写在对方的修改之后，这些字段以本进程为准
+                fields = {key: value for key, value in change["fields"].items()
+                          if key not in overridden[change["id"]]}
+                if not fields:
+                    return
+                change = {**change, "fields": fields}
+            if self._collides(change, unsaved):
+                self._make_room(change, unsaved, overridden)
+        apply_change(self.store, change)
+    
+    def _collides(self, change, unsaved):
+        """变更要使用的新任务ID已存在，或排序键已被本进程尚未保存的任务（unsaved）占用"""
+        store = self.store
+        op = change["op"]
+        if op == "add":
+            task_id, pos = change["task"]["id"], change["task"]["pos"]
+        elif op == "update":
+            task_id, pos = None, change["fields"].get("pos")
+        elif op == "batch":
+            return any(self._collides(item, unsaved) for item in change["changes"])
+        else:
+            return False
+        if task_id is not None and task_id in store:
+            return True
+        return pos is not None and any(other in unsaved for other in store.ids_at(pos))
+    
+    def _make_room(self, change, unsaved, overridden):
+        """为对方的新任务或移动让出ID和排序键：本进程的任务换用新的ID（store.next_id）
+        或紧跟在后面的新排序键，新的排序键作为本进程的修改记录下来"""
+        store = self.store
+        if change["op"] == "add":
+            task_id, pos = change["task"]["id"], change["task"]["pos"]
+            if task_id in store:
+                task = store.remove(task_id)
+                new_id = store.next_id()
+                store.insert(task.replace(id=new_id))
+                self.renumber(task_id, new_id)
+                unsaved.discard(task_id)
+                unsaved.add(new_id)
+                if task_id in overridden:
+                    overridden[new_id] = overridden.pop(task_id)
+        else:
+            pos = change["fields"]["pos"]
+        
+        for other in store.ids_at(pos):
+            if other in unsaved:
+                new_pos = store.key_after(pos)
+                store.update(other, pos=new_pos)
+                self.record({"op": "update", "id": other, "fields": {"pos": new_pos}})
+                overridden.setdefault(other, set()).add("pos")
+    
+    def unsaved_ids(self):
+        """返回本进程修改过、还没有保存的任务ID集合"""
+        return set()
+    
+    def pending_fields(self):
+        """返回 {任务ID: 字段集合}，这些字段在本进程尚未保存的修改之后才会写入，合并时以本进程为准"""
+        return {}
+    
+    def renumber(self, old_id, new_id):
+        """合并时本进程的任务从 old_id 换用了新的ID，改写尚未保存的记录"""
+    
+    def close(self, timeout=None):
+        """写入尚未保存的数据并释放资源，最多等待 timeout 秒；最后一次保存失败时抛出该错误"""
+
+
+class JsonBackend(TaskBackend):
+    """JSON 存储后端，数据文件格式与 todos.json 一致
+    
+    journal 为 True 时使用 TaskJournal 追加修改日志，否则由 SnapshotWriter 在后台整体重写文件。
+    """
+    
+    def __init__(self, path, journal=True, delay=0.5, on_error=None):
+        super().__init__()
+        self.path = path
+        self.lock = FileLock(os.path.splitext(path)[0] + ".lock")
+        self.journal = TaskJournal(path, lock=self.lock) if journal else None
+        self.writer = None if journal else SnapshotWriter(path, delay, on_error, self._write)
+        # 快照模式下最后一次读写文件时的状态和任务，用于找出其他进程的修改，
+        # 以及上次 poll 时本进程尚未写入的任务ID
+        self.state = FileState(path)
+        self.synced = ()
+        self._unsaved = set()
+    
+    def load(self, on_batch=None):
+        if self.journal:
+            return self.journal.load(on_batch)
+        with self.lock:
+            tasks = read_snapshot(self.path, on_batch)
+            self.state.refresh()
+            self.synced = tasks
+        return tasks
+    
+    def _write(self, path, tasks):
+        write_locked(self.lock, self.state, write_snapshot, path, tasks)
+        self.synced = tasks
+    
+    def poll(self):
+        if not self.lock.acquire(blocking=False):
+            return []
+        try:
+            if self.journal:
+                changes = self.journal.poll()
+                if changes is None:
+                    # 日志已被其他进程合并：重新读取，应用并写入本进程尚未写入的修改后再比较，
+                    # 之后任务存储只需变为与文件相同
+                    store = TaskStore(self.journal.load())
+                    self.journal.rebase(store)
+                    self.journal.commit()
+                    changes = diff_tasks(self.store.tasks, store.tasks)
+                return changes
+            
+            if not self.state.changed():
+                return []
+            # 与上次读写的内容比较，本进程尚未写入的修改不受影响
+            tasks = read_snapshot(self.path)
+            self.state.refresh()
+            changes = diff_tasks(self.synced, tasks)
+            self._unsaved = _unsaved_since(self.store, self.synced)
+            self.synced = tasks
+            return changes
+        finally:
+            self.lock.release()
+    
+    def record(self, change):
+        if self.journal:
+            self.journal.record(change)
+    
+    def unsaved_ids(self):
+        if self.journal:
+            return self.journal.pending_ids()
+        return set(self._unsaved)
+    
+    def pending_fields(self):
+        return self.journal.pending_fields() if self.journal else {}
+    
+    def renumber(self, old_id, new_id):
+        if self.journal:
+            self.journal.renumber(old_id, new_id)
+    
+    def commit(self):
+        if self.writer:
+            self.writer.submit(self.store.snapshot())
+        else:
+            self.journal.commit()
+    
+    def close(self, timeout=None):
+        if self.writer:
+            self.writer.close(timeout)
+        else:
+            self.journal.close(timeout)
+
+
+class BinaryBackend(TaskBackend):
+    """二进制快照存储后端（todos.bin），格式见 task_binary
+    
+    保存时由 SnapshotWriter 在后台整体重写文件。preview 以 mmap 打开快照，
+    加载期间的列表只解码可见的行，不必等待全部任务解码完成。
+    第一次使用时，如果 migrate_from 指定的 todos.json 存在，会先转换其中的数据。
+    """
+    
+    def __init__(self, path, delay=0.5, on_error=None, migrate_from=None):
+        super().__init__()
+        self.path = path
+        if migrate_from and not os.path.exists(path) and os.path.exists(migrate_from):
+            json_to_binary(migrate_from, path)
+        self.lock = FileLock(os.path.splitext(path)[0] + ".lock")
+        self.writer = SnapshotWriter(path, delay, on_error, self._write)
+        self._preview = None
+        self.state = FileState(path)
+        self.synced = ()
+        self._unsaved = set()
+    
+    def preview(self):
+        if self._preview is None and os.path.exists(self.path):
+            self._preview = BinarySnapshot(self.path)
+        return self._preview
+    
+    def _close_preview(self):
+        if self._preview is not None:
+            self._preview.close()
+            self._preview = None
+    
+    def load(self, on_batch=None):
+        with self.lock:
+            tasks = self._read(on_batch)
+            self.state.refresh()
+            self.synced = tasks
+        return tasks
+    
+    def _read(self, on_batch=None):
+        if not os.path.exists(self.path):
+            return []
+        
+        snapshot = BinarySnapshot(self.path)
+        try:
+            if on_batch is None:
+                return list(snapshot)
+            
+            tasks = []
+            size = FIRST_BATCH_SIZE
+            while len(tasks) < len(snapshot):
+                batch = snapshot[len(tasks):len(tasks) + size]
+                tasks.extend(batch)
+                on_batch(batch, len(tasks) / len(snapshot))
+                size = BATCH_SIZE
+            return tasks
+        finally:
+            snapshot.close()
+    
+    def _write(self, path, tasks):
+        write_locked(self.lock, self.state, write_binary_snapshot, path, tasks)
+        self.synced = tasks
+    
+    def poll(self):
+        if not self.lock.acquire(blocking=False):
+            return []
+        try:
+            if not self.state.changed():
+                return []
+            tasks = self._read()
+            self.state.refresh()
+            changes = diff_tasks(self.synced, tasks)
+            self._unsaved = _unsaved_since(self.store, self.synced)
+            self.synced = tasks
+            return changes
+        finally:
+            self.lock.release()
+    
+    def unsaved_ids(self):
+        return set(self._unsaved)
+    
+    def attach(self, store):
+        # 保存时会替换文件，先关闭预览使用的 mmap
+        self._close_preview()
+        super().attach(store)
+    
+    def commit(self):
+        self.writer.submit(self.store.snapshot())
+    
+    def close(self, timeout=None):
+        self._close_preview()
+        self.writer.close(timeout)
+
+
+def json_to_binary(json_path, binary_path):
+    """把 todos.json 格式的快照转换为二进制快照，返回任务数"""
+    # 旧数据可能缺少ID或排序键，由 TaskStore 补齐
+    tasks = TaskStore(read_snapshot(json_path)).tasks
+    write_binary_snapshot(binary_path, tasks)
+    return len(tasks)
+
+
+def binary_to_json(binary_path, json_path):
+    """把二进制快照转换为 todos.json 格式，返回任务数"""
+    tasks = read_binary_snapshot(binary_path)
+    write_snapshot(json_path, tasks)
+    return len(tasks)
+
+
+class SqliteBackend(TaskBackend):
+    """SQLite 存储后端
+    
+    使用 WAL 模式，并为截止日期、完成状态和排序键建立索引，任务按排序键 pos 排列。
+    每次 commit 只在一个事务中批量写入发生变化的行和删除被删除的行。
+    第一次打开新数据库时，如果 migrate_from 指定的 todos.json 存在，会先导入其中的数据。
+    """
+    
+    SCHEMA_VERSION = 2
+    
+    def __init__(self, path, migrate_from=None):
+        super().__init__()
+        self.path = path
+        self.migrate_from = migrate_from
+        # 只有使用 SQLite 后端时才导入，缩短默认配置的启动时间
+        import sqlite3
+        
+        # 允许在后台线程中加载，加载完成前不会有其他线程访问连接
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        
+        # 需要写入的任务ID和需要删除的任务ID，以及其中本进程新增的任务ID
+        self._dirty = set()
+        self._removed = set()
+        self._added = set()
+        self._data_version = None
+    
+    def _create_schema(self):
+        """创建表和索引"""
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "id INTEGER PRIMARY KEY, "
+                "task TEXT NOT NULL, "
+                "due_date TEXT NOT NULL DEFAULT '', "
+                "completed INTEGER NOT NULL DEFAULT 0, "
+                "pos TEXT NOT NULL DEFAULT '')"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (completed)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_tasks_pos ON tasks (pos)")
+            self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+    
+    def _upgrade_v1(self):
+        """版本1的任务顺序即 id 顺序，增加 pos 列并按 id 顺序生成排序键"""
+        task_ids = [row[0] for row in self.connection.execute("SELECT id FROM tasks ORDER BY id")]
+        with self.connection:
+            self.connection.execute("ALTER TABLE tasks ADD COLUMN pos TEXT NOT NULL DEFAULT ''")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS idx_tasks_pos ON tasks (pos)")
+            
+            key = None
+            keys = []
+            for task_id in task_ids:
+                key = key_between(key, None)
+                keys.append((key, task_id))
+            self.connection.executemany("UPDATE tasks SET pos = ? WHERE id = ?", keys)
+            self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+    
+    def load(self, on_batch=None):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == 0:
+            self._create_schema()
+            if self.migrate_from:
+                self.write_all(JsonBackend(self.migrate_from).load())
+        elif version == 1:
+            self._upgrade_v1()
+        
+        # 其他连接提交修改后 data_version 会变化
+        self._data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if on_batch is None:
+            return self.query()
+        
+        # 按批读取结果
+        total = self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0] or 1
+        cursor = self.connection.execute("SELECT id, task, due_date, completed, pos FROM tasks ORDER BY pos")
+        tasks = []
+        batch_size = FIRST_BATCH_SIZE
+        while True:
+            batch = [
+                {"id": task_id, "task": task, "due_date": due_date, "completed": bool(completed), "pos": pos}
+                for task_id, task, due_date, completed, pos in cursor.fetchmany(batch_size)
+            ]
+            tasks.extend(batch)
+            on_batch(batch, len(tasks) / total)
+            if len(batch) < batch_size:
+                return tasks
+            batch_size = BATCH_SIZE
+    
+    def query(self):
+        """返回全部任务，按任务顺序排列"""
+        return [
+            {"id": task_id, "task": task, "due_date": due_date, "completed": bool(completed), "pos": pos}
+            for task_id, task, due_date, completed, pos in self.connection.execute(
+                "SELECT id, task, due_date, completed, pos FROM tasks ORDER BY pos, id")
+        ]
+    
+    def write_all(self, tasks):
+        """用给定的任务列表替换数据库中的全部任务"""
+        # 补齐旧数据缺少的ID和排序键
+        tasks = TaskStore(tasks).tasks
+        with self.connection:
+            self.connection.execute("DELETE FROM tasks")
+            self.connection.executemany(
+                "INSERT INTO tasks (id, task, due_date, completed, pos) VALUES (?, ?, ?, ?, ?)",
+                [(task["id"], task["task"], task["due_date"], int(task["completed"]), task["pos"]) for task in tasks]
+            )
+    
+    def record(self, change):
+        op = change["op"]
+        if op == "add":
+            self._dirty.add(change["task"]["id"])
+            self._added.add(change["task"]["id"])
+            self._removed.discard(change["task"]["id"])
+        elif op == "update":
+            self._dirty.add(change["id"])
+        elif op == "remove":
+            self._removed.update(change["ids"])
+            self._dirty.difference_update(change["ids"])
+            self._added.difference_update(change["ids"])
+        elif op == "batch":
+            for item in change["changes"]:
+                self.record(item)
+    
+    def commit(self):
+        if not self._dirty and not self._removed:
+            return
+        
+        rows = []
+        for task_id in self._dirty:
+            task = self.store.get(task_id)
+            if task:
+                rows.append((task["id"], task["task"], task["due_date"], int(task["completed"]), task["pos"]))
+        
+        with self.connection:
+            # 先取得写锁，检查和写入之间其他连接不能提交
+            self.connection.execute("BEGIN IMMEDIATE")
+            if self._collides_with_others():
+                raise ExternalChangeError("数据库已被其他程序修改，合并后会重新保存")
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO tasks (id, task, due_date, completed, pos) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self.connection.executemany("DELETE FROM tasks WHERE id = ?", [(task_id,) for task_id in self._removed])
+        
+        self._dirty.clear()
+        self._removed.clear()
+        self._added.clear()
+    
+    def _collides_with_others(self):
+        """其他连接提交过修改，且本进程新增任务的ID或要写入的排序键已被数据库中的其他任务使用"""
+        if self.connection.execute("PRAGMA data_version").fetchone()[0] == self._data_version:
+            return False
+        pending = self._dirty | self._removed
+        for task_id in self._dirty:
+            task = self.store.get(task_id)
+            if task is None:
+                continue
+            rows = self.connection.execute("SELECT id FROM tasks WHERE id = ? OR pos = ?", (task_id, task["pos"]))
+            for (other,) in rows:
+                if other == task_id:
+                    # 本进程新增的任务ID已被对方使用；已有任务的这一行是本进程之前写入的
+                    if task_id in self._added:
+                        return True
+                elif other not in pending:
+                    return True
+        return False
+    
+    def unsaved_ids(self):
+        return set(self._dirty)
+    
+    def renumber(self, old_id, new_id):
+        for ids in (self._dirty, self._added):
+            if old_id in ids:
+                ids.discard(old_id)
+                ids.add(new_id)
+    
+    def poll(self):
+        version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return []
+        self._data_version = version
+        # 尚未写入的修改以本进程为准，不参与比较；本进程新增任务的ID已在数据库中时，
+        # 对方的任务作为新增任务合并，本进程的任务换用新的ID
+        pending = self._dirty | self._removed
+        local = [task for task in self.store.tasks if task["id"] not in pending]
+        remote = [task for task in self.query() if task["id"] not in pending or task["id"] in self._added]
+        return diff_tasks(local, remote)
+    
+    def close(self, timeout=None):
+        self.connection.close()
+
+
+def open_backend(data_dir, delay=0.5, on_error=None):
+    """按 STORAGE_BACKEND 和 JOURNAL_MODE 创建数据目录中的存储后端"""
+    json_file = os.path.join(data_dir, "todos.json")
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(os.path.join(data_dir, "todos.db"), migrate_from=json_file)
+    if STORAGE_BACKEND == "binary":
+        return BinaryBackend(os.path.join(data_dir, "todos.bin"), delay, on_error, migrate_from=json_file)
+    return JsonBackend(json_file, JOURNAL_MODE, delay, on_error)
+
@@ -0,0 +1,720 @@
+"""任务存储引擎
+
+不依赖 tkinter 和 winreg，可以在没有图形界面的环境中单独导入使用。
+"""
+import sys
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import date
+from operator import attrgetter
+
+
+# 排序键使用的字符，按 ASCII 顺序排列
+KEY_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# 整数部分的最小值，不能作为排序键
+SMALLEST_INTEGER = "A" + KEY_DIGITS[0] * 26
+
+
+def _midpoint(a, b):
+    """返回介于小数部分 a 和 b 之间的小数部分，b 为 None 表示没有上界"""
+    zero = KEY_DIGITS[0]
+    if b is not None:
+        # 跳过相同的前缀
+        n = 0
+        while (a[n] if n < len(a) else zero) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    
+    digit_a = KEY_DIGITS.index(a[0]) if a else 0
+    digit_b = KEY_DIGITS.index(b[0]) if b is not None else len(KEY_DIGITS)
+    if digit_b - digit_a > 1:
+        return KEY_DIGITS[(digit_a + digit_b + 1) // 2]
+    
+    # 两个数字相邻，需要增加一位
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return KEY_DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head):
+    """根据排序键的首字符返回整数部分的长度"""
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"无效的排序键: {head}")
+
+
+def _split_key(key):
+    """把排序键拆分为整数部分和小数部分"""
+    length = _integer_length(key[0])
+    if length > len(key) or key[length:].endswith(KEY_DIGITS[0]) or key == SMALLEST_INTEGER:
+        raise ValueError(f"无效的排序键: {key}")
+    return key[:length], key[length:]
+
+
+def _increment_integer(integer):
+    """整数部分加一，超出范围时返回None"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = KEY_DIGITS.index(digits[i]) + 1
+        if digit < len(KEY_DIGITS):
+            digits[i] = KEY_DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = KEY_DIGITS[0]
+    
+    # 所有位都进位，整数部分变长
+    if head == "Z":
+        return "a" + KEY_DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(KEY_DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer):
+    """整数部分减一，超出范围时返回None"""
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        digit = KEY_DIGITS.index(digits[i]) - 1
+        if digit >= 0:
+            digits[i] = KEY_DIGITS[digit]
+            return head + "".join(digits)
+        digits[i] = KEY_DIGITS[-1]
+    
+    # 所有位都借位，整数部分变短
+    if head == "a":
+        return "Z" + KEY_DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(KEY_DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a, b):
+    """生成一个介于 a 和 b 之间的排序键（分数索引）
+    
+    a 为 None 表示放在最前面，b 为 None 表示放在最后面。
+    排序键按字符串比较，在两个相邻任务之间生成新键即可调整顺序，不需要修改其他任务；
+    连续在末尾追加时键长只按对数增长。
+    """
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"排序键顺序错误: {a} >= {b}")
+    
+    if a is None:
+        if b is None:
+            return "a" + KEY_DIGITS[0]
+        integer_b, fraction_b = _split_key(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if integer_b < b:
+            return integer_b
+        result = _decrement_integer(integer_b)
+        if result is None:
+            raise ValueError("无法生成更小的排序键")
+        return result
+    
+    integer_a, fraction_a = _split_key(a)
+    if b is None:
+        result = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if result is None else result
+    
+    integer_b, fraction_b = _split_key(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    result = _increment_integer(integer_a)
+    if result is None:
+        raise ValueError("无法生成更大的排序键")
+    if result < b:
+        return result
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def parse_due_date(due_date):
+    """把 YYYY-MM-DD 格式的截止日期转换为 date，为空或格式错误时返回None"""
+    if not due_date:
+        return None
+    try:
+        return date.fromisoformat(due_date)
+    except ValueError:
+        return None
+
+
+class Task(Mapping):
+    """紧凑的任务记录
+    
+    用 __slots__ 保存 id、task、due_date、completed 和 pos 五个字段，比同样内容的字典少约 110 字节，
+    截止日期字符串会被驻留，相同的日期只保存一份。
+    同时实现只读的映射接口，task["due_date"]、task.get(...)、dict(task) 和 {**task} 都与字典一样可用，
+    与字典比较时按内容比较。任务放入存储后不再修改，修改时用 replace 得到新的任务。
+    数据文件中的其他字段保存在 _extra 中，不会丢失。
+    """
+    
+    __slots__ = ("id", "task", "due_date", "completed", "pos", "_extra")
+    
+    FIELDS = ("id", "task", "due_date", "completed", "pos")
+    
+    def __init__(self, id, task, due_date="", completed=False, pos=None, extra=None):
+        self.id = id
+        self.task = task
+        self.due_date = sys.intern(due_date) if isinstance(due_date, str) else due_date or ""
+        self.completed = completed
+        self.pos = pos
+        self._extra = extra or None
+    
+    @classmethod
+    def from_dict(cls, data):
+        """从字典创建任务，data 已经是 Task 时直接返回"""
+        if isinstance(data, Task):
+            return data
+        extra = None
+        if not data.keys() <= TASK_FIELDS.keys():
+            extra = {key: value for key, value in data.items() if key not in TASK_FIELDS}
+        return cls(data.get("id"), data.get("task", ""), data.get("due_date") or "",
+                   data.get("completed", False), data.get("pos"), extra)
+    
+    def __getitem__(self, key):
+        if key in TASK_FIELDS:
+            return getattr(self, key)
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __contains__(self, key):
+        return key in TASK_FIELDS or bool(self._extra) and key in self._extra
+    
+    def __iter__(self):
+        yield from self.FIELDS
+        if self._extra:
+            yield from self._extra
+    
+    def __len__(self):
+        return 5 + len(self._extra or ())
+    
+    def __repr__(self):
+        return f"Task({self.to_dict()!r})"
+    
+    def replace(self, **fields):
+        """返回修改了部分字段的新任务"""
+        extra = self._extra
+        values = [self.id, self.task, self.due_date, self.completed, self.pos]
+        for key, value in fields.items():
+            if key in TASK_FIELDS:
+                values[TASK_FIELDS[key]] = value
+            else:
+                extra = {**(extra or {}), key: value}
+        return Task(*values, extra)
+    
+    def to_dict(self):
+        """转换为可以序列化为 JSON 的字典"""
+        data = {"id": self.id, "task": self.task, "due_date": self.due_date, "completed": self.completed, "pos": self.pos}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+# 字段名 -> 在 Task 构造参数中的位置
+TASK_FIELDS = {name: index for index, name in enumerate(Task.FIELDS)}
+
+
+def task_to_json(obj):
+    """json.dump 的 default 参数，把 Task 转换为字典"""
+    if isinstance(obj, Task):
+        return obj.to_dict()
+    raise TypeError(f"无法序列化 {type(obj).__name__} 对象")
+
+
+def due_entry(task):
+    """返回任务在截止日期索引中的条目，没有截止日期时返回None"""
+    day = parse_due_date(task["due_date"])
+    if day is None:
+        return None
+    return day.toordinal(), task["pos"], task["id"]
+
+
+def task_key(task):
+    """返回 Task 在列表中的排序依据 (排序键, ID)"""
+    # 直接读取属性，比按字段名取值快得多，排序大量任务时用作排序键
+    return task.pos, task.id
+
+
+class TaskStore:
+    """任务集合，维护 ID 哈希索引和排序键索引
+    
+    每个任务有不可变的ID和一个可排序的字符串排序键 pos，tasks 列表按 (pos, ID) 排序，
+    与之平行的 _keys 列表用于二分查找任务所在的位置。合并其他进程的修改时可能短暂出现
+    排序键相同的任务，按ID区分先后，查找时仍能准确定位到同一个任务。
+    调整顺序时只需要为被移动的任务生成新的排序键，删除任务也不会影响其他任务，
+    列表中显示的序号由位置决定，与ID无关。
+    
+    任务以紧凑的 Task 保存，放入存储后不再原地修改，每次修改都用新的 Task 替换旧的，
+    因此 snapshot 只需复制列表即可得到不会再变化的快照，可以交给后台线程序列化。
+    
+    每次修改都会以变更记录（字典）通知 subscribe 注册的监听函数，记录可以序列化为 JSON，
+    并可通过 apply_change 重新应用到另一个 TaskStore 上。
+    每条变更记录还附带一条撤销它的逆向记录，只包含被修改字段的旧值或被删除的任务，
+    以 subscribe(listener, inverse=True) 注册的监听函数会同时收到这两条记录。
+    """
+    
+    def __init__(self, tasks=None):
+        self.tasks = []
+        # ID -> 任务字典
+        self._index = {}
+        # 与 tasks 平行的 (排序键, ID) 列表
+        self._keys = []
+        # 截止日期索引：按 (日期序数, 排序键, ID) 排序的列表，以及没有截止日期的任务ID
+        self._due = []
+        self._undated = set()
+        # 下一个可用的ID
+        self._next_id = 1
+        # 变更监听函数和是否需要逆向记录
+        self._listeners = []
+        # 事务中暂存的 (变更记录, 逆向记录)，不在事务中时为None
+        self._batch = None
+        self._batch_depth = 0
+        
+        if tasks:
+            self.load(tasks)
+    
+    def __len__(self):
+        return len(self.tasks)
+    
+    def __iter__(self):
+        return iter(self.tasks)
+    
+    def __getitem__(self, index):
+        return self.tasks[index]
+    
+    def __contains__(self, task_id):
+        return task_id in self._index
+    
+    def load(self, tasks):
+        """载入任务列表并重建索引，字典会被转换为 Task"""
+        tasks = [Task.from_dict(task) for task in tasks]
+        
+        # 缺少ID或ID重复的任务分配新的ID
+        self._next_id = max((task["id"] for task in tasks if isinstance(task.get("id"), int)), default=0) + 1
+        seen = set()
+        for index, task in enumerate(tasks):
+            if not isinstance(task.get("id"), int) or task["id"] in seen:
+                tasks[index] = task = task.replace(id=self._next_id)
+                self._next_id += 1
+            seen.add(task["id"])
+        
+        # 旧数据没有排序键时按文件中的顺序生成；排序键重复时按 (排序键, ID) 的顺序重新生成
+        rekey = any(task["pos"] is None for task in tasks)
+        if not rekey:
+            tasks.sort(key=task_key)
+            rekey = any(tasks[i]["pos"] >= tasks[i + 1]["pos"] for i in range(len(tasks) - 1))
+        if rekey:
+            key = None
+            for index, task in enumerate(tasks):
+                key = key_between(key, None)
+                tasks[index] = task.replace(pos=key)
+        
+        self.tasks = tasks
+        self._index = {task["id"]: task for task in tasks}
+        self._keys = [(task["pos"], task["id"]) for task in tasks]
+        
+        self._due = []
+        self._undated = set()
+        for task in tasks:
+            entry = due_entry(task)
+            if entry:
+                self._due.append(entry)
+            else:
+                self._undated.add(task["id"])
+        self._due.sort()
+    
+    def _index_due(self, task):
+        """把任务加入截止日期索引"""
+        entry = due_entry(task)
+        if entry:
+            insort(self._due, entry)
+        else:
+            self._undated.add(task["id"])
+    
+    def _unindex_due(self, task):
+        """把任务从截止日期索引中删除"""
+        entry = due_entry(task)
+        if entry:
+            del self._due[bisect_left(self._due, entry)]
+        else:
+            self._undated.discard(task["id"])
+    
+    def _due_bounds(self, first, last):
+        """返回截止日期在 [first, last] 范围内的索引区间，None 表示不限制"""
+        start = bisect_left(self._due, (first.toordinal(),)) if first else 0
+        end = bisect_left(self._due, (last.toordinal() + 1,)) if last else len(self._due)
+        return start, end
+    
+    def due_count(self, due_date):
+        """返回截止日期为 due_date（YYYY-MM-DD）的任务数"""
+        day = parse_due_date(due_date)
+        if not day:
+            return 0
+        start, end = self._due_bounds(day, day)
+        return end - start
+    
+    def due_between(self, first=None, last=None):
+        """返回截止日期在 first 和 last（date，包含两端）之间的任务，按截止日期排序，同一天的按列表顺序"""
+        start, end = self._due_bounds(first, last)
+        return [self._index[task_id] for _, _, task_id in self._due[start:end]]
+    
+    def undated(self):
+        """按列表顺序返回没有截止日期的任务"""
+        return sorted((self._index[task_id] for task_id in self._undated), key=task_key)
+    
+    def subscribe(self, listener, inverse=False):
+        """注册变更监听函数，每次修改后以变更记录调用；inverse 为 True 时同时传入逆向记录"""
+        self._listeners.append((listener, inverse))
+    
+    def _emit(self, change, inverse):
+        """通知所有监听函数，事务中先暂存"""
+        if self._batch is not None:
+            self._batch.append((change, inverse))
+            return
+        for listener, wants_inverse in self._listeners:
+            if wants_inverse:
+                listener(change, inverse)
+            else:
+                listener(change)
+    
+    @contextmanager
+    def transaction(self):
+        """把期间的所有修改合并为一条 {"op": "batch", "changes": [...]} 变更记录，事务可以嵌套
+        
+        监听函数在事务结束时一次收到全部修改，存储后端因此可以原子地写入。
+        逆向记录按相反的顺序合并，撤销时整个事务作为一步。
+        """
+        if self._batch_depth == 0:
+            self._batch = []
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                pairs = self._batch
+                self._batch = None
+                if len(pairs) == 1:
+                    self._emit(*pairs[0])
+                elif pairs:
+                    self._emit({"op": "batch", "changes": [change for change, inverse in pairs]},
+                               {"op": "batch", "changes": [inverse for change, inverse in reversed(pairs)]})
+    
+    def snapshot(self):
+        """返回当前任务列表的不可变快照"""
+        return tuple(self.tasks)
+    
+    def get(self, task_id):
+        """根据ID查找任务，不存在时返回None"""
+        return self._index.get(task_id)
+    
+    def ordered(self, task_ids):
+        """按列表顺序返回给定ID的任务，忽略不存在的ID
+        
+        只对这些任务排序，不扫描全部任务，用于排列搜索和筛选的结果。
+        """
+        index = self._index
+        tasks = [index[task_id] for task_id in sorted(task_ids) if task_id in index]
+        # ID 已经有序，只按排序键稳定排序即得到 (排序键, ID) 的顺序，比用元组作排序键快
+        tasks.sort(key=attrgetter("pos"))
+        return tasks
+    
+    def position(self, task_id):
+        """返回任务在列表中的下标，不存在时返回-1"""
+        task = self._index.get(task_id)
+        if task is None:
+            return -1
+        return bisect_left(self._keys, (task["pos"], task_id))
+    
+    def _key_before(self, pos):
+        """返回列表中最后一个小于 pos 的排序键，没有时返回None"""
+        index = bisect_left(self._keys, (pos,))
+        return self._keys[index - 1][0] if index > 0 else None
+    
+    def _key_after(self, pos):
+        """返回列表中第一个大于 pos 的排序键，没有时返回None"""
+        index = bisect_left(self._keys, (pos, float("inf")))
+        return self._keys[index][0] if index < len(self._keys) else None
+    
+    def ids_at(self, pos):
+        """返回排序键为 pos 的任务ID列表"""
+        index = bisect_left(self._keys, (pos,))
+        ids = []
+        while index < len(self._keys) and self._keys[index][0] == pos:
+            ids.append(self._keys[index][1])
+            index += 1
+        return ids
+    
+    def key_after(self, pos):
+        """返回一个紧跟在 pos 后面、没有被任何任务使用的新排序键"""
+        return key_between(pos, self._key_after(pos))
+    
+    def next_id(self):
+        """生成下一个任务ID"""
+        task_id = self._next_id
+        self._next_id += 1
+        return task_id
+    
+    def add(self, task, due_date="", completed=False):
+        """在末尾添加任务并返回新任务"""
+        return self.insert(Task(self.next_id(), task, due_date, completed,
+                                key_between(self._keys[-1][0] if self._keys else None, None)))
+    
+    def insert(self, task):
+        """按排序键插入一个已有ID的任务（Task 或字典），返回存储中的 Task"""
+        task = Task.from_dict(task)
+        key = task_key(task)
+        index = bisect_left(self._keys, key)
+        self.tasks.insert(index, task)
+        self._keys.insert(index, key)
+        self._index[task["id"]] = task
+        self._index_due(task)
+        
+        if task["id"] >= self._next_id:
+            self._next_id = task["id"] + 1
+        
+        self._emit({"op": "add", "task": task}, {"op": "remove", "ids": [task["id"]]})
+        return task
+    
+    def insert_many(self, tasks):
+        """按排序键一次插入多个已有ID的任务，返回插入的任务数
+        
+        与已有任务合并排序，耗时与 remove_ids 相当，用于撤销批量删除。
+        """
+        tasks = sorted((Task.from_dict(task) for task in tasks), key=task_key)
+        if len(tasks) <= 1:
+            for task in tasks:
+                self.insert(task)
+            return len(tasks)
+        
+        # 两段各自有序，sort 只需要一次合并
+        self.tasks = sorted(self.tasks + tasks, key=task_key)
+        self._keys = [task_key(task) for task in self.tasks]
+        entries = []
+        with self.transaction():
+            for task in tasks:
+                self._index[task["id"]] = task
+                entry = due_entry(task)
+                if entry:
+                    entries.append(entry)
+                else:
+                    self._undated.add(task["id"])
+                if task["id"] >= self._next_id:
+                    self._next_id = task["id"] + 1
+                self._emit({"op": "add", "task": task}, {"op": "remove", "ids": [task["id"]]})
+            self._due = sorted(self._due + entries)
+        return len(tasks)
+    
+    def update(self, task_id, **fields):
+        """更新任务字段，返回更新后的任务；修改 pos 时任务移动到新的位置"""
+        task = self._index.get(task_id)
+        if not task:
+            return None
+        
+        index = bisect_left(self._keys, task_key(task))
+        old = task
+        task = task.replace(**fields)
+        
+        # 截止日期或排序键变化时更新截止日期索引
+        if (task["due_date"], task["pos"]) != (old["due_date"], old["pos"]):
+            self._unindex_due(old)
+            self._index_due(task)
+        
+        if task["pos"] != old["pos"]:
+            del self.tasks[index]
+            del self._keys[index]
+            key = task_key(task)
+            index = bisect_left(self._keys, key)
+            self.tasks.insert(index, task)
+            self._keys.insert(index, key)
+        else:
+            self.tasks[index] = task
+        self._index[task_id] = task
+        
+        self._emit({"op": "update", "id": task_id, "fields": fields},
+                   {"op": "update", "id": task_id, "fields": {key: old.get(key) for key in fields}})
+        return task
+    
+    def toggle(self, task_id):
+        """切换任务完成状态，返回该任务"""
+        task = self._index.get(task_id)
+        if task:
+            return self.update(task_id, completed=not task["completed"])
+        return None
+    
+    def move(self, task_id, offset):
+        """将任务移动到相邻位置，offset为-1表示上移，1表示下移
+        
+        只为该任务生成一个介于新邻居之间的排序键，其他任务不受影响。
+        """
+        index = self.position(task_id)
+        target = index + offset
+        if index == -1 or target < 0 or target >= len(self.tasks):
+            return False
+        
+        # 新位置两侧任务的排序键，两侧排序键相同时移到这组任务的外侧
+        if offset < 0:
+            after = self._keys[target][0]
+            before = self._keys[target - 1][0] if target > 0 else None
+            if before == after:
+                before = self._key_before(after)
+        else:
+            before = self._keys[target][0]
+            after = self._keys[target + 1][0] if target + 1 < len(self._keys) else None
+            if before == after:
+                after = self._key_after(before)
+        
+        self.update(task_id, pos=key_between(before, after))
+        return True
+    
+    def move_beside(self, task_id, other_id, after=False):
+        """将任务移动到另一个任务的前面或后面（after 为 True 时），用于在排序后的视图中调整顺序"""
+        index = self.position(other_id)
+        if index == -1 or task_id == other_id or task_id not in self._index:
+            return False
+        
+        # 新位置两侧任务的排序键
+        if after:
+            before = self._keys[index][0]
+            following = self._keys[index + 1][0] if index + 1 < len(self._keys) else None
+            if before == following:
+                following = self._key_after(before)
+        else:
+            following = self._keys[index][0]
+            before = self._keys[index - 1][0] if index > 0 else None
+            if before == following:
+                before = self._key_before(following)
+        
+        self.update(task_id, pos=key_between(before, following))
+        return True
+    
+    def update_many(self, task_ids, **fields):
+        """在一个事务中更新多个任务的相同字段，返回更新的任务数"""
+        count = 0
+        with self.transaction():
+            for task_id in task_ids:
+                if self.update(task_id, **fields):
+                    count += 1
+        return count
+    
+    def move_to_edge(self, task_ids, top=True):
+        """在一个事务中把多个任务移到列表顶部或底部，保持它们之间的相对顺序"""
+        tasks = sorted((self._index[task_id] for task_id in task_ids if task_id in self._index),
+                       key=task_key)
+        if not tasks:
+            return 0
+        
+        with self.transaction():
+            if top:
+                # 从最后一个开始，依次放到当前第一个任务前面
+                for task in reversed(tasks):
+                    self.update(task["id"], pos=key_between(None, self._keys[0][0]))
+            else:
+                for task in tasks:
+                    self.update(task["id"], pos=key_between(self._keys[-1][0], None))
+        return len(tasks)
+    
+    def remove(self, task_id):
+        """删除任务并返回被删除的任务"""
+        index = self.position(task_id)
+        if index == -1:
+            return None
+        
+        task = self.tasks.pop(index)
+        del self._keys[index]
+        del self._index[task_id]
+        self._unindex_due(task)
+        
+        self._emit({"op": "remove", "ids": [task_id]}, {"op": "add", "task": task})
+        return task
+    
+    def remove_ids(self, task_ids):
+        """一次删除多个任务，返回被删除的任务列表"""
+        task_ids = set(task_ids)
+        kept = []
+        removed = []
+        for task in self.tasks:
+            (removed if task["id"] in task_ids else kept).append(task)
+        
+        if removed:
+            self.tasks = kept
+            self._keys = [task_key(task) for task in kept]
+            for task in removed:
+                del self._index[task["id"]]
+                self._unindex_due(task)
+            
+            if len(removed) == 1:
+                inverse = {"op": "add", "task": removed[0]}
+            else:
+                inverse = {"op": "batch", "changes": [{"op": "add", "task": task} for task in removed]}
+            self._emit({"op": "remove", "ids": [task["id"] for task in removed]}, inverse)
+        return removed
+
+
+def apply_change(store, change):
+    """把一条变更记录应用到任务存储"""
+    op = change["op"]
+    if op == "add":
+        store.insert(change["task"])
+    elif op == "update":
+        store.update(change["id"], **change["fields"])
+    elif op == "remove":
+        if len(change["ids"]) == 1:
+            store.remove(change["ids"][0])
+        else:
+            store.remove_ids(change["ids"])
+    elif op == "batch":
+        changes = change["changes"]
+        with store.transaction():
+            if len(changes) > 1 and all(item["op"] == "add" for item in changes):
+                # 批量删除的逆向记录，一次合并插入
+                store.insert_many([item["task"] for item in changes])
+            else:
+                for item in changes:
+                    apply_change(store, item)
+    else:
+        raise ValueError(f"未知的变更类型: {op}")
+
+
+def diff_tasks(old, new):
+    """比较两个任务列表（Task 或字典），返回把 old 变为 new 的变更记录列表
+    
+    只为删除、新增和字段不同的任务生成记录，修改记录只包含变化的字段。
+    """
+    old_index = {}
+    for task in old:
+        task = Task.from_dict(task)
+        old_index[task.id] = task
+    
+    added = []
+    updated = []
+    seen = set()
+    for task in new:
+        task = Task.from_dict(task)
+        seen.add(task.id)
+        previous = old_index.get(task.id)
+        if previous is None:
+            added.append({"op": "add", "task": task})
+        elif previous is not task and (
+                (previous.task, previous.due_date, previous.completed, previous.pos, previous._extra)
+                != (task.task, task.due_date, task.completed, task.pos, task._extra)):
+            fields = {key: task.get(key) for key in set(previous) | set(task) if previous.get(key) != task.get(key)}
+            updated.append({"op": "update", "id": task.id, "fields": fields})
+    
+    removed = [task_id for task_id in old_index if task_id not in seen]
+    changes = [{"op": "remove", "ids": removed}] if removed else []
+    return changes + updated + added
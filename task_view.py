@@ -0,0 +1,305 @@
+"""任务列表渲染
+
+只调用 Treeview 控件自身的方法，不直接导入 tkinter。
+"""
+
+
+def task_row(task, rank):
+    """生成任务在列表中显示的列值和标签，rank 为从1开始的显示序号"""
+    values = (
+        rank,
+        task["task"],
+        task["due_date"] if task["due_date"] else "无",
+        "✓" if task["completed"] else "✗",
+        "↑",
+        "↓",
+        "✏️",
+        "🗑️"
+    )
+    
+    # 根据完成状态设置标签
+    tags = ("completed",) if task["completed"] else ("pending",)
+    return values, tags
+
+
+def stable_rows(current, target):
+    """找出无需移动的行
+    
+    取目标顺序中、在当前顺序里下标递增的最长子序列，这些行保持不动，
+    其余行移动即可得到目标顺序，移动次数最少。
+    """
+    positions = {row_id: index for index, row_id in enumerate(current)}
+    sequence = [row_id for row_id in target if row_id in positions]
+    
+    # tails[k] 为长度 k+1 的递增子序列末尾元素在 sequence 中的下标
+    tails = []
+    tail_values = []
+    previous = [-1] * len(sequence)
+    for index, row_id in enumerate(sequence):
+        value = positions[row_id]
+        low, high = 0, len(tail_values)
+        while low < high:
+            middle = (low + high) // 2
+            if tail_values[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        
+        if low > 0:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+            tail_values.append(value)
+        else:
+            tails[low] = index
+            tail_values[low] = value
+    
+    # 回溯得到子序列
+    stable = set()
+    index = tails[-1] if tails else -1
+    while index != -1:
+        stable.add(sequence[index])
+        index = previous[index]
+    return stable
+
+
+class TaskTreeRenderer:
+    """增量刷新 Treeview
+    
+    以任务ID作为行ID，与上一次显示的内容做对比，只对新增、变化、移动和删除的行调用 Tk，
+    未变化的行保持原样，因此选中状态和滚动位置不会丢失。
+    """
+    
+    def __init__(self, tree, row_builder=task_row):
+        self.tree = tree
+        self.row_builder = row_builder
+        
+        # 行ID -> (列值, 标签)，与 Treeview 当前内容一致
+        self._rows = {}
+        # 当前显示顺序
+        self._order = []
+        
+        # 最近一次刷新和累计执行的 Tk 操作次数
+        self.last_ops = 0
+        self.total_ops = 0
+    
+    def row_id(self, task):
+        """返回任务对应的行ID"""
+        return str(task["id"])
+    
+    def task_id(self, row_id):
+        """返回行对应的任务ID"""
+        return int(row_id)
+    
+    def refresh(self, tasks):
+        """按给定的任务顺序刷新列表，返回本次执行的 Tk 操作次数"""
+        ops = 0
+        
+        new_rows = {}
+        new_order = []
+        for rank, task in enumerate(tasks, 1):
+            row_id = self.row_id(task)
+            new_rows[row_id] = self.row_builder(task, rank)
+            new_order.append(row_id)
+        
+        # 一次性删除已经不存在的行
+        order = self._order
+        stale = [row_id for row_id in order if row_id not in new_rows]
+        if stale:
+            self.tree.delete(*stale)
+            ops += 1
+            order = [row_id for row_id in order if row_id in new_rows]
+        
+        # 只更新内容发生变化的行
+        for row_id in order:
+            row = new_rows[row_id]
+            if self._rows[row_id] != row:
+                self.tree.item(row_id, values=row[0], tags=row[1])
+                ops += 1
+        
+        # 插入新行并调整顺序
+        if order != new_order:
+            ops += self._reorder(order, new_order, new_rows)
+        
+        self._rows = new_rows
+        self._order = new_order
+        
+        self.last_ops = ops
+        self.total_ops += ops
+        return ops
+    
+    def _reorder(self, order, new_order, rows):
+        """把当前顺序调整为目标顺序，返回执行的 Tk 操作次数"""
+        ops = 0
+        
+        # 跳过首尾相同的部分
+        start = 0
+        limit = min(len(order), len(new_order))
+        while start < limit and order[start] == new_order[start]:
+            start += 1
+        
+        end = len(order)
+        new_end = len(new_order)
+        while end > start and new_end > start and order[end - 1] == new_order[new_end - 1]:
+            end -= 1
+            new_end -= 1
+        
+        # current 与 Treeview 中 [start, end) 区间的行保持一致
+        current = order[start:end]
+        target = new_order[start:new_end]
+        existing = set(current)
+        stable = stable_rows(current, target)
+        
+        for offset, row_id in enumerate(target):
+            if row_id in stable:
+                continue
+            
+            if row_id in existing:
+                current.remove(row_id)
+            
+            # 放在目标顺序中前一行的后面
+            index = current.index(target[offset - 1]) + 1 if offset else 0
+            current.insert(index, row_id)
+            
+            if row_id in existing:
+                self.tree.move(row_id, "", start + index)
+            else:
+                values, tags = rows[row_id]
+                self.tree.insert("", start + index, iid=row_id, values=values, tags=tags)
+            ops += 1
+        
+        return ops
+
+
+class VirtualTaskTreeRenderer:
+    """虚拟列表渲染
+    
+    Treeview 中只保留可见区域加少量预留行的固定行池，滚动时把行池重新绑定到对应的任务上。
+    滚动条由本类驱动，滚动位置对应任务序列中的下标。
+    """
+    
+    def __init__(self, tree, set_scrollbar, row_builder=task_row, row_height=35, overscan=5):
+        self.tree = tree
+        self.set_scrollbar = set_scrollbar
+        self.row_builder = row_builder
+        self.row_height = row_height
+        self.overscan = overscan
+        
+        # 当前显示的任务序列，以及第一个可见任务的下标
+        self.tasks = []
+        self.offset = 0
+        # 可见区域能容纳的行数，收到第一次尺寸变化事件前使用默认值
+        self.visible = 20
+        
+        # 行池：按显示顺序排列的行ID，以及每行当前的内容和对应的任务ID
+        self._pool = []
+        self._rows = {}
+        self._row_tasks = {}
+        # 选中的任务ID，滚动出可见区域后仍然保留
+        self.selected = set()
+        self._selected_rows = ()
+        
+        # 最近一次刷新和累计执行的 Tk 操作次数
+        self.last_ops = 0
+        self.total_ops = 0
+    
+    def task_id(self, row_id):
+        """返回行当前对应的任务ID"""
+        return self._row_tasks.get(row_id)
+    
+    def refresh(self, tasks=None):
+        """刷新行池内容，返回本次执行的 Tk 操作次数"""
+        if tasks is not None:
+            self.tasks = tasks
+        ops = 0
+        
+        # 限制滚动位置
+        total = len(self.tasks)
+        self.offset = max(0, min(self.offset, total - self.visible))
+        end = min(total, self.offset + self.visible + self.overscan)
+        count = end - self.offset
+        
+        # 调整行池大小
+        if len(self._pool) > count:
+            surplus = self._pool[count:]
+            self.tree.delete(*surplus)
+            ops += 1
+            del self._pool[count:]
+            for row_id in surplus:
+                del self._rows[row_id]
+                del self._row_tasks[row_id]
+        
+        # 把行池绑定到当前窗口内的任务，只更新内容变化的行
+        selected_rows = []
+        for slot in range(count):
+            task = self.tasks[self.offset + slot]
+            row = self.row_builder(task, self.offset + slot + 1)
+            
+            if slot == len(self._pool):
+                row_id = f"v{slot}"
+                self.tree.insert("", "end", iid=row_id, values=row[0], tags=row[1])
+                ops += 1
+                self._pool.append(row_id)
+            else:
+                row_id = self._pool[slot]
+                if self._rows[row_id] != row:
+                    self.tree.item(row_id, values=row[0], tags=row[1])
+                    ops += 1
+            
+            self._rows[row_id] = row
+            self._row_tasks[row_id] = task["id"]
+            if task["id"] in self.selected:
+                selected_rows.append(row_id)
+        
+        # 同步选中状态
+        selected_rows = tuple(selected_rows)
+        if selected_rows != self._selected_rows:
+            self.tree.selection_set(selected_rows)
+            self._selected_rows = selected_rows
+            ops += 1
+        
+        self._update_scrollbar()
+        
+        self.last_ops = ops
+        self.total_ops += ops
+        return ops
+    
+    def _update_scrollbar(self):
+        """根据滚动位置更新滚动条"""
+        total = len(self.tasks)
+        if total <= self.visible:
+            self.set_scrollbar(0.0, 1.0)
+        else:
+            self.set_scrollbar(self.offset / total, min(1.0, (self.offset + self.visible) / total))
+    
+    def sync_selection(self):
+        """用户改变选中项后，记录选中的任务ID"""
+        self._selected_rows = tuple(self.tree.selection())
+        in_view = {self._row_tasks[row_id] for row_id in self._pool}
+        chosen = {self._row_tasks[row_id] for row_id in self._selected_rows if row_id in self._row_tasks}
+        self.selected = (self.selected - in_view) | chosen
+    
+    def resize(self, height):
+        """可见区域尺寸变化时重新计算可见行数"""
+        # 扣除大约一行高度的列标题
+        visible = max(1, height // self.row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+    
+    def scroll_to(self, offset):
+        """滚动到指定下标"""
+        offset = max(0, min(offset, len(self.tasks) - self.visible))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+    
+    def yview(self, *args):
+        """滚动条回调，参数与 Treeview.yview 相同"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.tasks)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible
+            self.scroll_to(self.offset + step)
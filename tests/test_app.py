@@ -0,0 +1,93 @@
+"""用无显示环境的 TodoApp 测试界面逻辑
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import date
+from tkinter import messagebox
+
+from benchmarks.headless import make_app
+from task_storage import JsonBackend
+from todo_cli import TaskFile, parse_task_fields
+
+
+class TaskListTest(unittest.TestCase):
+    """智能视图、筛选框和任务列表"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.app = make_app(JsonBackend(os.path.join(self.data_dir, "todos.json"), delay=0))
+        self.app.load_tasks()
+        self.app.process_events()
+    
+    def tearDown(self):
+        self.app.backend.close()
+        shutil.rmtree(self.data_dir)
+    
+    def shown(self):
+        """返回列表中显示的任务描述"""
+        tree = self.app.task_tree
+        return [tree.item(row, "values")[1] for row in tree.order]
+    
+    def test_view_with_punctuation_query(self):
+        today = date.today().isoformat()
+        self.app.store.add("今天的会议", today)
+        self.app.store.add("today review", today)
+        self.app.store.add("没有日期")
+        self.app.view_var.set("today")
+        
+        # 只有标点的查询没有可搜索的词，不筛选
+        for query in ("!!", "#", "-"):
+            self.app.filter_var.set(query)
+            self.app.update_task_list()
+            self.assertEqual(sorted(self.shown()), sorted(["今天的会议", "today review"]))
+        
+        self.app.filter_var.set("会议")
+        self.app.update_task_list()
+        self.assertEqual(self.shown(), ["今天的会议"])
+    
+    
+    def test_background_load(self):
+        with TaskFile(self.data_dir, write=True) as tasks:
+            tasks.append([parse_task_fields("saved task")])
+            tasks.save()
+        app = make_app(JsonBackend(os.path.join(self.data_dir, "todos.json"), delay=0))
+        app.start_loading()
+        # 后台线程交来的回调由主线程定期取出执行
+        deadline = time.monotonic() + 5
+        while app.loading and time.monotonic() < deadline:
+            app.root.update()
+            time.sleep(0.001)
+        self.assertFalse(app.loading)
+        self.assertEqual([task.task for task in app.store], ["saved task"])
+        app.backend.close()
+    
+    
+    def test_close_reports_failed_save(self):
+        path = os.path.join(self.data_dir, "snapshot.json")
+        app = make_app(JsonBackend(path, journal=False, delay=60))
+        app.load_tasks()
+        app.process_events()
+        app.store.add("unsaved task")
+        app.save_tasks()
+        
+        def fail(path, tasks):
+            raise OSError("磁盘已满")
+        app.backend.writer.write = fail
+        errors = []
+        messagebox.showerror = lambda title, message: errors.append(message)
+        
+        # 关闭时最后一次写入失败，在关闭窗口之前同步提示
+        start = time.monotonic()
+        app.on_close()
+        self.assertLess(time.monotonic() - start, app.CLOSE_TIMEOUT)
+        self.assertEqual(len(errors), 1)
+        self.assertIn("磁盘已满", errors[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""撤销和重做的测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import unittest
+
+from task_history import UndoHistory
+from task_store import TaskStore
+
+
+def state(store):
+    return [task.to_dict() for task in store.tasks]
+
+
+class UndoHistoryTest(unittest.TestCase):
+    """撤销、重做批量修改，以及超出限制时丢弃最早的步骤"""
+    
+    def setUp(self):
+        self.store = TaskStore()
+        for text in "ABCDE":
+            self.store.add(text)
+        self.history = UndoHistory(self.store)
+    
+    def test_single_changes(self):
+        before = state(self.store)
+        task = self.store.tasks[0]
+        self.store.update(task.id, task="changed")
+        self.store.remove(self.store.tasks[1].id)
+        after = state(self.store)
+        
+        self.assertTrue(self.history.undo())
+        self.assertTrue(self.history.undo())
+        self.assertEqual(state(self.store), before)
+        self.assertFalse(self.history.undo())
+        
+        self.assertTrue(self.history.redo())
+        self.assertTrue(self.history.redo())
+        self.assertEqual(state(self.store), after)
+        self.assertFalse(self.history.redo())
+    
+    def test_batch_changes(self):
+        before = state(self.store)
+        ids = [task.id for task in self.store.tasks]
+        self.store.update_many(ids[:3], completed=True)
+        self.store.move_to_edge(ids[3:], top=True)
+        self.store.remove_ids(ids[1:4])
+        after = state(self.store)
+        
+        # 每个批量操作作为一步撤销
+        self.assertTrue(self.history.undo())
+        self.assertEqual([task.task for task in self.store.tasks], list("DEABC"))
+        self.assertTrue(self.history.undo())
+        self.assertEqual([task.task for task in self.store.tasks], list("ABCDE"))
+        self.assertEqual([task.completed for task in self.store.tasks], [True] * 3 + [False] * 2)
+        self.assertTrue(self.history.undo())
+        self.assertEqual(state(self.store), before)
+        
+        for _ in range(3):
+            self.assertTrue(self.history.redo())
+        self.assertEqual(state(self.store), after)
+    
+    def test_new_change_clears_redo(self):
+        self.store.add("F")
+        self.history.undo()
+        self.store.add("G")
+        self.assertFalse(self.history.redo())
+        self.assertEqual(self.history._size, 1)
+    
+    def test_max_steps(self):
+        history = UndoHistory(self.store, max_steps=3)
+        for index in range(5):
+            self.store.add(str(index))
+        for _ in range(3):
+            self.assertTrue(history.undo())
+        self.assertFalse(history.undo())
+        self.assertEqual([task.task for task in self.store.tasks][-2:], ["0", "1"])
+    
+    def test_max_changes(self):
+        history = UndoHistory(self.store, max_changes=3)
+        ids = [task.id for task in self.store.tasks]
+        self.store.update(ids[0], task="a")
+        self.store.update_many(ids[1:3], task="b")
+        # 第三步加入后共 4 条修改，最早的一步被丢弃
+        self.store.update(ids[3], task="d")
+        self.assertEqual(history._size, 3)
+        
+        self.assertTrue(history.undo())
+        self.assertTrue(history.undo())
+        self.assertFalse(history.undo())
+        self.assertEqual([task.task for task in self.store.tasks], ["a", "B", "C", "D", "E"])
+        
+        # 最近一步超出限制时也保留
+        self.store.remove_ids(ids)
+        self.assertEqual(history._size, 5)
+        self.assertTrue(history.undo())
+        self.assertEqual(len(self.store), 5)
+        self.assertEqual(history._size, 5)
+    
+    def test_limit_counts_both_stacks(self):
+        history = UndoHistory(self.store, max_changes=6)
+        ids = [task.id for task in self.store.tasks]
+        self.store.update(ids[0], task="a")
+        self.store.remove_ids(ids)
+        history.undo()
+        # 撤销产生的 5 条重做记录和剩下的 1 条撤销记录一起计入限制
+        self.assertEqual(history._size, 6)
+        self.store.add("F")
+        # 新的修改清空重做历史，之前的撤销步骤仍然保留
+        self.assertEqual(history._size, 2)
+        self.assertTrue(history.undo())
+        self.assertTrue(history.undo())
+        self.assertEqual(self.store.tasks[0].task, "A")
+        self.assertTrue(history.redo())
+        self.assertTrue(history.redo())
+        self.assertEqual([task.task for task in self.store.tasks], ["a", "B", "C", "D", "E", "F"])
+    
+    def test_paused(self):
+        with self.history.paused():
+            self.store.add("F")
+        self.assertFalse(self.history.undo())
+
+
+if __name__ == "__main__":
+    unittest.main()
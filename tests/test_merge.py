@@ -0,0 +1,160 @@
+"""合并其他进程修改时ID和排序键冲突的回归测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from task_store import TaskStore, task_key
+from task_storage import ExternalChangeError, JsonBackend, SqliteBackend
+from todo_cli import TaskFile, parse_task_fields
+
+
+def open_store(backend):
+    """像界面一样读取数据并关联任务存储"""
+    store = TaskStore(backend.load())
+    backend.attach(store)
+    return store
+
+
+def cli_add(data_dir, text):
+    """像另一个进程一样添加一个任务，只追加修改日志，不合并进快照"""
+    with TaskFile(data_dir, write=True) as tasks:
+        tasks.append([parse_task_fields(text)])
+        tasks.backend.commit()
+
+
+def compact(path):
+    """像另一个进程一样把修改日志合并进快照"""
+    other = JsonBackend(path)
+    other.load()
+    assert other.journal.compact()
+    other.journal.wait()
+
+
+class MergeTest(unittest.TestCase):
+    """两个进程同时新增任务，分配到相同的ID或排序键"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.data_dir, "todos.json")
+        cli_add(self.data_dir, "seed")
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def resave(self, backend):
+        """保存因其他进程的修改被拒绝后，像界面一样合并再保存"""
+        with self.assertRaises(ExternalChangeError):
+            backend.commit()
+        backend.merge(backend.poll())
+        backend.commit()
+    
+    def assertConsistent(self, store, reloaded):
+        """内存中的任务与重新读取的数据相同，ID和排序键都不重复，索引与列表一致"""
+        self.assertEqual([task.to_dict() for task in store.tasks], [dict(task) for task in reloaded])
+        self.assertEqual(len({task["id"] for task in reloaded}), len(reloaded))
+        self.assertEqual(len({task["pos"] for task in reloaded}), len(reloaded))
+        self.assertEqual(store.tasks, sorted(store.tasks, key=task_key))
+        for index, task in enumerate(store.tasks):
+            self.assertIs(store.get(task["id"]), task)
+            self.assertEqual(store.position(task["id"]), index)
+    
+    def test_journal_same_id_and_pos(self):
+        # 界面和命令行都把新任务分配为ID 2、排序键紧跟在 seed 后面
+        gui = JsonBackend(self.path)
+        store = open_store(gui)
+        cli_add(self.data_dir, "cli task")
+        store.add("gui task")
+        
+        self.resave(gui)
+        self.assertEqual([task["task"] for task in store.tasks], ["seed", "cli task", "gui task"])
+        self.assertEqual(store.get(2)["task"], "cli task")
+        self.assertConsistent(store, JsonBackend(self.path).load())
+        
+        # 删除界面的任务后，内存和文件中删除的是同一个任务
+        store.remove(store.tasks[-1]["id"])
+        gui.commit()
+        self.assertConsistent(store, JsonBackend(self.path).load())
+        self.assertEqual([task["task"] for task in store.tasks], ["seed", "cli task"])
+    
+    def test_journal_same_pos(self):
+        # 界面删除过任务，下一个ID比命令行的大，只有排序键相同
+        gui = JsonBackend(self.path)
+        store = open_store(gui)
+        store.remove(store.add("deleted")["id"])
+        gui.commit()
+        cli_add(self.data_dir, "cli task")
+        gui_task = store.add("gui task")
+        self.assertEqual(store.get(gui_task["id"]), gui_task)
+        
+        self.resave(gui)
+        self.assertEqual([task["task"] for task in store.tasks], ["seed", "cli task", "gui task"])
+        self.assertEqual(store.get(gui_task["id"])["task"], "gui task")
+        self.assertConsistent(store, JsonBackend(self.path).load())
+    
+    def test_journal_compacted_by_other_process(self):
+        gui = JsonBackend(self.path)
+        store = open_store(gui)
+        cli_add(self.data_dir, "cli task")
+        # 其他进程把日志合并进快照，界面需要重新读取全部数据
+        compact(self.path)
+        store.add("gui task")
+        
+        self.resave(gui)
+        self.assertEqual([task["task"] for task in store.tasks], ["seed", "cli task", "gui task"])
+        self.assertConsistent(store, JsonBackend(self.path).load())
+        
+        store.remove(store.tasks[-1]["id"])
+        gui.commit()
+        self.assertEqual([task["task"] for task in store.tasks], ["seed", "cli task"])
+        self.assertConsistent(store, JsonBackend(self.path).load())
+    
+    def test_snapshot_same_id_and_pos(self):
+        compact(self.path)
+        errors = []
+        first = JsonBackend(self.path, journal=False, delay=0, on_error=errors.append)
+        second = JsonBackend(self.path, journal=False, delay=0, on_error=errors.append)
+        first_store = open_store(first)
+        second_store = open_store(second)
+        
+        first_store.add("first task")
+        first.commit()
+        first.writer.flush()
+        second_store.add("second task")
+        second.commit()
+        second.writer.flush()
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ExternalChangeError)
+        
+        second.merge(second.poll())
+        second.commit()
+        second.writer.flush()
+        first.close()
+        second.close()
+        self.assertEqual([task["task"] for task in second_store.tasks], ["seed", "first task", "second task"])
+        self.assertConsistent(second_store, JsonBackend(self.path, journal=False).load())
+    
+    def test_sqlite_same_id_and_pos(self):
+        db_file = os.path.join(self.data_dir, "todos.db")
+        first = SqliteBackend(db_file, migrate_from=self.path)
+        first_store = open_store(first)
+        second = SqliteBackend(db_file)
+        second_store = open_store(second)
+        
+        first_store.add("first task")
+        first.commit()
+        second_store.add("second task")
+        self.resave(second)
+        self.assertEqual([task["task"] for task in second_store.tasks], ["seed", "first task", "second task"])
+        
+        reader = SqliteBackend(db_file)
+        self.assertConsistent(second_store, reader.load())
+        for backend in (first, second, reader):
+            backend.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
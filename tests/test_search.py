@@ -0,0 +1,75 @@
+"""搜索索引的测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import unittest
+
+from task_search import SearchIndex, index_terms, tokenize
+from task_store import TaskStore
+
+
+class TokenizeTest(unittest.TestCase):
+    """切分单词和中文片段"""
+    
+    def test_words_and_runs(self):
+        self.assertEqual(tokenize("Review 周报, deploy_v2 会议室"), (["review", "deploy", "v2"], ["周报", "会议室"]))
+        self.assertEqual(tokenize("!! # -"), ([], []))
+    
+    def test_index_terms(self):
+        self.assertEqual(index_terms("写周报 Email"), {"w:email", "c:写", "c:周", "c:报", "b:写周", "b:周报"})
+
+
+class SearchIndexTest(unittest.TestCase):
+    """前缀匹配、中文二元组匹配和增量更新"""
+    
+    def setUp(self):
+        self.store = TaskStore()
+        for text in ["review plan", "deploy release", "design review", "开会讨论报告", "写周报", "报告会"]:
+            self.store.add(text)
+        self.index = SearchIndex(self.store)
+    
+    def search(self, query):
+        return [task.task for task in self.index.search(query)]
+    
+    def test_prefix(self):
+        self.assertEqual(self.search("re"), ["review plan", "deploy release", "design review"])
+        self.assertEqual(self.search("de re"), ["deploy release", "design review"])
+        self.assertEqual(self.search("REVIEW"), ["review plan", "design review"])
+        self.assertEqual(self.search("reviews"), [])
+    
+    def test_cjk(self):
+        self.assertEqual(self.search("报"), ["开会讨论报告", "写周报", "报告会"])
+        self.assertEqual(self.search("报告"), ["开会讨论报告", "报告会"])
+        # 二元组都命中但片段不连续的任务被排除
+        self.assertEqual(self.search("报告会"), ["报告会"])
+        self.assertEqual(self.search("讨论报告"), ["开会讨论报告"])
+        self.assertEqual(self.search("会报"), [])
+    
+    def test_no_tokens(self):
+        self.assertIsNone(self.index.match_ids(""))
+        self.assertIsNone(self.index.match_ids("!! -"))
+        self.assertEqual(len(self.index.search("#")), len(self.store))
+    
+    def test_updates(self):
+        task = self.store.tasks[0]
+        self.store.update(task.id, task="replan")
+        self.assertEqual(self.search("review"), ["design review"])
+        self.assertEqual(self.search("repl"), ["replan"])
+        self.store.remove(self.store.tasks[2].id)
+        self.assertEqual(self.search("design"), [])
+        self.assertNotIn("design", self.index._words)
+        
+        with self.store.transaction():
+            added = self.store.add("design again")
+            self.store.update(added.id, task="redesign")
+        self.assertEqual(self.search("redes"), ["redesign"])
+        self.assertEqual(self.search("design"), [])
+    
+    def test_results_follow_list_order(self):
+        last = self.store.tasks[-1]
+        self.store.move_to_edge([last.id], top=True)
+        self.assertEqual(self.search("报告"), ["报告会", "开会讨论报告"])
+
+
+if __name__ == "__main__":
+    unittest.main()
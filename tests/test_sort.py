@@ -0,0 +1,100 @@
+"""按列排序视图的测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import random
+import unittest
+
+from task_sort import SortedTasks
+from task_store import TaskStore
+
+
+def texts(tasks):
+    return [task.task for task in tasks]
+
+
+class SortedTasksTest(unittest.TestCase):
+    """整体排序，以及修改后用二分查找重新插入"""
+    
+    def setUp(self):
+        self.store = TaskStore()
+        for text, due_date in [("b", "2026-03-01"), ("a", ""), ("c", "2026-01-01"), ("a", "2026-02-01")]:
+            self.store.add(text, due_date)
+        self.view = SortedTasks(self.store)
+    
+    def assertMatchesRebuild(self):
+        """增量维护的顺序与重新排序的结果相同"""
+        self.assertFalse(self.view._dirty)
+        fresh = SortedTasks(self.store, self.view.column, self.view.descending)
+        self.assertEqual(list(self.view), list(fresh))
+    
+    def test_manual_order(self):
+        self.assertEqual(texts(self.view), ["b", "a", "c", "a"])
+    
+    def test_columns(self):
+        self.view.set_order("task")
+        self.assertEqual([(task.task, task.due_date) for task in self.view],
+                         [("a", ""), ("a", "2026-02-01"), ("b", "2026-03-01"), ("c", "2026-01-01")])
+        # 没有截止日期的任务无论升序还是降序都排在最后
+        self.view.set_order("due_date")
+        self.assertEqual(texts(self.view), ["c", "a", "b", "a"])
+        self.view.set_order("due_date", descending=True)
+        self.assertEqual(texts(self.view), ["b", "a", "c", "a"])
+        self.assertEqual(self.view[-1].due_date, "")
+    
+    def test_reinsert_after_update(self):
+        self.view.set_order("task")
+        list(self.view)
+        first = self.store.tasks[0]
+        self.store.update(first.id, task="0")
+        self.assertEqual(self.view[0].task, "0")
+        self.assertMatchesRebuild()
+        
+        # 排序值相同时按手动顺序，移动后位置随之变化
+        self.store.update(first.id, task="a")
+        self.store.move_to_edge([self.store.tasks[-1].id], top=True)
+        self.assertMatchesRebuild()
+        
+        self.store.remove(self.store.tasks[1].id)
+        added = self.store.add("aa")
+        self.store.toggle(added.id)
+        self.assertMatchesRebuild()
+    
+    def test_random_changes(self):
+        random.seed(3)
+        for column, descending in [("task", False), ("due_date", True), ("status", False)]:
+            self.view.set_order(column, descending)
+            list(self.view)
+            for _ in range(200):
+                task = random.choice(self.store.tasks)
+                choice = random.random()
+                if choice < 0.3:
+                    self.store.update(task.id, task=random.choice("abcde"))
+                elif choice < 0.5:
+                    self.store.update(task.id, due_date=random.choice(["", "2026-01-01", "2026-05-05"]))
+                elif choice < 0.6:
+                    self.store.toggle(task.id)
+                elif choice < 0.8:
+                    self.store.move(task.id, random.choice([-1, 1]))
+                elif len(self.store) > 2:
+                    self.store.remove(task.id)
+                else:
+                    self.store.add(random.choice("abcde"))
+                self.assertMatchesRebuild()
+    
+    def test_sort_subset(self):
+        self.view.set_order("task", descending=True)
+        subset = [self.store.tasks[3], self.store.tasks[0], self.store.tasks[1]]
+        self.assertEqual(texts(self.view.sort(subset)), ["b", "a", "a"])
+    
+    def test_neighbor(self):
+        self.view.set_order("task")
+        first_a, second_a = self.store.tasks[1].id, self.store.tasks[3].id
+        self.assertEqual(self.view.neighbor(first_a, 1), second_a)
+        self.assertEqual(self.view.neighbor(second_a, -1), first_a)
+        # 排序值不同的相邻任务不算
+        self.assertIsNone(self.view.neighbor(second_a, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
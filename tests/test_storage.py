@@ -0,0 +1,91 @@
+"""存储后端的测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from task_store import TaskStore
+from task_storage import JsonBackend, read_snapshot
+from todo_cli import main
+
+
+class JournalCloseTest(unittest.TestCase):
+    """日志模式关闭时把修改日志合并进 todos.json"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.data_dir, "todos.json")
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def test_close_folds_journal(self):
+        backend = JsonBackend(self.path)
+        store = TaskStore(backend.load())
+        backend.attach(store)
+        store.add("first")
+        store.add("second")
+        backend.commit()
+        self.assertFalse(os.path.exists(self.path))
+        
+        backend.close()
+        self.assertEqual([task["task"] for task in read_snapshot(self.path)], ["first", "second"])
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, "todos.journal")))
+        self.assertEqual([task["task"] for task in JsonBackend(self.path).load()], ["first", "second"])
+    
+    def test_close_without_changes_keeps_snapshot(self):
+        backend = JsonBackend(self.path)
+        store = TaskStore(backend.load())
+        backend.attach(store)
+        store.add("task")
+        backend.commit()
+        backend.close()
+        mtime = os.stat(self.path).st_mtime_ns
+        
+        # 日志为空时不重写快照
+        backend = JsonBackend(self.path)
+        backend.attach(TaskStore(backend.load()))
+        backend.close()
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime)
+
+    
+    def test_cli_writes_snapshot(self):
+        with open(os.devnull, "w") as out:
+            self.assertEqual(main(["--data-dir", self.data_dir, "add", "from cli"], out), 0)
+        self.assertEqual([task["task"] for task in read_snapshot(self.path)], ["from cli"])
+
+
+
+class ConvertTest(unittest.TestCase):
+    """命令行模式在 JSON 和二进制数据文件之间转换"""
+    
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+    
+    def cli(self, *args):
+        with open(os.devnull, "w") as out, redirect_stderr(out):
+            return main(["--data-dir", self.data_dir] + list(args), out)
+    
+    def test_round_trip(self):
+        self.cli("add", "first")
+        self.cli("add", "second")
+        json_path = os.path.join(self.data_dir, "todos.json")
+        binary_path = os.path.join(self.data_dir, "copy.bin")
+        copy_path = os.path.join(self.data_dir, "copy.json")
+        
+        self.assertEqual(self.cli("convert", json_path, binary_path), 0)
+        self.assertEqual(self.cli("convert", binary_path, copy_path), 0)
+        self.assertEqual(read_snapshot(copy_path), read_snapshot(json_path))
+        # 两个文件都不是二进制数据文件时报错
+        self.assertEqual(self.cli("convert", json_path, copy_path), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""任务存储和排序键的测试
+
+在仓库根目录运行：python -m unittest discover tests
+"""
+import random
+import unittest
+
+from task_store import Task, TaskStore, key_between, task_key
+
+
+def texts(store):
+    return [task.task for task in store.tasks]
+
+
+def assert_sorted(test, store):
+    """列表按 (排序键, ID) 排列，位置索引与列表一致"""
+    test.assertEqual(store.tasks, sorted(store.tasks, key=task_key))
+    for index, task in enumerate(store.tasks):
+        test.assertEqual(store.position(task.id), index)
+
+
+class KeyBetweenTest(unittest.TestCase):
+
+    def test_first_key(self):
+        self.assertEqual(key_between(None, None), "a0")
+    
+    def test_append_and_prepend(self):
+        keys = [key_between(None, None)]
+        for _ in range(1000):
+            keys.append(key_between(keys[-1], None))
+        for _ in range(1000):
+            keys.insert(0, key_between(None, keys[0]))
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        # 连续追加时键长只按对数增长
+        self.assertLessEqual(max(len(key) for key in keys), 4)
+    
+    def test_between(self):
+        random.seed(7)
+        keys = [key_between(None, None)]
+        for _ in range(2000):
+            index = random.randint(0, len(keys))
+            before = keys[index - 1] if index > 0 else None
+            after = keys[index] if index < len(keys) else None
+            key = key_between(before, after)
+            if before is not None:
+                self.assertLess(before, key)
+            if after is not None:
+                self.assertLess(key, after)
+            keys.insert(index, key)
+        self.assertEqual(keys, sorted(keys))
+    
+    def test_repeated_split(self):
+        # 总是插在同一个位置时，键变长但始终在两侧之间
+        low, high = "a0", "a1"
+        for _ in range(200):
+            key = key_between(low, high)
+            self.assertTrue(low < key < high)
+            high = key
+    
+    def test_wrong_order(self):
+        with self.assertRaises(ValueError):
+            key_between("a1", "a0")
+        with self.assertRaises(ValueError):
+            key_between("a1", "a1")
+
+
+class MoveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.store = TaskStore()
+        for text in "ABCD":
+            self.store.add(text)
+    
+    def test_move_at_edges(self):
+        first, last = self.store.tasks[0].id, self.store.tasks[-1].id
+        self.assertFalse(self.store.move(first, -1))
+        self.assertFalse(self.store.move(last, 1))
+        self.assertEqual(texts(self.store), list("ABCD"))
+        
+        self.assertTrue(self.store.move(first, 1))
+        self.assertEqual(texts(self.store), list("BACD"))
+        self.assertTrue(self.store.move(last, -1))
+        self.assertEqual(texts(self.store), list("BADC"))
+        assert_sorted(self, self.store)
+    
+    def test_move_to_edge(self):
+        ids = [task.id for task in self.store.tasks]
+        self.assertEqual(self.store.move_to_edge([ids[3], ids[2]], top=True), 2)
+        self.assertEqual(texts(self.store), list("CDAB"))
+        self.assertEqual(self.store.move_to_edge([ids[2]], top=False), 1)
+        self.assertEqual(texts(self.store), list("DABC"))
+        assert_sorted(self, self.store)
+    
+    def test_move_across_equal_keys(self):
+        # 合并过程中可能短暂出现排序键相同的任务，按ID排列
+        pos = self.store.tasks[1].pos
+        self.store.insert(Task(10, "B2", pos=pos))
+        self.store.insert(Task(11, "B3", pos=pos))
+        self.assertEqual(texts(self.store), ["A", "B", "B2", "B3", "C", "D"])
+        
+        # 在排序键相同的任务之间移动时移到这组任务的外侧
+        self.assertTrue(self.store.move(self.store.tasks[4].id, -1))
+        self.assertEqual(texts(self.store), ["A", "C", "B", "B2", "B3", "D"])
+        self.assertTrue(self.store.move(self.store.tasks[1].id, 1))
+        self.assertEqual(texts(self.store), ["A", "B", "B2", "B3", "C", "D"])
+        
+        self.assertTrue(self.store.move(11, -1))
+        self.assertEqual(texts(self.store)[:2], ["A", "B3"])
+        assert_sorted(self, self.store)
+    
+    def test_move_beside_equal_keys(self):
+        pos = self.store.tasks[1].pos
+        self.store.insert(Task(10, "B2", pos=pos))
+        d = self.store.tasks[-1].id
+        self.assertTrue(self.store.move_beside(d, 10, after=True))
+        self.assertEqual(texts(self.store), ["A", "B", "B2", "D", "C"])
+        self.assertTrue(self.store.move_beside(d, 10))
+        self.assertEqual(texts(self.store), ["A", "D", "B", "B2", "C"])
+        assert_sorted(self, self.store)
+
+
+class LoadTest(unittest.TestCase):
+
+    def test_missing_pos_keeps_file_order(self):
+        store = TaskStore([{"id": 3, "task": "c"}, {"id": 1, "task": "a"}, {"id": 2, "task": "b"}])
+        self.assertEqual(texts(store), ["c", "a", "b"])
+        keys = [task.pos for task in store.tasks]
+        self.assertEqual(keys, sorted(set(keys)))
+        
+        # 部分任务缺少排序键时同样按文件中的顺序重新生成
+        store = TaskStore([{"id": 1, "task": "x", "pos": "a5"}, {"id": 2, "task": "y"},
+                           {"id": 3, "task": "z", "pos": "a1"}])
+        self.assertEqual(texts(store), ["x", "y", "z"])
+        assert_sorted(self, store)
+    
+    def test_duplicate_pos(self):
+        store = TaskStore([{"id": 2, "task": "b", "pos": "a1"}, {"id": 3, "task": "c", "pos": "a0"},
+                           {"id": 1, "task": "a", "pos": "a1"}])
+        self.assertEqual(texts(store), ["c", "a", "b"])
+        keys = [task.pos for task in store.tasks]
+        self.assertEqual(keys, sorted(set(keys)))
+        assert_sorted(self, store)
+    
+    def test_valid_pos_kept(self):
+        data = [{"id": 1, "task": "b", "pos": "a2"}, {"id": 2, "task": "a", "pos": "a1"}]
+        store = TaskStore(data)
+        self.assertEqual([(task.task, task.pos) for task in store.tasks], [("a", "a1"), ("b", "a2")])
+    
+    def test_missing_and_duplicate_ids(self):
+        store = TaskStore([{"id": 1, "task": "a", "pos": "a0"}, {"id": 1, "task": "b", "pos": "a1"},
+                           {"task": "c", "pos": "a2"}])
+        self.assertEqual(texts(store), ["a", "b", "c"])
+        self.assertEqual([task.id for task in store.tasks], [1, 2, 3])
+        self.assertEqual(store.next_id(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
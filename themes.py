@@ -0,0 +1,263 @@
+"""界面主题
+
+每个主题在第一次使用时编译为一组 ttk 样式（样式名 -> configure 选项和 map 选项）以及
+Treeview 标签选项，切换主题时只重新配置取值不同的部分。
+不依赖 tkinter，样式的实际配置由调用方完成。
+"""
+import json
+import os
+
+
+# 颜色方案，所有主题必须包含相同的键
+PALETTES = {
+    "light": {
+        "primary_color": "#4a90e2",
+        "primary_active": "#357abd",
+        "primary_hover": "#5aa0e5",
+        "secondary_color": "#50e3c2",
+        "secondary_active": "#3bc1a0",
+        "secondary_hover": "#62e6c3",
+        "danger_color": "#e74c3c",
+        "danger_active": "#c0392b",
+        "danger_hover": "#ea6153",
+        "warning_color": "#f39c12",
+        "warning_active": "#d35400",
+        "warning_hover": "#f5b041",
+        "success_color": "#2ecc71",
+        "success_active": "#27ae60",
+        "background_color": "#f5f5f5",
+        "card_color": "#ffffff",
+        "text_color": "#333333",
+        "text_light": "#666666",
+        "text_disabled": "#9e9e9e",
+        "border_color": "#e0e0e0",
+        "scrollbar_bg": "#e0e0e0",
+        "scrollbar_trough": "#f0f0f0"
+    },
+    "dark": {
+        "primary_color": "#3d7fd1",
+        "primary_active": "#2f66a8",
+        "primary_hover": "#5592dc",
+        "secondary_color": "#2fa88c",
+        "secondary_active": "#248670",
+        "secondary_hover": "#3cbf9f",
+        "danger_color": "#c9473a",
+        "danger_active": "#a3372c",
+        "danger_hover": "#d9604f",
+        "warning_color": "#c98410",
+        "warning_active": "#a35f0b",
+        "warning_hover": "#dc9a2c",
+        "success_color": "#27a35b",
+        "success_active": "#1f8449",
+        "background_color": "#1e1f22",
+        "card_color": "#2b2d31",
+        "text_color": "#e3e5e8",
+        "text_light": "#8e9297",
+        "text_disabled": "#5c6067",
+        "border_color": "#3c3f45",
+        "scrollbar_bg": "#3c3f45",
+        "scrollbar_trough": "#25272b"
+    }
+}
+
+DEFAULT_THEME = "light"
+
+# 已经编译的主题
+_themes = {}
+
+
+def compile_styles(colors):
+    """根据颜色方案生成主窗口使用的样式"""
+    return {
+        # 通用样式，未指定样式的框架和标签使用
+        "TFrame": {"configure": {"background": colors["background_color"]}},
+        "TLabel": {"configure": {"background": colors["background_color"], "foreground": colors["text_color"]}},
+        
+        # 按钮样式
+        "Add.TButton": {
+            "configure": {"background": colors["primary_color"], "foreground": "white", "borderwidth": 0, "font": ("Segoe UI", 15, "bold"), "padding": 10},
+            "map": {"background": [("active", colors["primary_active"]), ("hover", colors["primary_hover"])]}
+        },
+        "Edit.TButton": {
+            "configure": {"background": colors["secondary_color"], "foreground": "white", "borderwidth": 0, "font": ("Segoe UI", 15), "padding": 8},
+            "map": {"background": [("active", colors["secondary_active"]), ("hover", colors["secondary_hover"])]}
+        },
+        "Delete.TButton": {
+            "configure": {"background": colors["danger_color"], "foreground": "white", "borderwidth": 0, "font": ("Segoe UI", 15), "padding": 8},
+            "map": {"background": [("active", colors["danger_active"]), ("hover", colors["danger_hover"])]}
+        },
+        "ToggleStatus.TButton": {
+            "configure": {"background": colors["warning_color"], "foreground": "white", "borderwidth": 0, "font": ("Segoe UI", 15), "padding": 8},
+            "map": {"background": [("active", colors["warning_active"]), ("hover", colors["warning_hover"])]}
+        },
+        "Theme.TButton": {
+            "configure": {"background": colors["background_color"], "foreground": colors["text_color"], "borderwidth": 0, "font": ("Segoe UI", 13), "padding": 2},
+            "map": {"background": [("active", colors["border_color"]), ("hover", colors["border_color"])]}
+        },
+        
+        # 智能视图按钮样式
+        "View.Toolbutton": {
+            "configure": {"background": colors["background_color"], "foreground": colors["text_color"], "font": ("Segoe UI", 12), "padding": (8, 4)},
+            "map": {"background": [("selected", colors["primary_color"]), ("active", colors["border_color"])], "foreground": [("selected", "white")]}
+        },
+        
+        # 输入区域样式
+        "Input.TLabelframe": {"configure": {"background": colors["background_color"], "foreground": colors["primary_color"], "font": ("Segoe UI", 15, "bold"), "relief": "flat"}},
+        "Input.TLabelframe.Label": {"configure": {"background": colors["background_color"], "foreground": colors["primary_color"], "font": ("Segoe UI", 15, "bold")}},
+        
+        # 列表区域样式
+        "List.TLabelframe": {"configure": {"background": colors["background_color"], "foreground": colors["primary_color"], "font": ("Segoe UI", 15, "bold"), "relief": "flat"}},
+        "List.TLabelframe.Label": {"configure": {"background": colors["background_color"], "foreground": colors["primary_color"], "font": ("Segoe UI", 15, "bold")}},
+        
+        # 标签样式
+        "Label.TLabel": {"configure": {"background": colors["card_color"], "foreground": colors["text_color"], "font": ("Segoe UI", 15)}},
+        
+        # 输入框样式
+        "Entry.TEntry": {
+            "configure": {"background": colors["card_color"], "fieldbackground": colors["card_color"], "foreground": colors["text_color"], "insertcolor": colors["text_color"], "font": ("Segoe UI", 15), "padding": 8, "relief": "solid", "bordercolor": colors["border_color"]},
+            "map": {"bordercolor": [("focus", colors["primary_color"]), ("hover", colors["border_color"])], "relief": [("focus", "solid"), ("hover", "solid")]}
+        },
+        
+        # 树状图样式
+        "TaskTree.Treeview": {"configure": {"background": colors["card_color"], "fieldbackground": colors["card_color"], "foreground": colors["text_color"], "font": ("Segoe UI", 14), "rowheight": 35}},
+        "TaskTree.Treeview.Heading": {
+            "configure": {"background": colors["primary_color"], "foreground": "white", "font": ("Segoe UI", 15, "bold"), "padding": 10},
+            "map": {"background": [("active", colors["primary_active"])]}
+        },
+        "TaskTree.Treeview.Cell": {"configure": {"background": colors["card_color"], "foreground": colors["text_color"]}},
+        
+        # 滚动条样式
+        "TScrollbar": {
+            "configure": {"background": colors["scrollbar_bg"], "troughcolor": colors["scrollbar_trough"], "bordercolor": colors["border_color"]},
+            "map": {"background": [("active", colors["primary_color"]), ("hover", colors["primary_color"])]}
+        },
+        
+        # 加载进度条样式
+        "TProgressbar": {"configure": {"background": colors["primary_color"], "troughcolor": colors["scrollbar_trough"], "bordercolor": colors["border_color"]}},
+        
+        # Pin按钮样式
+        "Pin.TFrame": {"configure": {"background": colors["background_color"]}},
+        "Toggle.TCheckbutton": {"configure": {"background": colors["card_color"], "foreground": colors["text_color"], "font": ("Segoe UI", 15)}},
+        
+        # 操作区域样式
+        "Action.TFrame": {"configure": {"background": colors["background_color"]}}
+    }
+
+
+# 日历热力图的级别数，级别越高表示当天到期的任务越多
+HEAT_LEVELS = 4
+
+
+def blend(color_a, color_b, ratio):
+    """按比例混合两个 #rrggbb 颜色，ratio 为 0 时返回 color_a，为 1 时返回 color_b"""
+    a = [int(color_a[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(color_b[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * ratio):02x}" for x, y in zip(a, b))
+
+
+def compile_calendar_styles(colors):
+    """根据颜色方案生成日历选择器使用的样式，只在第一次打开日历时配置"""
+    styles = {
+        # 日期按钮样式
+        "Date.TButton": {
+            "configure": {"padding": 5, "background": colors["card_color"], "foreground": colors["text_color"]},
+            "map": {"background": [("active", colors["border_color"])]}
+        },
+        
+        # 选中日期样式
+        "SelectedDate.TButton": {
+            "configure": {"background": colors["primary_color"], "foreground": "white"},
+            "map": {"background": [("active", colors["primary_active"])]}
+        },
+        
+        # 今天日期样式
+        "TodayDate.TButton": {
+            "configure": {"background": colors["success_color"], "foreground": "white"},
+            "map": {"background": [("active", colors["success_active"])]}
+        },
+        
+        # 禁用日期样式
+        "DisabledDate.TButton": {"configure": {"foreground": colors["text_disabled"], "background": colors["card_color"]}}
+    }
+    
+    # 热力图样式，背景色从卡片颜色逐级过渡到主色
+    for level in range(1, HEAT_LEVELS + 1):
+        background = blend(colors["card_color"], colors["primary_color"], level / (HEAT_LEVELS + 1))
+        styles[f"Heat{level}.Date.TButton"] = {
+            "configure": {"background": background, "foreground": "white" if level > HEAT_LEVELS // 2 else colors["text_color"]},
+            "map": {"background": [("active", blend(background, colors["primary_active"], 0.5))]}
+        }
+    return styles
+
+
+class Theme:
+    """编译好的主题"""
+    
+    def __init__(self, name, colors):
+        self.name = name
+        self.colors = colors
+        self.styles = compile_styles(colors)
+        self.calendar_styles = compile_calendar_styles(colors)
+        
+        # 任务列表中按完成状态区分的标签
+        self.tags = {
+            "completed": {"foreground": colors["text_light"]},
+            "pending": {"foreground": colors["text_color"]}
+        }
+
+
+def get_theme(name):
+    """返回指定名称的主题，未知名称使用默认主题；每个主题只编译一次"""
+    if name not in PALETTES:
+        name = DEFAULT_THEME
+    if name not in _themes:
+        _themes[name] = Theme(name, PALETTES[name])
+    return _themes[name]
+
+
+def _changed(old, new):
+    """返回 new 中与 old 取值不同的选项"""
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+def style_changes(old, new):
+    """比较两组样式，返回需要执行的 (样式名, configure 选项, map 选项) 列表
+    
+    old 为 None 表示尚未配置过，此时返回 new 中的全部样式。
+    """
+    changes = []
+    for style, options in new.items():
+        previous = (old or {}).get(style, {})
+        configure = _changed(previous.get("configure", {}), options.get("configure", {}))
+        mapping = _changed(previous.get("map", {}), options.get("map", {}))
+        if configure or mapping:
+            changes.append((style, configure, mapping))
+    return changes
+
+
+def tag_changes(old, new):
+    """比较两组标签选项，返回需要执行的 (标签名, 选项) 列表"""
+    changes = []
+    for tag, options in new.items():
+        options = _changed((old or {}).get(tag, {}), options)
+        if options:
+            changes.append((tag, options))
+    return changes
+
+
+def load_theme_name(path):
+    """从 theme.json 读取主题名称，文件不存在或无法解析时返回默认主题"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            name = json.load(f).get("theme")
+    except (OSError, ValueError, AttributeError):
+        return DEFAULT_THEME
+    return name if name in PALETTES else DEFAULT_THEME
+
+
+def save_theme_name(path, name):
+    """把主题名称写入 theme.json"""
+    temp_file = path + ".saving"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump({"theme": name}, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, path)
@@ -1,16 +1,104 @@
+import time
+
+# 启动计时的起点，尽量早于其他导入
+START_TIME = time.perf_counter()
+
+import sys
+
+# 命令行模式不需要界面，在导入 tkinter 之前分派
+if __name__ == "__main__" and sys.argv[1:2] == ["cli"]:
+    from todo_cli import main
+    sys.exit(main(sys.argv[2:]))
+
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox
 import json
+import locale
 import os
-import sys
-from datetime import datetime, timedelta
-import winreg
+import queue
+import threading
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+from perf import MONITOR, timed
+from task_archive import TaskArchive
+from task_history import UndoHistory
+from task_store import TaskStore
+from reminders import ReminderScheduler
+from task_search import SearchIndex
+from task_sort import SORT_COLUMNS, SortedTasks
+from task_storage import ExternalChangeError, open_backend
+from task_view import TaskTreeRenderer, VirtualTaskTreeRenderer
+from themes import HEAT_LEVELS, get_theme, load_theme_name, save_theme_name, style_changes, tag_changes
+
+class StartupProfiler:
+    """记录启动过程中各阶段的耗时，使用 --profile-startup 启动时输出"""
+    
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = []
+        self.reported = False
+        self._last = START_TIME
+    
+    def mark(self, phase):
+        """记录从上一阶段结束到现在的耗时"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.marks.append((phase, now - self._last, now - START_TIME))
+        self._last = now
+        
+        # 首帧之后完成的阶段直接输出
+        if self.reported:
+            self._print(*self.marks[-1])
+    
+    def report(self):
+        """输出到目前为止的各阶段耗时"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        print(f"{'阶段':<24}{'耗时(ms)':>10}{'累计(ms)':>10}")
+        for mark in self.marks:
+            self._print(*mark)
+    
+    def _print(self, phase, elapsed, total):
+        print(f"{phase:<24}{elapsed * 1000:>10.1f}{total * 1000:>10.1f}", flush=True)
+
+@lru_cache(maxsize=64)
+def month_layout(year, month):
+    """返回月历 6x7 个格子的 ((日期, 是否属于当月), ...) 以及当月需要显示的行数，周日为每周第一天"""
+    first_day = datetime(year, month, 1)
+    
+    # 调整为周日开始，0=周日
+    start_weekday = (first_day.weekday() + 1) % 7
+    
+    # 当月和上个月的天数
+    next_month = datetime(year + month // 12, month % 12 + 1, 1)
+    days_in_month = (next_month - timedelta(days=1)).day
+    days_in_prev_month = (first_day - timedelta(days=1)).day
+    
+    cells = []
+    for slot in range(42):
+        day_num = slot - start_weekday + 1
+        if day_num < 1:
+            cells.append((days_in_prev_month + day_num, False))
+        elif day_num > days_in_month:
+            cells.append((day_num - days_in_month, False))
+        else:
+            cells.append((day_num, True))
+    
+    rows = (start_weekday + days_in_month + 6) // 7
+    return tuple(cells), rows
+
 
 class CalendarPicker(tk.Toplevel):
-    def __init__(self, parent, initial_date=None, on_select=None):
+    def __init__(self, parent, initial_date=None, on_select=None, background="#f5f5f5", due_count=None):
         super().__init__(parent)
         self.parent = parent
         self.on_select = on_select
+        self.background = background
+        # 根据日期（YYYY-MM-DD）返回当天到期任务数的函数，用于热力图
+        self.due_count = due_count
         
         # 设置窗口属性
         self.title("日期选择")
@@ -80,73 +168,76 @@ class CalendarPicker(tk.Toplevel):
         ttk.Button(today_frame, text="今天", command=self.select_today).pack(side=tk.RIGHT)
     
     def create_days_grid(self):
-        # 清空现有日期按钮
-        for widget in self.days_frame.winfo_children():
-            widget.destroy()
-        
+        """创建固定的 6x7 日期按钮池，切换月份时只修改按钮的文字、状态和样式"""
+        self.day_buttons = []
+        for slot in range(42):
+            btn = ttk.Button(self.days_frame, width=4, style="Date.TButton",
+                             command=lambda slot=slot: self.select_slot(slot))
+            btn.grid(row=slot // 7, column=slot % 7, padx=2, pady=2, sticky=tk.NSEW)
+            self.day_buttons.append(btn)
+        
+        # 按钮当前的 (文字, 是否可用, 样式)，没有变化的按钮不调用 Tk
+        self.button_states = [None] * 42
+        self.visible_rows = 6
+        
+        self.show_month()
+    
+    def show_month(self):
+        """把按钮池绑定到当前显示的月份"""
         # 更新标题
         self.title_label.config(text=f"{self.display_month}月 {self.display_year}")
         
-        # 获取当月第一天是星期几
-        first_day = datetime(self.display_year, self.display_month, 1)
-        start_weekday = first_day.weekday()  # 0=周一, 6=周日
+        cells, rows = month_layout(self.display_year, self.display_month)
         
-        # 调整为周日开始
-        start_weekday = (start_weekday + 1) % 7
-        
-        # 获取当月天数
-        if self.display_month == 12:
-            next_month = 1
-            next_year = self.display_year + 1
-        else:
-            next_month = self.display_month + 1
-            next_year = self.display_year
-        
-        days_in_month = (datetime(next_year, next_month, 1) - timedelta(days=1)).day
-        
-        # 计算需要显示的总天数（包括上个月和下个月的部分日期）
-        total_days = start_weekday + days_in_month
-        rows = (total_days + 6) // 7
-        
-        # 获取上个月的天数
-        if self.display_month == 1:
-            prev_month = 12
-            prev_year = self.display_year - 1
-        else:
-            prev_month = self.display_month - 1
-            prev_year = self.display_year
-        
-        days_in_prev_month = (datetime(self.display_year, self.display_month, 1) - timedelta(days=1)).day
-        
-        # 创建日期按钮
-        day_num = 1 - start_weekday
-        
-        for row in range(rows):
-            for col in range(7):
-                if day_num < 1:
-                    # 上个月的日期
-                    prev_day = days_in_prev_month + day_num
-                    btn = ttk.Button(self.days_frame, text=str(prev_day), width=4, state=tk.DISABLED, style="DisabledDate.TButton")
-                elif day_num > days_in_month:
-                    # 下个月的日期
-                    next_day = day_num - days_in_month
-                    btn = ttk.Button(self.days_frame, text=str(next_day), width=4, state=tk.DISABLED, style="DisabledDate.TButton")
+        # 今天和选中日期在当月中的日期，不在当月时为0
+        today = datetime.now()
+        today_day = today.day if (today.year, today.month) == (self.display_year, self.display_month) else 0
+        current = self.current_date
+        selected_day = current.day if (current.year, current.month) == (self.display_year, self.display_month) else 0
+        
+        for slot, (day, in_month) in enumerate(cells):
+            if not in_month:
+                # 上个月和下个月的日期
+                state = (str(day), False, "DisabledDate.TButton")
+            elif day == selected_day:
+                # 高亮当前选中的日期
+                state = (str(day), True, "SelectedDate.TButton")
+            elif day == today_day:
+                # 高亮今天
+                state = (str(day), True, "TodayDate.TButton")
+            else:
+                # 按当天到期的任务数着色
+                level = self.heat_level(day)
+                state = (str(day), True, f"Heat{level}.Date.TButton" if level else "Date.TButton")
+            
+            if state != self.button_states[slot]:
+                text, enabled, style = state
+                btn = self.day_buttons[slot]
+                btn.configure(text=text, style=style)
+                btn.state(["!disabled" if enabled else "disabled"])
+                self.button_states[slot] = state
+        
+        # 隐藏当月用不到的行
+        if rows != self.visible_rows:
+            for slot in range(min(rows, self.visible_rows) * 7, max(rows, self.visible_rows) * 7):
+                if slot < rows * 7:
+                    self.day_buttons[slot].grid()
                 else:
-                    # 当月的日期
-                    btn = ttk.Button(self.days_frame, text=str(day_num), width=4, style="Date.TButton")
-                    btn.config(command=lambda d=day_num: self.select_date(d))
-                    
-                    # 高亮今天
-                    today = datetime.now()
-                    if self.display_year == today.year and self.display_month == today.month and day_num == today.day:
-                        btn.config(style="TodayDate.TButton")
-                    
-                    # 高亮当前选中的日期
-                    if self.display_year == self.current_date.year and self.display_month == self.current_date.month and day_num == self.current_date.day:
-                        btn.config(style="SelectedDate.TButton")
-                
-                btn.grid(row=row, column=col, padx=2, pady=2, sticky=tk.NSEW)
-                day_num += 1
+                    self.day_buttons[slot].grid_remove()
+            self.visible_rows = rows
+    
+    def heat_level(self, day):
+        """返回当月某一天的热力图级别，0表示没有任务到期"""
+        if not self.due_count:
+            return 0
+        count = self.due_count(f"{self.display_year:04d}-{self.display_month:02d}-{day:02d}")
+        return min(count, HEAT_LEVELS)
+    
+    def select_slot(self, slot):
+        """点击日期按钮"""
+        day, in_month = month_layout(self.display_year, self.display_month)[0][slot]
+        if in_month:
+            self.select_date(day)
     
     def prev_month(self):
         if self.display_month == 1:
@@ -154,7 +245,7 @@ class CalendarPicker(tk.Toplevel):
             self.display_year -= 1
         else:
             self.display_month -= 1
-        self.create_days_grid()
+        self.show_month()
     
     def next_month(self):
         if self.display_month == 12:
@@ -162,7 +253,7 @@ class CalendarPicker(tk.Toplevel):
             self.display_year += 1
         else:
             self.display_month += 1
-        self.create_days_grid()
+        self.show_month()
     
     def select_date(self, day):
         selected_date = datetime(self.display_year, self.display_month, day)
@@ -177,31 +268,189 @@ class CalendarPicker(tk.Toplevel):
         self.destroy()
     
     def apply_theme(self):
-        # 创建样式
-        style = ttk.Style()
-        
-        # 只使用亮色主题
-        # 日期按钮样式
-        style.configure("Date.TButton", padding=5, background="#ffffff", foreground="#333333")
-        style.map("Date.TButton", background=[("active", "#e0e0e0")])
+        # 窗口背景，日期按钮的样式由主窗口的主题配置
+        self.configure(bg=self.background)
+
+class PerfOverlay(tk.Toplevel):
+    """性能统计窗口：显示各热点函数的调用次数和耗时，以及写入的字节数
+    
+    打开时开始记录，关闭时停止记录；以 --perf 启动时一直记录。
+    """
+    
+    # 刷新间隔（毫秒）
+    REFRESH_INTERVAL = 500
+    
+    def __init__(self, parent, monitor, export_path, colors):
+        super().__init__(parent)
+        self.monitor = monitor
+        self.export_path = export_path
+        # 打开前已经在记录时，关闭后继续记录
+        self.keep_enabled = monitor.enabled
+        monitor.enabled = True
         
-        # 选中日期样式
-        style.configure("SelectedDate.TButton", background="#4a90e2", foreground="white")
-        style.map("SelectedDate.TButton", background=[("active", "#357abd")])
+        self.title("性能统计")
+        self.resizable(False, False)
+        self.transient(parent)
+        self.wm_attributes("-topmost", True)
+        self.configure(bg=colors["background_color"])
+        
+        self.stats_label = tk.Label(self, font=("Consolas", 11), justify=tk.LEFT, anchor=tk.NW,
+                                    bg=colors["card_color"], fg=colors["text_color"], padx=10, pady=10)
+        self.stats_label.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        button_frame = ttk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        ttk.Button(button_frame, text="导出", command=self.export).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(button_frame, text="清空", command=self.clear).pack(side=tk.RIGHT, padx=5)
+        self.status_label = ttk.Label(button_frame, text="")
+        self.status_label.pack(side=tk.LEFT)
+        
+        self.bind("<Control-Shift-P>", lambda event: self.destroy())
+        self.bind("<Destroy>", self.on_destroy)
+        self._timer = None
+        self.refresh()
+    
+    def refresh(self):
+        """更新统计数据，内容不变时不重新配置标签"""
+        stats = self.monitor.stats()
+        lines = [f"{'指标':<18}{'次数':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for name, item in sorted(stats["metrics"].items()):
+            lines.append(f"{name:<20}{item['count']:>8}{item['p50_ms']:>10.2f}{item['p95_ms']:>10.2f}{item['max_ms']:>10.2f}")
+        if not stats["metrics"]:
+            lines.append("（尚无数据）")
+        
+        lines.append("")
+        lines.append(f"{'写入':<18}{'次数':>8}{'字节':>12}")
+        for kind, item in sorted(stats["bytes"].items()):
+            lines.append(f"{kind:<20}{item['writes']:>8}{item['bytes']:>12}")
+        
+        text = "\n".join(lines)
+        if self.stats_label.cget("text") != text:
+            self.stats_label.configure(text=text)
+        self._timer = self.after(self.REFRESH_INTERVAL, self.refresh)
+    
+    def export(self):
+        """把当前统计追加到 perf.jsonl"""
+        try:
+            self.monitor.export(self.export_path)
+        except OSError as e:
+            messagebox.showerror("导出失败", f"无法写入性能统计文件: {e}", parent=self)
+            return
+        self.status_label.configure(text=f"已导出到 {self.export_path}")
+    
+    def clear(self):
+        """清空已经记录的数据"""
+        self.monitor.reset()
+        self.status_label.configure(text="")
+    
+    def on_destroy(self, event):
+        """停止刷新，必要时停止记录"""
+        # 子控件销毁时也会收到该事件
+        if event.widget is not self:
+            return
+        if self._timer is not None:
+            self.after_cancel(self._timer)
+            self._timer = None
+        if not self.keep_enabled:
+            self.monitor.enabled = False
+
+
+class ArchiveWindow(tk.Toplevel):
+    """历史记录窗口：按归档时间从新到旧分页显示归档的任务，只读取当前页所在的分段"""
+    
+    PAGE_SIZE = 50
+    
+    def __init__(self, parent, archive, colors):
+        super().__init__(parent)
+        self.archive = archive
+        self.page = 0
         
-        # 今天日期样式
-        style.configure("TodayDate.TButton", background="#2ecc71", foreground="white")
-        style.map("TodayDate.TButton", background=[("active", "#27ae60")])
+        self.title("历史记录")
+        self.geometry("560x520")
+        self.transient(parent)
+        self.configure(bg=colors["background_color"])
+        
+        columns = ("task", "due_date", "archived_at")
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", style="TaskTree.Treeview")
+        self.tree.column("task", width=260, anchor=tk.W)
+        self.tree.column("due_date", width=100, anchor=tk.CENTER)
+        self.tree.column("archived_at", width=150, anchor=tk.CENTER)
+        self.tree.heading("task", text="任务", anchor=tk.W)
+        self.tree.heading("due_date", text="截止日期", anchor=tk.CENTER)
+        self.tree.heading("archived_at", text="归档时间", anchor=tk.CENTER)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 5))
+        
+        nav_frame = ttk.Frame(self)
+        nav_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        self.next_button = ttk.Button(nav_frame, text="更早 ›", command=lambda: self.show_page(self.page + 1))
+        self.next_button.pack(side=tk.RIGHT, padx=5)
+        self.prev_button = ttk.Button(nav_frame, text="‹ 较新", command=lambda: self.show_page(self.page - 1))
+        self.prev_button.pack(side=tk.RIGHT, padx=5)
+        self.page_label = ttk.Label(nav_frame, text="")
+        self.page_label.pack(side=tk.LEFT)
+        
+        self.bind("<Escape>", lambda event: self.destroy())
+        self.bind("<Prior>", lambda event: self.show_page(self.page - 1))
+        self.bind("<Next>", lambda event: self.show_page(self.page + 1))
+        self.show_page(0)
+    
+    def show_page(self, page):
+        """显示第 page 页（从0开始），超出范围时不变"""
+        try:
+            total = len(self.archive)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("读取失败", f"无法读取归档文件: {e}", parent=self)
+            return
+        pages = max(1, (total + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+        if not 0 <= page < pages:
+            return
         
-        # 禁用日期样式
-        style.configure("DisabledDate.TButton", foreground="#9e9e9e", background="#ffffff")
+        self.page = page
+        self.tree.delete(*self.tree.get_children())
+        for task in self.archive.page(page, self.PAGE_SIZE):
+            self.tree.insert("", tk.END, values=(task.get("task", ""), task.get("due_date", ""),
+                                                 task.get("archived_at", "").replace("T", " ")))
         
-        # 窗口背景
-        self.configure(bg="#f5f5f5")
+        self.page_label.configure(text=f"第 {page + 1} / {pages} 页，共 {total} 个任务" if total else "没有归档的任务")
+        self.prev_button.state(["!disabled" if page > 0 else "disabled"])
+        self.next_button.state(["!disabled" if page + 1 < pages else "disabled"])
+
 
 class TodoApp:
-    def __init__(self, root):
+    # 任务数达到该值时切换为虚拟列表，降到一半以下时切回普通列表
+    VIRTUAL_LIST_THRESHOLD = 1000
+    
+    # 任务列表上方的智能视图：(值, 按钮文字)
+    VIEWS = (("all", "全部"), ("overdue", "已过期"), ("today", "今天"), ("week", "7天内"), ("undated", "无日期"))
+    
+    # 存储后端的设置见 task_storage.py 中的 STORAGE_BACKEND 和 JOURNAL_MODE，命令行模式也使用它们
+    
+    # 后台保存时合并多次修改的时间窗口（秒）
+    SAVE_DELAY = 0.5
+    
+    # 检查其他程序是否修改了数据文件的间隔（毫秒）
+    WATCH_INTERVAL = 1000
+    
+    # 主线程执行后台线程交来的回调的间隔（毫秒）
+    EVENT_INTERVAL = 10
+    
+    # 关闭窗口时等待最后一次保存的最长时间（秒）
+    CLOSE_TIMEOUT = 10
+    
+    # 拖动窗口、调整窗口大小和列宽时两次更新的最小间隔（毫秒），约为一帧
+    FRAME_INTERVAL = 16
+    
+    # 窗口边缘和列边缘的检测范围（像素）
+    EDGE_THRESHOLD = 10
+    
+    # 归档模式：完成的任务和「归档已完成任务」移入 ~/.todo/archive/ 中压缩的分段文件，
+    # 不再保存在任务列表中，可以在历史记录中查看；压缩方式为 "gzip" 或 "lzma"
+    ARCHIVE_MODE = False
+    ARCHIVE_COMPRESSION = "gzip"
+    
+    def __init__(self, root, profiler=None):
         self.root = root
+        self.profiler = profiler or StartupProfiler()
         self.root.title("Todo List")
         self.root.geometry("650x700")
         self.root.resizable(True, True)
@@ -209,35 +458,31 @@ class TodoApp:
         # 使用系统默认的标题栏，以便正常使用最小化功能
         # 移除 overrideredirect(True) 标志，因为它会导致 iconify() 方法失效
         
-        # 窗口调整大小相关变量
-        self.resize_mode = False
-        self.resize_edge = None
-        self.resize_start_x = 0
-        self.resize_start_y = 0
-        self.resize_start_width = 0
-        self.resize_start_height = 0
-        
-        # 允许窗口调整大小
+        # 拖动窗口、调整窗口大小和调整列宽共用一组鼠标事件处理函数
         self.root.bind("<Motion>", self.on_motion)
-        # 只有在点击窗口边缘时才触发调整大小
-        self.root.bind("<Button-1>", self.start_resize, add="+")
-        self.root.bind("<B1-Motion>", self.resize_window, add="+")
-        self.root.bind("<ButtonRelease-1>", self.stop_resize)
+        self.root.bind("<ButtonPress-1>", self.on_press)
+        self.root.bind("<B1-Motion>", self.on_press_motion)
+        self.root.bind("<ButtonRelease-1>", self.on_release)
+        self.root.bind("<Configure>", self.on_window_configure)
         
-        # 窗口拖动相关变量
-        self.drag_x = 0
-        self.drag_y = 0
-        self.dragging_window = False
+        # 撤销和重做
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+        self.root.bind("<Control-Shift-Z>", self.redo)
+        
+        # 性能统计窗口，不在界面上显示入口
+        self.root.bind("<Control-Shift-P>", self.toggle_perf_overlay)
         
-        # 窗口拖动事件绑定
-        self.root.bind("<Button-1>", self.start_drag, add="+")
-        self.root.bind("<B1-Motion>", self.drag_window, add="+")
+        # 历史记录窗口，只在归档模式下绑定快捷键
+        if self.ARCHIVE_MODE:
+            self.root.bind("<Control-h>", self.on_archive_key)
         
         # 设置数据文件路径到用户主目录
         self.setup_data_file()
+        self.profiler.mark("创建存储后端")
         
-        # 加载任务数据
-        self.tasks = self.load_tasks()
+        # 任务存储、索引和后台消息队列等与控件无关的状态
+        self.init_state()
         
         # 设置样式
         self.style = ttk.Style()
@@ -248,15 +493,53 @@ class TodoApp:
         
         # 应用当前主题
         self.apply_theme()
+        self.profiler.mark("配置样式")
         
         # 创建UI
         self.create_widgets()
+        self.profiler.mark("创建控件")
         
-        # 更新任务列表
-        self.update_task_list()
+        # 开始加载任务数据，先显示的部分任务随加载进度逐批出现
+        self.start_loading()
         
         # 窗口置顶
         self.root.wm_attributes("-topmost", True)
+        
+        # 关闭窗口前保存尚未写入的数据
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def init_state(self):
+        """创建与控件无关的状态，无显示环境的基准测试和测试也调用它"""
+        # 鼠标手势：按下左键时确定是拖动窗口、调整窗口大小还是调整列宽，松开前不再重新判断
+        self.gesture = None
+        # 按住左键移动时最后一次的鼠标位置，以及等待执行的更新
+        self.gesture_pointer = None
+        self.gesture_timer = None
+        # 当前的光标，只在变化时设置
+        self.cursor = "arrow"
+        # 窗口内容左边缘的屏幕横坐标和窗口宽度，窗口移动或改变大小后重新获取
+        self.window_frame = None
+        
+        # 性能统计窗口和历史记录窗口
+        self.perf_overlay = None
+        self.archive_window = None
+        
+        # 任务数据在后台线程中加载，加载完成前使用空的任务存储
+        self.store = TaskStore()
+        self.search = SearchIndex(self.store)
+        self.history = UndoHistory(self.store)
+        # 按列排序的视图，默认按手动顺序
+        self.sorted_tasks = SortedTasks(self.store)
+        self.loading = True
+        self.loading_tasks = []
+        self.loading_preview = False
+        
+        # 后台线程不直接调用 Tk，把回调放入队列，由主线程定期取出执行
+        self.events = queue.Queue()
+        self.root.after(self.EVENT_INTERVAL, self.poll_events)
+        
+        # 截止日期提醒，加载完成后开始调度
+        self.reminders = ReminderScheduler(self.root.after, self.root.after_cancel, self.show_reminder)
     
     def setup_data_file(self):
         """设置数据文件路径并确保目录存在"""
@@ -274,96 +557,76 @@ class TodoApp:
                 messagebox.showerror("错误", f"无法创建数据目录: {e}")
                 self.root.quit()
         
-        # 设置数据文件路径
-        self.data_file = os.path.join(self.data_dir, "todos.json")
+        # 创建存储后端
+        self.backend = open_backend(self.data_dir, self.SAVE_DELAY, self.on_save_error)
+        
+        # 归档的任务在打开历史记录时才读取
+        self.archive = TaskArchive(os.path.join(self.data_dir, "archive"), self.ARCHIVE_COMPRESSION)
     
     def define_color_schemes(self):
-        """定义颜色方案"""
-        # 只保留亮色主题
-        self.theme = {
-            "primary_color": "#4a90e2",
-            "secondary_color": "#50e3c2",
-            "danger_color": "#e74c3c",
-            "warning_color": "#f39c12",
-            "success_color": "#2ecc71",
-            "background_color": "#f5f5f5",
-            "card_color": "#ffffff",
-            "text_color": "#333333",
-            "text_light": "#666666",
-            "border_color": "#e0e0e0",
-            "scrollbar_bg": "#e0e0e0",
-            "scrollbar_trough": "#f0f0f0"
-        }
+        """读取主题偏好，主题在第一次使用时编译为样式集合"""
+        self.theme_file = os.path.join(self.data_dir, "theme.json")
+        self.theme_name = load_theme_name(self.theme_file)
+        
+        # 已经应用的主题，以及日历样式是否已经配置
+        self.applied_theme = None
+        self.calendar_styles_applied = False
         
         # 当前主题颜色
-        self.current_theme = self.theme.copy()
+        self.theme = get_theme(self.theme_name).colors
+        self.current_theme = self.theme
     
+    @timed("apply_theme")
     def apply_theme(self):
-        """应用当前主题的颜色方案"""
-        # 获取当前主题的颜色
-        colors = self.theme
+        """应用当前主题
         
-        # 应用窗口背景色
-        self.root.configure(bg=colors["background_color"])
-        
-        # 配置全局样式
-        # 标题栏样式
-        self.style.configure("Title.TFrame", background=colors["card_color"], relief="flat")
-        self.style.configure("Title.TLabel", background=colors["card_color"], foreground=colors["primary_color"], font=("Segoe UI", 20, "bold"))
-        
-        # 按钮样式
-        self.style.configure("Close.TButton", background=colors["card_color"], foreground=colors["text_light"], borderwidth=0, font=("Segoe UI", 15))
-        self.style.map("Close.TButton", background=[("active", colors["danger_color"]), ("hover", "#ff6b6b")], foreground=[("active", "white"), ("hover", "white")])
-        
-        self.style.configure("Add.TButton", background=colors["primary_color"], foreground="white", borderwidth=0, font=("Segoe UI", 15, "bold"), padding=10)
-        self.style.map("Add.TButton", background=[("active", "#357abd"), ("hover", "#5aa0e5")])
-        
-        self.style.configure("Edit.TButton", background=colors["secondary_color"], foreground="white", borderwidth=0, font=("Segoe UI", 15), padding=8)
-        self.style.map("Edit.TButton", background=[("active", "#3bc1a0"), ("hover", "#62e6c3")])
-        
-        self.style.configure("Delete.TButton", background=colors["danger_color"], foreground="white", borderwidth=0, font=("Segoe UI", 15), padding=8)
-        self.style.map("Delete.TButton", background=[("active", "#c0392b"), ("hover", "#ea6153")])
-        
-        self.style.configure("ToggleStatus.TButton", background=colors["warning_color"], foreground="white", borderwidth=0, font=("Segoe UI", 15), padding=8)
-        self.style.map("ToggleStatus.TButton", background=[("active", "#d35400"), ("hover", "#f5b041")])
-        
-        # 输入区域样式
-        self.style.configure("Input.TLabelframe", background=colors["background_color"], foreground=colors["primary_color"], font=("Segoe UI", 15, "bold"), relief="flat")
-        self.style.configure("Input.TLabelframe.Label", background=colors["background_color"], foreground=colors["primary_color"], font=("Segoe UI", 15, "bold"))
-        
-        # 列表区域样式
-        self.style.configure("List.TLabelframe", background=colors["background_color"], foreground=colors["primary_color"], font=("Segoe UI", 15, "bold"), relief="flat")
-        self.style.configure("List.TLabelframe.Label", background=colors["background_color"], foreground=colors["primary_color"], font=("Segoe UI", 15, "bold"))
+        与上一次应用的主题比较，只重新配置取值不同的样式和标签，不重新渲染任务行。
+        """
+        theme = get_theme(self.theme_name)
+        old = self.applied_theme
         
-        # 标签样式
-        self.style.configure("Label.TLabel", background=colors["card_color"], foreground=colors["text_color"], font=("Segoe UI", 15))
+        self.apply_styles(style_changes(old.styles if old else None, theme.styles))
+        if self.calendar_styles_applied:
+            self.apply_styles(style_changes(old.calendar_styles, theme.calendar_styles))
         
-        # 输入框样式
-        self.style.configure("Entry.TEntry", background=colors["card_color"], foreground=colors["text_color"], font=("Segoe UI", 15), padding=8, relief="solid", bordercolor=colors["border_color"])
-        self.style.map("Entry.TEntry", bordercolor=[("focus", colors["primary_color"]), ("hover", colors["border_color"])], relief=[("focus", "solid"), ("hover", "solid")])
-        
-        # 树状图样式
-        self.style.configure("TaskTree.Treeview", background=colors["card_color"], foreground=colors["text_color"], font=("Segoe UI", 14), rowheight=35)
-        self.style.configure("TaskTree.Treeview.Heading", background=colors["primary_color"], foreground="white", font=("Segoe UI", 15, "bold"), padding=10)
-        self.style.map("TaskTree.Treeview.Heading", background=[("active", "#357abd")])
-        self.style.configure("TaskTree.Treeview.Cell", background=colors["card_color"], foreground=colors["text_color"])
-        
-        # 滚动条样式
-        self.style.configure("TScrollbar", background=colors["scrollbar_bg"], troughcolor=colors["scrollbar_trough"], bordercolor=colors["border_color"])
-        self.style.map("TScrollbar", background=[("active", colors["primary_color"]), ("hover", colors["primary_color"])])
-        
-        # Pin按钮样式
-        self.style.configure("Pin.TFrame", background=colors["background_color"])
-        self.style.configure("Toggle.TCheckbutton", background=colors["card_color"], foreground=colors["text_color"], font=("Segoe UI", 15))
-        
-        # 操作区域样式
-        self.style.configure("Action.TFrame", background=colors["background_color"])
+        # 应用窗口背景色
+        colors = theme.colors
+        if not old or old.colors["background_color"] != colors["background_color"]:
+            self.root.configure(bg=colors["background_color"])
+        
+        # 任务列表的标签样式
+        if hasattr(self, "task_tree"):
+            for tag, options in tag_changes(old.tags if old else None, theme.tags):
+                self.task_tree.tag_configure(tag, **options)
+            self.theme_btn.configure(text="☀️" if theme.name == "dark" else "🌙")
+        
+        self.applied_theme = theme
+        self.theme = colors
+        self.current_theme = colors
+    
+    def apply_styles(self, changes):
+        """执行 style_changes 返回的样式修改"""
+        for style, configure, mapping in changes:
+            if configure:
+                self.style.configure(style, **configure)
+            if mapping:
+                self.style.map(style, **mapping)
+    
+    def apply_calendar_styles(self):
+        """第一次打开日历时配置日期按钮的样式"""
+        if not self.calendar_styles_applied:
+            self.apply_styles(style_changes(None, self.applied_theme.calendar_styles))
+            self.calendar_styles_applied = True
+    
+    def toggle_theme(self):
+        """在亮色和暗色主题之间切换，并保存主题偏好"""
+        self.theme_name = "light" if self.theme_name == "dark" else "dark"
+        self.apply_theme()
         
-        # 更新任务列表显示（重新应用标签样式）
-        if hasattr(self, 'task_tree'):
-            self.task_tree.tag_configure("completed", foreground=colors["text_light"])
-            self.task_tree.tag_configure("pending", foreground=colors["text_color"])
-            self.update_task_list()
+        try:
+            save_theme_name(self.theme_file, self.theme_name)
+        except OSError as e:
+            messagebox.showerror("保存失败", f"无法保存主题设置：{str(e)}")
     
     def setup_window_style(self):
         """设置窗口样式，包括圆角和阴影效果"""
@@ -387,6 +650,11 @@ class TodoApp:
                                  command=self.toggle_pin, style="Toggle.TCheckbutton")
         pin_btn.pack(side=tk.RIGHT, padx=5)
         
+        # 主题切换按钮
+        self.theme_btn = ttk.Button(pin_frame, text="☀️" if self.theme_name == "dark" else "🌙", width=3,
+                                    command=self.toggle_theme, style="Theme.TButton")
+        self.theme_btn.pack(side=tk.RIGHT, padx=5)
+        
         # 任务输入区域
         input_frame = ttk.LabelFrame(self.root, text="添加新任务", style="Input.TLabelframe")
         input_frame.pack(fill=tk.X, padx=15, pady=5)
@@ -418,9 +686,43 @@ class TodoApp:
         list_frame = ttk.LabelFrame(self.root, text="任务列表", style="List.TLabelframe")
         list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
         
+        # 智能视图按钮，按截止日期范围查询截止日期索引
+        view_frame = ttk.Frame(list_frame)
+        view_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 0))
+        
+        self.view_var = tk.StringVar(value="all")
+        self.view_buttons = []
+        for value, text in self.VIEWS:
+            btn = ttk.Radiobutton(view_frame, text=text, value=value, variable=self.view_var,
+                                  command=self.update_task_list, style="View.Toolbutton")
+            btn.pack(side=tk.LEFT, padx=(0, 5))
+            self.view_buttons.append(btn)
+        
+        # 筛选输入框，每次输入后立即筛选任务列表
+        filter_frame = ttk.Frame(list_frame)
+        filter_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 0))
+        
+        ttk.Label(filter_frame, text="🔍", style="Label.TLabel").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = ttk.Entry(filter_frame, textvariable=self.filter_var, style="Entry.TEntry")
+        self.filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
+        self.filter_entry.bind("<Escape>", lambda event: self.filter_var.set(""))
+        self.filter_count = ttk.Label(filter_frame, text="", style="Label.TLabel")
+        self.filter_count.pack(side=tk.RIGHT)
+        self.filter_var.trace_add("write", self.on_filter_change)
+        
+        # 加载进度，只在加载任务数据时显示
+        self.load_frame = ttk.Frame(list_frame)
+        self.load_label = ttk.Label(self.load_frame, text="正在加载…", style="Label.TLabel")
+        self.load_label.pack(side=tk.LEFT)
+        self.load_progress = ttk.Progressbar(self.load_frame, mode="determinate", maximum=100)
+        self.load_progress.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(10, 0))
+        
         # 任务列表
         columns = ("id", "task", "due_date", "status", "up", "down", "edit", "delete")
-        self.task_tree = ttk.Treeview(list_frame, columns=columns, show="headings", style="TaskTree.Treeview")
+        # 按住 Ctrl 或 Shift 点击可以选中多个任务
+        self.task_tree = ttk.Treeview(list_frame, columns=columns, show="headings", selectmode="extended",
+                                      style="TaskTree.Treeview")
         
         # 设置列宽
         self.task_tree.column("id", width=40, anchor=tk.CENTER)
@@ -434,33 +736,55 @@ class TodoApp:
         
         # 设置列标题
         self.task_tree.heading("id", text="#", anchor=tk.CENTER)
-        self.task_tree.heading("task", text="任务", anchor=tk.W)
-        self.task_tree.heading("due_date", text="截止日期", anchor=tk.CENTER)
-        self.task_tree.heading("status", text="状态", anchor=tk.CENTER)
+        # 点击任务、截止日期和状态列的标题按该列排序
+        self.column_titles = {"task": "任务", "due_date": "截止日期", "status": "状态"}
+        self.task_tree.heading("task", text=self.column_titles["task"], anchor=tk.W)
+        self.task_tree.heading("due_date", text=self.column_titles["due_date"], anchor=tk.CENTER)
+        self.task_tree.heading("status", text=self.column_titles["status"], anchor=tk.CENTER)
         self.task_tree.heading("up", text="↑", anchor=tk.CENTER)
         self.task_tree.heading("down", text="↓", anchor=tk.CENTER)
         self.task_tree.heading("edit", text="编辑", anchor=tk.CENTER)
         self.task_tree.heading("delete", text="删除", anchor=tk.CENTER)
         
+        # 定义标签样式
+        for tag, options in self.applied_theme.tags.items():
+            self.task_tree.tag_configure(tag, **options)
+        
+        # 增量渲染器，只刷新发生变化的行；任务较多时在 update_task_list 中切换为虚拟列表
+        self.renderer = TaskTreeRenderer(self.task_tree)
+        self.virtual_list = False
+        
         # 添加事件处理
         # 使用ButtonPress-1而不是Button-1，以确保事件处理的顺序
+        # 列标题边缘的拖动由窗口的 on_press 等处理函数调整列宽
         self.task_tree.bind("<ButtonPress-1>", self.on_tree_click)
-        self.task_tree.bind("<B1-Motion>", self.on_tree_drag)
-        self.task_tree.bind("<ButtonRelease-1>", self.on_tree_release)
         
-        # 列宽调整相关变量
-        self.resize_column_mode = False
-        self.resize_column = None
-        self.resize_start_x = 0
-        self.resize_start_width = 0
+        # 右键菜单，对所有选中的任务执行批量操作（macOS 上右键为 Button-2）
+        self.context_menu = tk.Menu(self.task_tree, tearoff=0)
+        self.context_menu.add_command(label="切换状态", command=self.toggle_task_status)
+        self.context_menu.add_command(label="设置截止日期…", command=self.set_due_date_for_selected)
+        self.context_menu.add_command(label="移到顶部", command=lambda: self.move_selected_to_edge(True))
+        self.context_menu.add_command(label="移到底部", command=lambda: self.move_selected_to_edge(False))
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label="删除", command=self.delete_task)
+        self.task_tree.bind("<Button-3>", self.show_context_menu)
+        if sys.platform == "darwin":
+            self.task_tree.bind("<Button-2>", self.show_context_menu)
+        
+        # 虚拟列表需要自行处理选中、尺寸变化和滚轮事件
+        self.task_tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.task_tree.bind("<Configure>", self.on_tree_configure)
+        self.task_tree.bind("<MouseWheel>", self.on_tree_wheel)
+        self.task_tree.bind("<Button-4>", self.on_tree_wheel)
+        self.task_tree.bind("<Button-5>", self.on_tree_wheel)
         
         # 滚动条
-        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.task_tree.yview)
-        self.task_tree.configure(yscroll=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.task_tree.yview)
+        self.task_tree.configure(yscroll=self.scrollbar.set)
         
         # 布局
         self.task_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=10)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, padx=(0, 10), pady=10)
         
         # 任务操作按钮
         action_frame = ttk.Frame(self.root, style="Action.TFrame")
@@ -475,132 +799,146 @@ class TodoApp:
         toggle_btn = ttk.Button(action_frame, text="切换状态", command=self.toggle_task_status, style="ToggleStatus.TButton")
         toggle_btn.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
         
-        # 添加删除已完成任务按钮
-        delete_completed_btn = ttk.Button(action_frame, text="删除已完成任务", command=self.delete_completed_tasks, style="Delete.TButton")
+        # 添加删除已完成任务按钮，归档模式下改为归档
+        delete_completed_btn = ttk.Button(action_frame, text="归档已完成任务" if self.ARCHIVE_MODE else "删除已完成任务",
+                                          command=self.delete_completed_tasks, style="Delete.TButton")
         delete_completed_btn.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        
+        if self.ARCHIVE_MODE:
+            history_btn = ttk.Button(action_frame, text="历史记录", command=self.show_archive, style="Edit.TButton")
+            history_btn.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        
+        # 加载任务数据时需要禁用的按钮和筛选输入框
+        self.edit_buttons = [add_btn, edit_btn, delete_btn, toggle_btn, delete_completed_btn, self.filter_entry] + self.view_buttons
     
-    def start_drag(self, event):
-        # 只有在非调整大小模式下才记录拖动起始位置
-        if hasattr(self, "task_tree") and event.widget == self.task_tree:
-            self.dragging_window = False
-            return
+    def window_edge(self, x_root):
+        """返回屏幕横坐标所在的窗口边缘 "w" 或 "e"，不在边缘时返回None"""
+        if self.window_frame is None:
+            self.window_frame = (self.root.winfo_rootx(), self.root.winfo_width())
+        left, width = self.window_frame
         
-        if not self.resize_mode:
-            self.dragging_window = True
-            self.drag_x = event.x_root
-            self.drag_y = event.y_root
+        # 只检测左右边缘，不检测上下边缘
+        x = x_root - left
+        if x < self.EDGE_THRESHOLD:
+            return "w"
+        if x > width - self.EDGE_THRESHOLD:
+            return "e"
+        return None
     
-    def drag_window(self, event):
-        # 只有在非调整大小模式下才允许拖动窗口
-        if not self.resize_mode and self.dragging_window:
-            x = self.root.winfo_x() + (event.x_root - self.drag_x)
-            y = self.root.winfo_y() + (event.y_root - self.drag_y)
-            self.root.geometry(f"+{x}+{y}")
+    def column_edge(self, x, y):
+        """返回任务列表标题上 x 处的列边缘左侧的列，不在列边缘时返回None"""
+        if self.task_tree.identify_region(x, y) != "heading":
+            return None
+        right = 0
+        for column in self.task_tree["columns"]:
+            right += self.task_tree.column(column, "width")
+            if abs(x - right) <= self.EDGE_THRESHOLD:
+                return column
+            if right > x:
+                return None
+        return None
     
-    def on_motion(self, event):
-        """处理鼠标移动事件，改变光标样式"""
-        if not self.resize_mode:
-            cursor = self.get_cursor(event)
+    def set_cursor(self, cursor):
+        """设置光标，与当前光标相同时不调用 Tk"""
+        if cursor != self.cursor:
+            self.cursor = cursor
             self.root.config(cursor=cursor)
     
-    def get_cursor(self, event):
-        """根据鼠标位置返回相应的光标样式"""
-        # 窗口边缘检测的阈值
-        edge_threshold = 10
-        
-        # 获取窗口尺寸和位置
-        x = event.x
-        width = self.root.winfo_width()
-        
-        # 只检测左右边缘，不检测上下边缘
-        on_left = x < edge_threshold
-        on_right = x > width - edge_threshold
-        
-        # 根据边缘位置返回相应的光标
-        if on_left or on_right:
-            return "size_we"
-        else:
-            return "arrow"
+    def on_window_configure(self, event):
+        """窗口移动或改变大小后，下次检测边缘时重新获取窗口位置"""
+        if event.widget is self.root:
+            self.window_frame = None
+    
+    def on_motion(self, event):
+        """鼠标移动时在窗口左右边缘显示调整大小的光标"""
+        if self.gesture is None:
+            self.set_cursor("size_we" if self.window_edge(event.x_root) else "arrow")
     
-    def start_resize(self, event):
-        """处理调整大小的开始事件"""
-        if hasattr(self, "task_tree") and event.widget == self.task_tree:
-            self.resize_mode = False
-            self.resize_edge = None
+    def on_press(self, event):
+        """按下左键：确定本次手势，记录鼠标和窗口（或列宽）的起始值
+        
+        在任务列表中只有按在列标题的边缘上才调整列宽，其他点击由 on_tree_click 处理；
+        在窗口左右边缘按下时调整窗口大小，在其他位置按下时拖动窗口。
+        """
+        self.cancel_gesture_update()
+        self.gesture = None
+        self.gesture_pointer = None
+        
+        if event.widget is self.task_tree:
+            column = self.column_edge(event.x, event.y)
+            if column:
+                self.gesture = {"kind": "column", "column": column, "pointer_x": event.x_root,
+                                "pointer_y": event.y_root, "width": self.task_tree.column(column, "width"),
+                                "applied": None}
+                self.set_cursor("sb_h_double_arrow")
             return
         
-        # 窗口边缘检测的阈值
-        edge_threshold = 10
+        # 窗口的位置和大小在手势开始时获取一次，拖动过程中不再查询
+        self.gesture = {"kind": "drag", "pointer_x": event.x_root, "pointer_y": event.y_root,
+                        "x": self.root.winfo_x(), "y": self.root.winfo_y(), "applied": None}
+        edge = self.window_edge(event.x_root)
+        if edge:
+            self.gesture.update(kind="resize", edge=edge, width=self.window_frame[1],
+                                height=self.root.winfo_height(), screen_width=self.root.winfo_screenwidth())
+            self.set_cursor("size_we")
+    
+    def on_press_motion(self, event):
+        """按住左键移动：只记录鼠标位置，每帧最多更新一次窗口或列宽"""
+        if self.gesture is None:
+            return
+        self.gesture_pointer = (event.x_root, event.y_root)
+        if self.gesture_timer is None:
+            self.gesture_timer = self.root.after(self.FRAME_INTERVAL, self.apply_gesture)
+    
+    def on_release(self, event):
+        """松开左键：按最后的鼠标位置完成更新，结束手势"""
+        if self.gesture is not None:
+            self.cancel_gesture_update()
+            if self.gesture_pointer is not None:
+                self.gesture_pointer = (event.x_root, event.y_root)
+                self.apply_gesture()
+        self.gesture = None
+        self.gesture_pointer = None
+        self.set_cursor("arrow")
+    
+    def cancel_gesture_update(self):
+        """取消等待执行的更新"""
+        if self.gesture_timer is not None:
+            self.root.after_cancel(self.gesture_timer)
+            self.gesture_timer = None
+    
+    def apply_gesture(self):
+        """按最后一次的鼠标位置更新窗口位置、窗口大小或列宽，结果不变时不调用 Tk"""
+        self.gesture_timer = None
+        gesture = self.gesture
+        if gesture is None or self.gesture_pointer is None:
+            return
         
-        # 获取窗口尺寸和位置
-        x = event.x
-        width = self.root.winfo_width()
+        delta_x = self.gesture_pointer[0] - gesture["pointer_x"]
+        delta_y = self.gesture_pointer[1] - gesture["pointer_y"]
+        kind = gesture["kind"]
+        if kind == "column":
+            width = max(30, gesture["width"] + delta_x)
+            if width != gesture["applied"]:
+                gesture["applied"] = width
+                self.task_tree.column(gesture["column"], width=width)
+            return
         
-        # 只检测左右边缘，不检测上下边缘
-        on_left = x < edge_threshold
-        on_right = x > width - edge_threshold
-        
-        # 确定调整大小的边缘
-        if on_left or on_right:
-            self.resize_mode = True
-            self.resize_start_x = event.x_root
-            self.resize_start_y = event.y_root
-            self.resize_start_width = width
-            self.resize_start_height = self.root.winfo_height()
-            
-            # 记录调整大小的边缘
-            if on_left:
-                self.resize_edge = "w"
-            elif on_right:
-                self.resize_edge = "e"
+        if kind == "drag":
+            geometry = f"+{gesture['x'] + delta_x}+{gesture['y'] + delta_y}"
+        elif gesture["edge"] == "w":
+            # 拖动左边缘时右边缘保持不动，窗口不移出屏幕左侧
+            width = max(300, gesture["width"] - delta_x)
+            x = max(0, gesture["x"] + gesture["width"] - width)
+            geometry = f"{width}x{gesture['height']}+{x}+{gesture['y']}"
         else:
-            # 如果不是点击窗口边缘，则不触发调整大小
-            self.resize_mode = False
-            self.resize_edge = None
-    
-    def resize_window(self, event):
-        """处理调整大小的拖拽事件"""
-        if self.resize_mode:
-            # 计算鼠标移动的距离
-            delta_x = event.x_root - self.resize_start_x
-            
-            # 获取当前窗口位置和尺寸
-            win_x = self.root.winfo_x()
-            screen_width = self.root.winfo_screenwidth()
-            
-            # 初始化新的窗口尺寸和位置
-            new_width = self.resize_start_width
-            new_height = self.resize_start_height
-            new_x = win_x
-            
-            # 只处理左右调整
-            if self.resize_edge == "w":
-                # 计算新宽度和新位置
-                new_width = max(300, self.resize_start_width - delta_x)
-                new_x = win_x + delta_x
-                
-                # 确保窗口不会移出屏幕左侧
-                new_x = max(0, new_x)
-            elif self.resize_edge == "e":
-                # 计算新宽度
-                new_width = max(300, self.resize_start_width + delta_x)
-                
-                # 确保窗口不会移出屏幕右侧
-                max_width = screen_width - win_x
-                new_width = min(max_width, new_width)
-            
-            # 确保窗口始终可见
-            new_width = max(300, new_width)
-            
-            # 设置新的窗口尺寸和位置，保持高度不变
-            self.root.geometry(f"{new_width}x{new_height}+{new_x}+{self.root.winfo_y()}")
-    
-    def stop_resize(self, event):
-        """处理调整大小的结束事件"""
-        self.resize_mode = False
-        self.resize_edge = None
-        self.root.config(cursor="arrow")
-        self.dragging_window = False
+            # 拖动右边缘时窗口不超出屏幕右侧，但始终不小于 300 像素
+            width = max(300, min(gesture["screen_width"] - gesture["x"], gesture["width"] + delta_x))
+            geometry = f"{width}x{gesture['height']}+{gesture['x']}+{gesture['y']}"
+        
+        if geometry != gesture["applied"]:
+            gesture["applied"] = geometry
+            self.root.geometry(geometry)
     
     def show_calendar(self):
         """显示日历选择器"""
@@ -608,7 +946,9 @@ class TodoApp:
         current_date = self.date_entry.get().strip()
         
         # 创建日历选择器
-        calendar = CalendarPicker(self.root, current_date, self.on_date_selected)
+        self.apply_calendar_styles()
+        calendar = CalendarPicker(self.root, current_date, self.on_date_selected, self.theme["background_color"],
+                                  self.store.due_count)
         
         # 确保日历选择器显示在正确的位置
         calendar.geometry(f"+{self.root.winfo_rootx() + 50}+{self.root.winfo_rooty() + 200}")
@@ -625,37 +965,247 @@ class TodoApp:
         """最小化窗口"""
         self.root.iconify()
     
+    def start_loading(self):
+        """在后台线程中从存储后端加载任务数据
+        
+        数据文件按任务逐个解析，每解析出一批就交给主线程显示，第一批只有一屏左右，
+        因此大文件也能立即看到开头的任务。存储后端支持预览时（二进制快照），
+        加载期间直接显示预览中的全部任务，只解码可见的行。加载完成前禁止修改任务。
+        """
+        self.set_editing_enabled(False)
+        try:
+            preview = self.backend.preview()
+        except Exception:
+            # 文件损坏时由 load_tasks 报告错误
+            preview = None
+        self.loading_preview = preview is not None
+        if self.loading_preview:
+            self.loading_tasks = preview
+            self.load_label.configure(text=f"正在加载… 共 {len(preview)} 个任务")
+        self.update_task_list()
+        if self.loading_preview:
+            self.profiler.mark("显示预览")
+        threading.Thread(target=self.load_tasks, daemon=True).start()
+    
+    @timed("load_tasks")
     def load_tasks(self):
-        """加载任务数据"""
-        if os.path.exists(self.data_file):
+        """后台线程：从存储后端加载任务数据并建立任务存储"""
+        try:
+            tasks = self.backend.load(lambda batch, progress: self.post(self.on_load_batch, batch, progress))
+            store = TaskStore(tasks)
+        except Exception as e:
+            self.post(self.show_load_error, e)
+            store = TaskStore()
+        
+        # 搜索索引也在后台线程中建立
+        self.post(self.on_load_done, store, SearchIndex(store))
+    
+    def post(self, callback, *args):
+        """从后台线程把回调交给主线程执行，可以在主循环开始之前调用"""
+        self.events.put((callback, args))
+    
+    def poll_events(self):
+        """主线程：定期执行后台线程交来的回调，窗口关闭后不再执行"""
+        # 先安排下一次检查，回调出错时也不会停止
+        self.root.after(self.EVENT_INTERVAL, self.poll_events)
+        self.process_events()
+    
+    def process_events(self):
+        """执行队列中所有等待的回调"""
+        while True:
             try:
-                with open(self.data_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except PermissionError:
-                messagebox.showerror("加载失败", "无法加载任务数据：没有读取权限。请检查文件权限设置。")
-                return []
-            except json.JSONDecodeError:
-                messagebox.showerror("加载失败", "无法加载任务数据：文件格式错误。数据可能已损坏。")
-                return []
-            except IOError as e:
-                messagebox.showerror("加载失败", f"无法加载任务数据：{str(e)}")
-                return []
-            except Exception as e:
-                messagebox.showerror("加载失败", f"加载任务数据时发生未知错误：{str(e)}")
-                return []
-        return []
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+    
+    def on_load_batch(self, batch, progress):
+        """显示新加载的一批任务"""
+        self.load_progress["value"] = progress * 100
+        if self.loading_preview:
+            # 预览中已经有全部任务，只更新进度
+            return
+        
+        first = not self.loading_tasks
+        self.loading_tasks.extend(batch)
+        self.load_label.configure(text=f"正在加载… 已读取 {len(self.loading_tasks)} 个任务")
+        self.update_task_list()
+        if first:
+            self.profiler.mark("显示第一批任务")
+    
+    def on_load_done(self, store, search):
+        """加载完成，启用编辑"""
+        self.store = store
+        self.search = search
+        self.history = UndoHistory(store)
+        self.sorted_tasks = SortedTasks(store, self.sorted_tasks.column, self.sorted_tasks.descending)
+        self.loading = False
+        self.loading_tasks = []
+        self.loading_preview = False
+        
+        # 存储后端记录之后的每次修改
+        self.backend.attach(self.store)
+        self.reminders.attach(self.store)
+        
+        self.set_editing_enabled(True)
+        self.update_task_list()
+        self.profiler.mark("加载完成")
+        
+        # 开始检查其他程序对数据文件的修改
+        self.root.after(self.WATCH_INTERVAL, self.watch_data_file)
+    
+    def show_load_error(self, error):
+        """显示加载失败的提示"""
+        if isinstance(error, PermissionError):
+            messagebox.showerror("加载失败", "无法加载任务数据：没有读取权限。请检查文件权限设置。")
+        elif isinstance(error, json.JSONDecodeError):
+            messagebox.showerror("加载失败", "无法加载任务数据：文件格式错误。数据可能已损坏。")
+        elif isinstance(error, IOError):
+            messagebox.showerror("加载失败", f"无法加载任务数据：{str(error)}")
+        else:
+            messagebox.showerror("加载失败", f"加载任务数据时发生未知错误：{str(error)}")
+    
+    def set_editing_enabled(self, enabled):
+        """启用或禁用修改任务的按钮和筛选框，禁用时在列表上方显示加载进度"""
+        state = "!disabled" if enabled else "disabled"
+        for button in self.edit_buttons:
+            button.state([state])
+        
+        if enabled:
+            self.load_frame.pack_forget()
+        else:
+            self.load_progress["value"] = 0
+            self.load_label.configure(text="正在加载…")
+            self.load_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 0), before=self.task_tree)
+    
+    def undo(self, event=None):
+        """撤销上一步修改，与普通修改一样增量保存和刷新列表"""
+        if not self.loading and self.history.undo():
+            self.save_tasks()
+            self.update_task_list()
+        return "break"
+    
+    def redo(self, event=None):
+        """重做上一步撤销的修改"""
+        if not self.loading and self.history.redo():
+            self.save_tasks()
+            self.update_task_list()
+        return "break"
+    
+    def toggle_perf_overlay(self, event=None):
+        """打开或关闭性能统计窗口，窗口打开期间记录性能数据"""
+        if self.perf_overlay is not None and self.perf_overlay.winfo_exists():
+            self.perf_overlay.destroy()
+            return "break"
+        
+        self.perf_overlay = PerfOverlay(self.root, MONITOR, os.path.join(self.data_dir, "perf.jsonl"), self.theme)
+        self.perf_overlay.geometry(f"+{self.root.winfo_rootx() + 30}+{self.root.winfo_rooty() + 30}")
+        return "break"
     
+    @timed("save_tasks")
     def save_tasks(self):
-        """保存任务数据"""
+        """保存任务数据
+        
+        由存储后端只保存上次保存之后的修改：JSON 日志模式追加修改记录，
+        JSON 快照模式交给后台线程合并写入，SQLite 在一个事务中批量写入变化的行。
+        """
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(self.tasks, f, ensure_ascii=False, indent=2)
-        except PermissionError:
+            self.backend.commit()
+        except ExternalChangeError:
+            # 其他程序写入了还没有合并的修改，先合并再重新保存
+            self.root.after(0, self.resave_after_merge)
+        except Exception as e:
+            self.show_save_error(e)
+    
+    def on_save_error(self, error):
+        """后台线程保存失败时，回到主线程显示提示"""
+        if isinstance(error, ExternalChangeError):
+            # 数据文件已被其他程序修改，先合并再重新保存
+            self.post(self.resave_after_merge)
+            return
+        self.post(self.show_save_error, error)
+    
+    def watch_data_file(self):
+        """定期检查其他程序（另一个窗口或命令行模式）对数据文件的修改"""
+        self.merge_external_changes()
+        self.root.after(self.WATCH_INTERVAL, self.watch_data_file)
+    
+    def merge_external_changes(self):
+        """把其他程序的修改合并到任务列表，只应用有变化的任务，返回是否有修改"""
+        try:
+            changes = self.backend.poll()
+        except Exception:
+            # 对方可能正在写入，下次再检查
+            return False
+        if not changes:
+            return False
+        
+        self.backend.merge(changes)
+        # 撤销历史中的逆向记录可能与合并进来的修改冲突
+        self.history.clear()
+        # 快照方式保存时，等待写入的快照不包含合并进来的修改
+        self.save_tasks()
+        self.update_task_list()
+        return True
+    
+    def resave_after_merge(self):
+        """保存时发现数据文件已被修改：合并后重新保存本窗口的修改"""
+        if not self.merge_external_changes():
+            self.save_tasks()
+    
+    def show_save_error(self, error):
+        """显示保存失败的提示"""
+        if isinstance(error, ExternalChangeError):
+            messagebox.showerror("保存失败", "数据文件已被其他程序修改，最后的修改没有保存。")
+        elif isinstance(error, TimeoutError):
+            messagebox.showerror("保存失败", "保存任务数据超时，最后的修改可能没有保存。")
+        elif isinstance(error, PermissionError):
             messagebox.showerror("保存失败", "无法保存任务数据：没有写入权限。请检查文件权限设置。")
-        except IOError as e:
-            messagebox.showerror("保存失败", f"无法保存任务数据：{str(e)}")
+        elif isinstance(error, IOError):
+            messagebox.showerror("保存失败", f"无法保存任务数据：{str(error)}")
+        else:
+            messagebox.showerror("保存失败", f"保存任务数据时发生未知错误：{str(error)}")
+    
+    def on_close(self):
+        """关闭窗口前写入尚未保存的数据，保存失败时先提示再关闭"""
+        self.reminders.close()
+        if not self.loading:
+            # 先合并其他程序的修改，最后一次保存不会因为数据文件已变化而被拒绝
+            self.merge_external_changes()
+        try:
+            self.backend.close(self.CLOSE_TIMEOUT)
         except Exception as e:
-            messagebox.showerror("保存失败", f"保存任务数据时发生未知错误：{str(e)}")
+            self.show_save_error(e)
+        self.root.destroy()
+    
+    def show_reminder(self, tasks):
+        """在屏幕右上角显示到期提醒，一段时间后自动关闭"""
+        colors = self.theme
+        toast = tk.Toplevel(self.root)
+        toast.overrideredirect(True)
+        toast.wm_attributes("-topmost", True)
+        toast.configure(bg=colors["primary_color"])
+        
+        body = tk.Frame(toast, bg=colors["card_color"], padx=15, pady=10)
+        body.pack(fill=tk.BOTH, expand=True, padx=2, pady=2)
+        
+        tk.Label(body, text=f"⏰ {len(tasks)} 个任务今天到期", bg=colors["card_color"], fg=colors["primary_color"],
+                 font=("Segoe UI", 13, "bold")).pack(anchor=tk.W)
+        for task in tasks[:5]:
+            tk.Label(body, text=f"• {task['task']}", bg=colors["card_color"], fg=colors["text_color"],
+                     font=("Segoe UI", 12), anchor=tk.W, justify=tk.LEFT, wraplength=300).pack(anchor=tk.W)
+        if len(tasks) > 5:
+            tk.Label(body, text=f"… 以及另外 {len(tasks) - 5} 个任务", bg=colors["card_color"], fg=colors["text_light"],
+                     font=("Segoe UI", 11)).pack(anchor=tk.W)
+        
+        # 放在屏幕右上角，点击关闭
+        toast.update_idletasks()
+        x = toast.winfo_screenwidth() - toast.winfo_reqwidth() - 20
+        toast.geometry(f"+{x}+40")
+        for widget in [toast, body] + body.winfo_children():
+            widget.bind("<Button-1>", lambda event: toast.destroy())
+        toast.after(15000, toast.destroy)
+        self.root.bell()
     
     def add_task(self):
         """添加新任务"""
@@ -677,19 +1227,8 @@ class TodoApp:
                 self.date_entry.focus()
                 return
         
-        # 生成任务ID
-        task_id = max([t["id"] for t in self.tasks], default=0) + 1
-        
-        # 创建新任务
-        new_task = {
-            "id": task_id,
-            "task": task,
-            "due_date": due_date,
-            "completed": False
-        }
-        
         # 添加到任务列表
-        self.tasks.append(new_task)
+        self.store.add(task, due_date)
         self.save_tasks()
         self.update_task_list()
         
@@ -700,109 +1239,124 @@ class TodoApp:
         # 显示成功提示
         messagebox.showinfo("添加成功", f"任务 '{task}' 已成功添加！")
     
+    @timed("update_task_list")
     def update_task_list(self):
-        """更新任务列表显示"""
-        # 清空现有列表
-        for item in self.task_tree.get_children():
-            self.task_tree.delete(item)
-        
-        # 获取当前主题颜色
-        colors = self.theme
-        
-        # 定义标签样式
-        self.task_tree.tag_configure("completed", foreground=colors["text_light"])
-        self.task_tree.tag_configure("pending", foreground=colors["text_color"])
-        
-        # 添加任务到列表
-        for task in self.tasks:
-            status = "✓" if task["completed"] else "✗"
-            
-            # 根据完成状态设置标签
-            tags = ("completed",) if task["completed"] else ("pending",)
-            
-            # 为完成的任务添加删除线效果（通过修改文本显示）
-            task_text = task["task"]
-            if task["completed"]:
-                # 在tkinter Treeview中，我们使用特殊字符模拟删除线效果
-                # 实际的删除线需要更复杂的实现，这里使用灰色文字表示已完成
-                pass
-            
-            self.task_tree.insert("", tk.END, values=(
-                task["id"],
-                task_text,
-                task["due_date"] if task["due_date"] else "无",
-                status,
-                "↑",
-                "↓",
-                "✏️",
-                "🗑️"
-            ), tags=tags)
+        """更新任务列表显示
+        
+        只对新增、修改、移动和删除的行调用 Tk，本次调用次数记录在 self.renderer.last_ops 中。
+        已完成的任务使用灰色文字表示；加载过程中显示已经读取的任务。
+        选择智能视图或在筛选框中输入内容时，只显示符合条件的任务；点击列标题后按该列排序。
+        """
+        query = self.filter_var.get().strip()
+        view = self.view_var.get()
+        if self.loading:
+            tasks = self.loading_tasks
+        elif view != "all":
+            tasks = self.view_tasks(view)
+            # 查询中没有可搜索的词（如只有标点）时与全部视图一样不筛选
+            ids = self.search.match_ids(query) if query else None
+            if ids is not None:
+                tasks = [task for task in tasks if task.id in ids]
+        elif query:
+            tasks = self.search.search(query)
+        elif self.sorted_tasks.column:
+            tasks = self.sorted_tasks
+        else:
+            tasks = self.store
+        
+        filtered = not self.loading and (query or view != "all")
+        if filtered and self.sorted_tasks.column:
+            # 筛选结果只按缓存的排序值排列，不重新计算
+            tasks = self.sorted_tasks.sort(tasks)
+        self.filter_count.configure(text=f"{len(tasks)} / {len(self.store)}" if filtered else "")
+        
+        # 根据任务数量选择普通列表或虚拟列表
+        count = len(tasks)
+        if not self.virtual_list and count >= self.VIRTUAL_LIST_THRESHOLD:
+            self.set_virtual_list(True)
+        elif self.virtual_list and count < self.VIRTUAL_LIST_THRESHOLD // 2:
+            self.set_virtual_list(False)
+        
+        self.renderer.refresh(tasks)
+    
+    def view_tasks(self, view):
+        """返回智能视图中的任务，按截止日期排序"""
+        today = date.today()
+        if view == "overdue":
+            # 已完成的任务不算过期
+            return [task for task in self.store.due_between(None, today - timedelta(days=1)) if not task["completed"]]
+        if view == "today":
+            return self.store.due_between(today, today)
+        if view == "week":
+            return self.store.due_between(today, today + timedelta(days=6))
+        if view == "undated":
+            return self.store.undated()
+        return list(self.store)
+    
+    def on_filter_change(self, *args):
+        """筛选词变化时刷新任务列表"""
+        self.update_task_list()
+    
+    def set_virtual_list(self, enabled):
+        """切换虚拟列表模式
+        
+        虚拟列表只为可见区域创建 Tk 行，滚动条改为由渲染器驱动。
+        """
+        # 清空现有行，由新的渲染器重新创建
+        self.task_tree.delete(*self.task_tree.get_children())
+        self.virtual_list = enabled
+        
+        if enabled:
+            row_height = int(self.style.lookup("TaskTree.Treeview", "rowheight") or 35)
+            self.renderer = VirtualTaskTreeRenderer(self.task_tree, self.scrollbar.set, row_height=row_height)
+            if self.task_tree.winfo_ismapped():
+                self.renderer.resize(self.task_tree.winfo_height())
+            self.task_tree.configure(yscrollcommand="")
+            self.scrollbar.configure(command=self.renderer.yview)
+        else:
+            self.renderer = TaskTreeRenderer(self.task_tree)
+            self.task_tree.configure(yscrollcommand=self.scrollbar.set)
+            self.scrollbar.configure(command=self.task_tree.yview)
     
+    def on_tree_select(self, event):
+        """记录虚拟列表中选中的任务，滚动后恢复选中状态"""
+        if self.virtual_list:
+            self.renderer.sync_selection()
+    
+    def on_tree_configure(self, event):
+        """列表尺寸变化时重新计算虚拟列表的可见行数"""
+        if self.virtual_list:
+            self.renderer.resize(event.height)
+    
+    def on_tree_wheel(self, event):
+        """虚拟列表中由渲染器处理鼠标滚轮"""
+        if not self.virtual_list:
+            return None
+        
+        # Windows 使用 delta，Linux 使用 Button-4/Button-5
+        step = -3 if event.num == 4 or event.delta > 0 else 3
+        self.renderer.scroll_to(self.renderer.offset + step)
+        return "break"
+    
+    @timed("on_tree_click")
     def on_tree_click(self, event):
         """处理任务列表点击事件"""
         # 获取点击的区域和位置
         region = self.task_tree.identify_region(event.x, event.y)
         
         if region == "heading":
-            # 获取点击的列
-            column_id = self.task_tree.identify_column(event.x)
-            
-            # 获取树的可见区域
-            visible_region = self.task_tree.bbox("#0")
-            if visible_region:
-                # 计算点击位置是否在列边缘
-                # 获取所有列的实际位置
-                col_info = []
-                current_x = 0
-                for i, col in enumerate(self.task_tree["columns"]):
-                    width = self.task_tree.column(col, "width")
-                    col_info.append({
-                        "name": col,
-                        "id": f"#{i+1}",
-                        "x1": current_x,
-                        "x2": current_x + width
-                    })
-                    current_x += width
-                
-                # 查找点击位置所在的列
-                clicked_col = None
-                for col in col_info:
-                    if col["x1"] <= event.x <= col["x2"]:
-                        clicked_col = col
-                        break
-                
-                if clicked_col:
-                    # 检查是否点击在列的右侧边缘（10像素范围内）
-                    if abs(event.x - clicked_col["x2"]) <= 10:
-                        # 点击在当前列的右侧边缘
-                        self.resize_column_mode = True
-                        self.resize_column = clicked_col["name"]
-                        self.resize_start_x = event.x_root
-                        self.resize_start_width = clicked_col["x2"] - clicked_col["x1"]
-                        # 改变光标样式
-                        self.root.config(cursor="sb_h_double_arrow")
-                    elif clicked_col["id"] != "#1" and abs(event.x - clicked_col["x1"]) <= 10:
-                        # 点击在前一列的右侧边缘
-                        # 找到前一列
-                        prev_col = col_info[col_info.index(clicked_col) - 1]
-                        self.resize_column_mode = True
-                        self.resize_column = prev_col["name"]
-                        self.resize_start_x = event.x_root
-                        self.resize_start_width = prev_col["x2"] - prev_col["x1"]
-                        # 改变光标样式
-                        self.root.config(cursor="sb_h_double_arrow")
-                    else:
-                        # 正常点击列标题，不调整列宽
-                        self.resize_column_mode = False
-                        self.resize_column = None
+            # 按在列边缘上时由 on_press 调整列宽，否则按该列排序
+            column = self.task_tree.column(self.task_tree.identify_column(event.x), "id")
+            if column in SORT_COLUMNS and self.column_edge(event.x, event.y) is None:
+                self.sort_by(column)
         elif region == "cell":
             # 获取行和列
             row_id = self.task_tree.identify_row(event.y)
             column = self.task_tree.identify_column(event.x)
             
-            # 获取任务ID
-            if row_id:
-                task_id = int(self.task_tree.item(row_id, "values")[0])
+            # 获取任务ID，加载完成前不处理修改操作
+            if row_id and not self.loading:
+                task_id = self.renderer.task_id(row_id)
                 
                 # 处理点击事件
                 if column == "#4":  # status column
@@ -819,61 +1373,55 @@ class TodoApp:
                 elif column == "#8":  # delete column
                     self.delete_task_by_id(task_id)
     
-    def on_tree_drag(self, event):
-        """处理任务列表拖动事件"""
-        if self.resize_column_mode and self.resize_column:
-            # 计算新的宽度变化
-            delta = event.x_root - self.resize_start_x
-            new_width = max(30, self.resize_start_width + delta)
-            
-            # 设置新的宽度
-            self.task_tree.column(self.resize_column, width=new_width)
-    
-    def on_tree_release(self, event):
-        """处理任务列表释放事件"""
-        if self.resize_column_mode:
-            # 重置调整模式
-            self.resize_column_mode = False
-            self.resize_column = None
-            # 恢复光标样式
-            self.root.config(cursor="arrow")
+    def sort_by(self, column):
+        """点击列标题：依次切换为按该列升序、降序和手动顺序"""
+        sorted_tasks = self.sorted_tasks
+        if sorted_tasks.column != column:
+            sorted_tasks.set_order(column)
+        elif not sorted_tasks.descending:
+            sorted_tasks.set_order(column, True)
+        else:
+            sorted_tasks.set_order(None)
+        
+        # 在标题上显示排序方向
+        for name, title in self.column_titles.items():
+            if name == sorted_tasks.column:
+                title += " ▼" if sorted_tasks.descending else " ▲"
+            self.task_tree.heading(name, text=title)
+        self.update_task_list()
+    
+    def move_task(self, task_id, offset):
+        """移动任务，返回是否移动
+        
+        按列排序时只与该列的值相同的相邻任务交换位置，调整的是它们之间的手动顺序。
+        """
+        if not self.sorted_tasks.column:
+            return self.store.move(task_id, offset)
+        other_id = self.sorted_tasks.neighbor(task_id, offset)
+        return other_id is not None and self.store.move_beside(task_id, other_id, after=offset > 0)
     
     def move_task_up(self, task_id):
         """将任务向上移动一位"""
-        # 查找任务索引
-        task_index = next((index for index, task in enumerate(self.tasks) if task["id"] == task_id), -1)
-        if task_index <= 0:  # 已经是第一个任务
+        # 与上一个任务交换位置，已经是第一个任务时不处理
+        if not self.move_task(task_id, -1):
             return
         
-        # 交换任务位置
-        self.tasks[task_index], self.tasks[task_index - 1] = self.tasks[task_index - 1], self.tasks[task_index]
-        
-        # 重新排序ID
-        self.reorder_task_ids()
-        
         # 保存并更新显示
         self.save_tasks()
         self.update_task_list()
     
     def move_task_down(self, task_id):
         """将任务向下移动一位"""
-        # 查找任务索引
-        task_index = next((index for index, task in enumerate(self.tasks) if task["id"] == task_id), -1)
-        if task_index == -1 or task_index >= len(self.tasks) - 1:  # 已经是最后一个任务
+        # 与下一个任务交换位置，已经是最后一个任务时不处理
+        if not self.move_task(task_id, 1):
             return
         
-        # 交换任务位置
-        self.tasks[task_index], self.tasks[task_index + 1] = self.tasks[task_index + 1], self.tasks[task_index]
-        
-        # 重新排序ID
-        self.reorder_task_ids()
-        
         # 保存并更新显示
         self.save_tasks()
         self.update_task_list()
     
     def edit_task(self, task=None):
-        """编辑任务，支持回退修改"""
+        """编辑任务，保存后可以用 Ctrl+Z 撤销"""
         # 如果没有传递任务对象，则从选中项获取
         if task is None:
             selected_item = self.task_tree.selection()
@@ -883,16 +1431,13 @@ class TodoApp:
             
             # 获取选中任务的ID
             item = selected_item[0]
-            task_id = int(self.task_tree.item(item, "values")[0])
+            task_id = self.renderer.task_id(item)
             
             # 查找任务
-            task = next((t for t in self.tasks if t["id"] == task_id), None)
+            task = self.store.get(task_id)
             if not task:
                 return
         
-        # 保存任务的原始状态，以便回退
-        original_task = task.copy()
-        
         # 创建编辑窗口
         edit_window = tk.Toplevel(self.root)
         edit_window.title("编辑任务")
@@ -967,20 +1512,18 @@ class TodoApp:
                     messagebox.showwarning("编辑失败", "日期格式错误！请使用YYYY-MM-DD格式（例如：2023-12-31）。")
                     return
             
-            # 更新任务
-            task["task"] = new_task
-            task["due_date"] = new_date
-            
-            self.save_tasks()
-            self.update_task_list()
+            # 更新任务，没有修改时不产生撤销记录
+            if (new_task, new_date) != (task["task"], task["due_date"]):
+                self.store.update(task["id"], task=new_task, due_date=new_date)
+                self.save_tasks()
+                self.update_task_list()
             
             edit_window.destroy()
             messagebox.showinfo("编辑成功", f"任务 '{new_task}' 已成功更新！")
         
         # 取消按钮
         def cancel_edit():
-            # 回退到原始状态
-            task.update(original_task)
+            # 任务只在保存时修改，取消时直接关闭窗口
             edit_window.destroy()
         
         # 按钮框架
@@ -1011,97 +1554,181 @@ class TodoApp:
         # 使用wait_window确保模态行为，但允许主窗口拖动
         self.root.wait_window(edit_window)
     
+    def selected_task_ids(self):
+        """返回选中任务的ID列表，按列表顺序排列"""
+        if self.virtual_list:
+            # 虚拟列表中滚出可见区域的行也保持选中
+            return sorted((task_id for task_id in self.renderer.selected if task_id in self.store), key=self.store.position)
+        return [self.renderer.task_id(item) for item in self.task_tree.selection()]
+    
+    def run_batch(self, operation, *args, **kwargs):
+        """在一个事务中执行批量操作，只保存一次、刷新一次列表"""
+        with self.store.transaction():
+            result = operation(*args, **kwargs)
+        if result:
+            self.save_tasks()
+            self.update_task_list()
+        return result
+    
     def delete_task(self):
         """删除选中的任务"""
-        selected_item = self.task_tree.selection()
-        if not selected_item:
+        task_ids = self.selected_task_ids()
+        if not task_ids:
             messagebox.showwarning("警告", "请先选择一个任务！")
             return
         
-        # 获取选中任务的ID
-        item = selected_item[0]
-        task_id = int(self.task_tree.item(item, "values")[0])
-        
-        # 确认删除
-        if messagebox.askyesno("确认删除", "确定要删除这个任务吗？"):
-            # 删除任务
-            self.tasks = [t for t in self.tasks if t["id"] != task_id]
-            # 重新排序ID
-            self.reorder_task_ids()
-            self.save_tasks()
-            self.update_task_list()
+        if len(task_ids) == 1:
+            message = "确定要删除这个任务吗？"
+        else:
+            message = f"确定要删除选中的 {len(task_ids)} 个任务吗？"
+        self.delete_tasks(task_ids, message)
+    
+    def delete_tasks(self, task_ids, message):
+        """确认后删除多个任务，其他任务的ID和排序键保持不变，返回是否删除"""
+        if not messagebox.askyesno("确认删除", message):
+            return False
+        self.run_batch(self.store.remove_ids, task_ids)
+        return True
     
     def toggle_task_status(self):
-        """切换任务完成状态"""
-        selected_item = self.task_tree.selection()
-        if not selected_item:
+        """切换选中任务的完成状态
+        
+        选中多个任务时，只要有一个未完成就全部标记为已完成，否则全部标记为未完成。
+        """
+        task_ids = self.selected_task_ids()
+        if not task_ids:
             messagebox.showwarning("警告", "请先选择一个任务！")
             return
         
-        # 获取选中任务的ID
-        item = selected_item[0]
-        task_id = int(self.task_tree.item(item, "values")[0])
-        
-        # 调用根据ID切换状态的方法
-        self.toggle_task_status_by_id(task_id)
+        if len(task_ids) == 1:
+            self.toggle_task_status_by_id(task_ids[0])
+            return
+        completed = any(not self.store.get(task_id)["completed"] for task_id in task_ids)
+        if completed and self.ARCHIVE_MODE:
+            self.archive_tasks(task_ids)
+            return
+        self.run_batch(self.store.update_many, task_ids, completed=completed)
     
     def toggle_task_status_by_id(self, task_id):
-        """根据ID切换任务完成状态"""
-        # 查找任务
-        task = next((t for t in self.tasks if t["id"] == task_id), None)
-        if task:
-            # 切换状态
-            task["completed"] = not task["completed"]
+        """根据ID切换任务完成状态，归档模式下完成的任务直接归档"""
+        task = self.store.get(task_id)
+        if task and not task["completed"] and self.ARCHIVE_MODE:
+            self.archive_tasks([task_id])
+            return
+        
+        # 切换状态
+        if self.store.toggle(task_id):
             self.save_tasks()
             self.update_task_list()
     
-    def delete_completed_tasks(self):
-        """删除所有已完成的任务"""
-        # 统计已完成的任务数量
-        completed_tasks = [task for task in self.tasks if task["completed"]]
-        if not completed_tasks:
-            messagebox.showinfo("提示", "没有已完成的任务可以删除！")
+    def archive_tasks(self, task_ids):
+        """把任务标记为已完成并移入归档，返回是否成功
+        
+        先写入归档再从列表中删除，中途出错时任务不会丢失。归档不能撤销。
+        """
+        tasks = [self.store.get(task_id) for task_id in task_ids]
+        tasks = [task.replace(completed=True) for task in tasks if task]
+        if not tasks:
+            return False
+        
+        try:
+            self.archive.append(tasks)
+        except OSError as e:
+            messagebox.showerror("归档失败", f"无法写入归档文件: {e}")
+            return False
+        
+        with self.history.paused():
+            self.run_batch(self.store.remove_ids, [task["id"] for task in tasks])
+        if self.archive_window is not None and self.archive_window.winfo_exists():
+            self.archive_window.show_page(0)
+        return True
+    
+    def on_archive_key(self, event):
+        """按 Ctrl+H 打开历史记录窗口；输入框中 Ctrl+H 是退格，不打开"""
+        if isinstance(event.widget, tk.Entry):
+            return None
+        return self.show_archive()
+    
+    def show_archive(self, event=None):
+        """打开历史记录窗口"""
+        if self.archive_window is not None and self.archive_window.winfo_exists():
+            self.archive_window.lift()
+            self.archive_window.show_page(0)
+            return "break"
+        
+        self.archive_window = ArchiveWindow(self.root, self.archive, self.theme)
+        self.archive_window.geometry(f"+{self.root.winfo_rootx() + 30}+{self.root.winfo_rooty() + 30}")
+        return "break"
+    
+    def set_due_date_for_selected(self):
+        """打开日历，为选中的任务设置相同的截止日期"""
+        task_ids = self.selected_task_ids()
+        if not task_ids:
             return
         
-        # 确认删除
-        if messagebox.askyesno("确认删除", f"确定要删除所有已完成的任务吗？共 {len(completed_tasks)} 个任务。"):
-            # 删除已完成的任务
-            self.tasks = [task for task in self.tasks if not task["completed"]]
-            # 重新排序ID
-            self.reorder_task_ids()
-            self.save_tasks()
-            self.update_task_list()
-            messagebox.showinfo("删除成功", f"已成功删除 {len(completed_tasks)} 个已完成的任务！")
+        self.apply_calendar_styles()
+        initial_date = self.store.get(task_ids[0])["due_date"]
+        calendar = CalendarPicker(self.root, initial_date,
+                                  lambda due_date: self.run_batch(self.store.update_many, task_ids, due_date=due_date),
+                                  self.theme["background_color"], self.store.due_count)
+        calendar.geometry(f"+{self.root.winfo_rootx() + 50}+{self.root.winfo_rooty() + 200}")
+    
+    def move_selected_to_edge(self, top=True):
+        """把选中的任务移到列表顶部或底部"""
+        task_ids = self.selected_task_ids()
+        if task_ids:
+            self.run_batch(self.store.move_to_edge, task_ids, top)
     
-    def reorder_task_ids(self):
-        """重新排序任务ID，确保ID连续"""
-        # 重新排序ID
-        for index, task in enumerate(self.tasks):
-            task["id"] = index + 1
+    def show_context_menu(self, event):
+        """在任务列表中显示右键菜单，右键点击未选中的行时先选中该行"""
+        if self.loading:
+            return
+        item = self.task_tree.identify_row(event.y)
+        if not item:
+            return
+        if item not in self.task_tree.selection():
+            self.task_tree.selection_set(item)
+            # 虚拟列表需要立即同步选中的任务
+            self.on_tree_select(None)
+        
+        count = len(self.selected_task_ids())
+        self.context_menu.entryconfigure(0, label="切换状态" if count == 1 else f"切换状态（{count} 个任务）")
+        self.context_menu.tk_popup(event.x_root, event.y_root)
+        self.context_menu.grab_release()
+    
+    def delete_completed_tasks(self):
+        """删除所有已完成的任务，归档模式下移入归档"""
+        task_ids = [task["id"] for task in self.store if task["completed"]]
+        if not task_ids:
+            messagebox.showinfo("提示", "没有已完成的任务可以归档！" if self.ARCHIVE_MODE else "没有已完成的任务可以删除！")
+            return
+        
+        if self.ARCHIVE_MODE:
+            if self.archive_tasks(task_ids):
+                messagebox.showinfo("归档成功", f"已归档 {len(task_ids)} 个任务，可以在历史记录中查看。")
+            return
+        if self.delete_tasks(task_ids, f"确定要删除所有已完成的任务吗？共 {len(task_ids)} 个任务。"):
+            messagebox.showinfo("删除成功", f"已成功删除 {len(task_ids)} 个已完成的任务！")
     
     def delete_task_by_id(self, task_id):
         """根据ID删除任务"""
         # 查找任务
-        task = next((t for t in self.tasks if t["id"] == task_id), None)
+        task = self.store.get(task_id)
         if not task:
             return
         
         # 确认删除
         if messagebox.askyesno("确认删除", f"确定要删除任务 '{task['task']}' 吗？"):
-            # 删除任务
-            self.tasks = [t for t in self.tasks if t["id"] != task_id]
-            # 重新排序ID
-            self.reorder_task_ids()
+            # 删除任务，其他任务的ID和排序键保持不变
+            self.store.remove(task_id)
             self.save_tasks()
             self.update_task_list()
             messagebox.showinfo("删除成功", f"任务 '{task['task']}' 已成功删除！")
     
-
-    
     def edit_task_by_id(self, task_id):
         """根据ID编辑任务"""
         # 查找任务
-        task = next((t for t in self.tasks if t["id"] == task_id), None)
+        task = self.store.get(task_id)
         if not task:
             return
         
@@ -1109,21 +1736,45 @@ class TodoApp:
         self.edit_task(task)
 
 
+def show_first_frame(root, profiler):
+    """在第一次绘制完成后记录首帧时间并输出启动耗时"""
+    root.update_idletasks()
+    profiler.mark("首帧")
+    profiler.report()
+
 
 if __name__ == "__main__":
+    # --profile-startup 输出从启动到首帧各阶段的耗时
+    profiler = StartupProfiler("--profile-startup" in sys.argv[1:])
+    
+    # --perf 从启动开始记录性能数据，按 Ctrl+Shift+P 查看
+    MONITOR.enabled = "--perf" in sys.argv[1:]
+    profiler.mark("导入模块")
+    
+    # 按系统的区域设置比较任务描述
+    try:
+        locale.setlocale(locale.LC_COLLATE, "")
+    except locale.Error:
+        pass
+    
     # 创建主窗口
     root = tk.Tk()
+    profiler.mark("创建主窗口")
     
-    # 优化字体渲染，解决字体边缘模糊问题
-    try:
-        # 启用抗锯齿渲染
-        from ctypes import windll
-        windll.shcore.SetProcessDpiAwareness(1)
-    except Exception as e:
-        print(f"无法启用字体优化: {e}")
+    # 优化字体渲染，解决字体边缘模糊问题，只在 Windows 上可用
+    if sys.platform == "win32":
+        try:
+            # 启用抗锯齿渲染
+            from ctypes import windll
+            windll.shcore.SetProcessDpiAwareness(1)
+        except Exception as e:
+            print(f"无法启用字体优化: {e}")
     
     # 创建应用
-    app = TodoApp(root)
+    app = TodoApp(root, profiler)
+    
+    # 空闲回调排在窗口的第一次绘制之后
+    root.after_idle(show_first_frame, root, profiler)
     
     # 运行主循环
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,332 @@
+"""命令行模式：python todo_app.py cli <命令>
+
+不导入 tkinter，与界面一样按 task_storage 中的存储后端设置读写 ~/.todo 中的数据，适合在脚本和定时任务中批量操作：
+
+    python todo_app.py cli add 买牛奶 --due 2026-10-20
+    python todo_app.py cli list --active
+    python todo_app.py cli done 3 5
+    python todo_app.py cli rm 7
+    python todo_app.py cli import tasks.ndjson
+    python todo_app.py cli export -o backup.json --format json
+    python todo_app.py cli convert todos.json todos.bin
+
+add、done、rm 不指定参数时从标准输入逐行读取 JSON（NDJSON）。
+一次调用中的全部修改合并为一条日志记录，只写入一次；任一行有误时不做任何修改。
+修改任务只支持 JSON 后端的修改日志模式，其他设置下只能使用 list 和 export。
+"""
+import argparse
+import json
+import os
+import sys
+
+from task_store import Task, TaskStore, key_between, parse_due_date, task_to_json
+from task_storage import JsonBackend, binary_to_json, json_to_binary, open_backend, write_snapshot
+
+
+def default_data_dir():
+    return os.path.join(os.path.expanduser("~"), ".todo")
+
+
+def read_json_lines(stream):
+    """逐行解析 NDJSON，跳过空行，生成 (行号, 值)"""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"第 {number} 行不是有效的 JSON: {e}")
+
+
+def parse_task_fields(data, number=None):
+    """检查一行输入的任务，返回 (描述, 截止日期, 是否完成, 其他字段)
+    
+    data 可以是描述字符串，或包含 task、due_date、completed 及其他字段的对象，id 和 pos 会被忽略。
+    """
+    where = f"第 {number} 行: " if number else ""
+    if isinstance(data, str):
+        data = {"task": data}
+    if not isinstance(data, dict):
+        raise ValueError(f"{where}任务必须是字符串或对象")
+    
+    text = data.get("task")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"{where}任务描述不能为空")
+    due_date = data.get("due_date") or ""
+    if due_date and not parse_due_date(due_date):
+        raise ValueError(f"{where}日期格式不正确，请使用 YYYY-MM-DD 格式: {due_date}")
+    completed = data.get("completed", False)
+    if not isinstance(completed, bool):
+        raise ValueError(f"{where}completed 必须是 true 或 false")
+    
+    extra = {key: value for key, value in data.items() if key not in Task.FIELDS}
+    return text.strip(), due_date, completed, extra or None
+
+
+def parse_task_id(data, number=None):
+    """把一行输入（数字、数字字符串或包含 id 的对象）转换为任务ID"""
+    if isinstance(data, dict):
+        data = data.get("id")
+    if isinstance(data, str) and data.strip().isdigit():
+        data = int(data)
+    if isinstance(data, bool) or not isinstance(data, int):
+        where = f"第 {number} 行: " if number else ""
+        raise ValueError(f"{where}无效的任务ID: {data!r}")
+    return data
+
+
+def read_task_file(path):
+    """读取要导入的任务，支持 todos.json 格式的数组和 NDJSON，path 为 - 时读取标准输入"""
+    if path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    
+    # 根据第一个非空白字符判断格式
+    if text.lstrip().startswith("["):
+        tasks = json.loads(text)
+        return [(number, task) for number, task in enumerate(tasks, 1)]
+    return list(read_json_lines(text.splitlines()))
+
+
+def format_task(task, as_json=False):
+    """把任务格式化为一行文本"""
+    if as_json:
+        return json.dumps(task.to_dict(), ensure_ascii=False, separators=(",", ":"))
+    mark = "x" if task["completed"] else " "
+    return f"{task['id']:>5} [{mark}] {task['due_date'] or '':<10}  {task['task']}"
+
+
+def write_tasks(out, tasks, as_json=False):
+    """逐个输出任务，不先拼接整个结果"""
+    for task in tasks:
+        out.write(format_task(task, as_json) + "\n")
+
+
+class TaskFile:
+    """打开数据目录中的任务数据，修改在 save 时一次写入
+    
+    write 为 True 时从读取到保存一直持有文件锁，期间界面和其他命令不会写入数据文件。
+    """
+    
+    def __init__(self, data_dir, write=False):
+        os.makedirs(data_dir, exist_ok=True)
+        self.backend = open_backend(data_dir)
+        # 只有修改日志在持有文件锁时同步写入，其他后端可能与界面的保存冲突
+        if write and not (isinstance(self.backend, JsonBackend) and self.backend.journal):
+            self.backend.close()
+            raise ValueError('命令行模式只能在修改日志模式下修改任务（task_storage.py 中 STORAGE_BACKEND = "json"、'
+                             'JOURNAL_MODE = True），请在界面中修改')
+        self.locked = write and self.backend.lock.acquire()
+        try:
+            self.store = TaskStore(self.backend.load())
+        except BaseException:
+            self.unlock()
+            raise
+        self.backend.attach(self.store)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.unlock()
+    
+    def unlock(self):
+        if self.locked:
+            self.locked = False
+            self.backend.lock.release()
+    
+    def save(self):
+        """写入修改并释放文件锁，再把日志合并进 todos.json"""
+        try:
+            self.backend.commit()
+        finally:
+            self.unlock()
+        self.backend.journal.wait()
+        self.backend.close()
+    
+    def require(self, task_ids):
+        """返回 ID 对应的任务，有不存在的ID时报错"""
+        missing = [task_id for task_id in task_ids if task_id not in self.store]
+        if missing:
+            raise ValueError("任务不存在: " + ", ".join(str(task_id) for task_id in missing))
+        return [self.store.get(task_id) for task_id in task_ids]
+    
+    def append(self, entries):
+        """在末尾添加任务，entries 为 parse_task_fields 的结果列表，返回新任务"""
+        store = self.store
+        last = store.tasks[-1]["pos"] if store.tasks else None
+        added = []
+        with store.transaction():
+            for text, due_date, completed, extra in entries:
+                last = key_between(last, None)
+                added.append(store.insert(Task(store.next_id(), text, due_date, completed, last, extra)))
+        return added
+
+
+def stdin_lines(args_values):
+    """命令行参数为空时从标准输入读取 NDJSON"""
+    if args_values:
+        return [(None, value) for value in args_values]
+    if sys.stdin.isatty():
+        raise ValueError("缺少参数，或通过标准输入逐行提供 JSON")
+    return list(read_json_lines(sys.stdin))
+
+
+def command_add(args, out):
+    if args.text:
+        entries = [parse_task_fields({"task": " ".join(args.text), "due_date": args.due})]
+    else:
+        entries = [parse_task_fields(data, number) for number, data in stdin_lines([])]
+    
+    with TaskFile(args.data_dir, write=True) as tasks:
+        added = tasks.append(entries)
+        tasks.save()
+    report(out, added, args.json, "已添加")
+
+
+def command_list(args, out):
+    store = TaskFile(args.data_dir).store
+    if args.due:
+        day = parse_due_date(args.due)
+        if not day:
+            raise ValueError(f"日期格式不正确，请使用 YYYY-MM-DD 格式: {args.due}")
+        tasks = store.due_between(day, day)
+    else:
+        tasks = store.tasks
+    if args.active:
+        tasks = (task for task in tasks if not task["completed"])
+    elif args.completed:
+        tasks = (task for task in tasks if task["completed"])
+    write_tasks(out, tasks, args.json)
+
+
+def command_done(args, out):
+    task_ids = [parse_task_id(data, number) for number, data in stdin_lines(args.ids)]
+    with TaskFile(args.data_dir, write=True) as tasks:
+        tasks.require(task_ids)
+        tasks.store.update_many(task_ids, completed=not args.undo)
+        tasks.save()
+    report(out, tasks.require(task_ids), args.json, "已更新")
+
+
+def command_rm(args, out):
+    task_ids = [parse_task_id(data, number) for number, data in stdin_lines(args.ids)]
+    with TaskFile(args.data_dir, write=True) as tasks:
+        tasks.require(task_ids)
+        removed = tasks.store.remove_ids(task_ids)
+        tasks.save()
+    report(out, removed, args.json, "已删除")
+
+
+def command_import(args, out):
+    entries = [parse_task_fields(data, number) for number, data in read_task_file(args.file)]
+    with TaskFile(args.data_dir, write=True) as tasks:
+        added = tasks.append(entries)
+        tasks.save()
+    report(out, added, args.json, "已导入")
+
+
+def command_export(args, out):
+    store = TaskFile(args.data_dir).store
+    if args.output and args.format == "json":
+        write_snapshot(args.output, store.tasks)
+        return
+    
+    target = open(args.output, "w", encoding="utf-8") if args.output else out
+    try:
+        if args.format == "json":
+            json.dump(store.tasks, target, ensure_ascii=False, indent=2, default=task_to_json)
+            target.write("\n")
+        else:
+            write_tasks(target, store.tasks, as_json=True)
+    finally:
+        if target is not out:
+            target.close()
+
+
+def command_convert(args, out):
+    if args.source.lower().endswith(".bin"):
+        count = binary_to_json(args.source, args.target)
+    elif args.target.lower().endswith(".bin"):
+        count = json_to_binary(args.source, args.target)
+    else:
+        raise ValueError("源文件和目标文件中需要有一个是 .bin 二进制数据文件")
+    out.write(f"已转换 {count} 个任务\n")
+
+
+def report(out, tasks, as_json, action):
+    """输出修改过的任务：--json 时逐行输出任务，否则只输出数量"""
+    if as_json:
+        write_tasks(out, tasks, True)
+    else:
+        out.write(f"{action} {len(tasks)} 个任务\n")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python todo_app.py cli", description="Todo List 命令行模式")
+    parser.add_argument("--data-dir", default=default_data_dir(), help="数据目录，默认 ~/.todo")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    add = commands.add_parser("add", help="添加任务，不指定描述时从标准输入逐行读取")
+    add.add_argument("text", nargs="*", help="任务描述")
+    add.add_argument("--due", default="", help="截止日期 YYYY-MM-DD")
+    add.set_defaults(handler=command_add)
+    
+    show = commands.add_parser("list", help="列出任务")
+    status = show.add_mutually_exclusive_group()
+    status.add_argument("--active", action="store_true", help="只列出未完成的任务")
+    status.add_argument("--completed", action="store_true", help="只列出已完成的任务")
+    show.add_argument("--due", help="只列出截止日期为该日的任务")
+    show.set_defaults(handler=command_list)
+    
+    done = commands.add_parser("done", help="标记任务为已完成，不指定ID时从标准输入逐行读取")
+    done.add_argument("ids", nargs="*", help="任务ID")
+    done.add_argument("--undo", action="store_true", help="改为标记为未完成")
+    done.set_defaults(handler=command_done)
+    
+    remove = commands.add_parser("rm", help="删除任务，不指定ID时从标准输入逐行读取")
+    remove.add_argument("ids", nargs="*", help="任务ID")
+    remove.set_defaults(handler=command_rm)
+    
+    load = commands.add_parser("import", help="从 NDJSON 或 todos.json 格式的文件导入任务，追加到末尾")
+    load.add_argument("file", nargs="?", default="-", help="文件路径，默认读取标准输入")
+    load.set_defaults(handler=command_import)
+    
+    dump = commands.add_parser("export", help="导出全部任务")
+    dump.add_argument("-o", "--output", help="输出文件，默认输出到标准输出")
+    dump.add_argument("--format", choices=("ndjson", "json"), default="ndjson", help="输出格式")
+    dump.set_defaults(handler=command_export)
+    
+    convert = commands.add_parser("convert", help="在 todos.json 格式和二进制数据文件（.bin）之间转换")
+    convert.add_argument("source", help="源文件")
+    convert.add_argument("target", help="目标文件，按扩展名 .bin 判断转换方向")
+    convert.set_defaults(handler=command_convert)
+    
+    for command in (add, show, done, remove, load):
+        command.add_argument("--json", action="store_true", help="以 NDJSON 逐行输出任务")
+    return parser
+
+
+def main(argv=None, out=None):
+    """运行命令并返回退出码"""
+    args = build_parser().parse_args(argv)
+    out = out or sys.stdout
+    try:
+        args.handler(args, out)
+        out.flush()
+    except BrokenPipeError:
+        # 输出被提前关闭（例如接到 head），不再报错
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (ValueError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())